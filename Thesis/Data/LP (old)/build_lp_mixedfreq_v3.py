@@ -24,6 +24,7 @@ Optional config
   - Data/LP/columns_map.json  # maps canonical -> actual headers per file
   - --cutover "Haifa:2021-09,Ashdod:2022-07"
   - --allocate_allports (False by default; see notes below)
+  - --no-cache  (skip the parquet cache of normalized inputs under <out_dir>/_cache)
 
 Outputs (TSV)
 -------------
@@ -34,6 +35,7 @@ Outputs (TSV)
   - LP_panel_mixedfreq.tsv
   - qa_lp_report.tsv
   - _meta_lp_mixadjusted.json
+  Each TSV also gets a .parquet sidecar (zstd) when pyarrow is installed.
 
 Notes
 -----
@@ -45,6 +47,7 @@ Notes
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
@@ -55,6 +58,11 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+try:  # optional: faster terminal-sum + precedence merge in load_tons
+    import polars as pl
+except ImportError:
+    pl = None
+
 pd.options.mode.copy_on_write = True
 
 # --------------------------- Errors & helpers --------------------------------
@@ -68,11 +76,52 @@ def _find_first_existing(paths: List[str]) -> Optional[str]:
             return p
     return None
 
+def _parquet_sidecar(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
 def _read_tsv(path: str) -> pd.DataFrame:
+    # Fastest parser first: pyarrow (multithreaded) -> C -> python tokenizer
+    err = None
+    for engine in ("pyarrow", "c", "python"):
+        try:
+            return pd.read_csv(path, sep="\t", engine=engine)
+        except Exception as e:
+            err = e
+    raise ValidationError(f"Failed to read TSV at {path}: {err}")
+
+def _write_tsv(df: pd.DataFrame, path: str) -> str:
+    """Write df as TSV (pyarrow's C++ CSV writer when available) plus a zstd parquet sidecar."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     try:
-        return pd.read_csv(path, sep="\t", engine="python")
-    except Exception as e:
-        raise ValidationError(f"Failed to read TSV at {path}: {e}")
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # pyarrow quotes header names unconditionally; write a plain header like to_csv
+        with open(path, "wb") as f:
+            f.write(("\t".join(map(str, df.columns)) + "\n").encode("utf-8"))
+            pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(
+                include_header=False, delimiter="\t", quoting_style="none"))
+    except Exception:
+        table = None
+        df.to_csv(path, sep="\t", index=False)
+    if table is not None:
+        try:
+            df.to_parquet(_parquet_sidecar(path), engine="pyarrow", compression="zstd", index=False)
+        except Exception as e:
+            print(f"[write] Skipping parquet sidecar for {os.path.basename(path)}: {e}")
+    return path
+
+# Precompiled patterns for the per-row parsers below
+_RX_PORT   = re.compile(r"^(Ashdod|Haifa|Eilat)\b", re.IGNORECASE)
+_RX_MY     = re.compile(r"^\s*(\d{1,2})[-/](\d{4})\s*$")          # 01-2008
+_RX_YM     = re.compile(r"^\s*(\d{4})[-/](\d{1,2})\s*$")          # 2008-01
+_RX_MONYR  = re.compile(r"^\s*([A-Za-z]{3,})[-\s](\d{4})\s*$")    # Mar 2022 / Mar-2022
+_RX_YRMON  = re.compile(r"^\s*(\d{4})[-\s]([A-Za-z]{3,})\s*$")    # 2022 Mar / 2022-Mar
+_RX_QTR    = re.compile(r"Q([1-4])")
+_RX_TERMINAL = re.compile(r"^(Ashdod|Haifa|Eilat)\s*-\s*(.+)$", re.IGNORECASE)  # after '–' -> '-'
+_ALLPORTS_LABELS = {"all ports","all_ports","allports","all"}
+_MONTHS = {m.lower(): i for i, m in enumerate(
+    ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"], start=1)}
 
 def _norm_port(s) -> Optional[str]:
     if s is None or (isinstance(s, float) and np.isnan(s)):
@@ -82,13 +131,24 @@ def _norm_port(s) -> Optional[str]:
     if low.startswith("ashdod"): return "Ashdod"
     if low.startswith("haifa"):  return "Haifa"
     if low.startswith("eilat"):  return "Eilat"
-    if low in {"all ports","all_ports","allports","all"}: return "All Ports"
+    if low in _ALLPORTS_LABELS: return "All Ports"
     # Try to infer from terminal composite name "Haifa-Legacy", etc.
-    m = re.match(r"^(Ashdod|Haifa|Eilat)\b", s2, flags=re.IGNORECASE)
+    m = _RX_PORT.match(s2)
     if m:
         return m.group(1).title()
     return s2
 
+def _norm_port_categorical(s: pd.Series) -> pd.Series:
+    """
+    _norm_port evaluated once per distinct label and broadcast back through the
+    factorized codes; returned as a categorical so groupbys hash int codes.
+    """
+    uniq, inv = np.unique(s.astype(str).to_numpy(dtype=object), return_inverse=True)
+    mapped = [_norm_port(u) for u in uniq]
+    cats = pd.Index(sorted({m for m in mapped if m is not None}), dtype=object)
+    codes = cats.get_indexer(mapped)[inv.reshape(-1)]
+    return pd.Series(pd.Categorical.from_codes(codes, cats), index=s.index)
+
 def _parse_period_to_year_month(s) -> Tuple[Optional[int], Optional[int]]:
     """
     Parse common month-year strings to (year, month). Supports:
@@ -99,43 +159,59 @@ def _parse_period_to_year_month(s) -> Tuple[Optional[int], Optional[int]]:
         return (None, None)
     txt = str(s).strip()
     # Numeric month-year patterns
-    m = re.match(r"^\s*(\d{1,2})[-/](\d{4})\s*$", txt)  # 01-2008
+    m = _RX_MY.match(txt)
     if m:
         mo, yr = int(m.group(1)), int(m.group(2))
         if 1 <= mo <= 12: return (yr, mo)
-    m = re.match(r"^\s*(\d{4})[-/](\d{1,2})\s*$", txt)  # 2008-01
+    m = _RX_YM.match(txt)
     if m:
         yr, mo = int(m.group(1)), int(m.group(2))
         if 1 <= mo <= 12: return (yr, mo)
     # Named month patterns
-    months = {m.lower(): i for i, m in enumerate(
-        ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"], start=1)}
-    m = re.match(r"^\s*([A-Za-z]{3,})[-\s](\d{4})\s*$", txt)  # Mar 2022 / Mar-2022
+    m = _RX_MONYR.match(txt)
     if m:
         mon = m.group(1)[:3].title()
         yr = int(m.group(2))
-        mo = months.get(mon.lower())
+        mo = _MONTHS.get(mon.lower())
         if mo: return (yr, mo)
-    m = re.match(r"^\s*(\d{4})[-\s]([A-Za-z]{3,})\s*$", txt)  # 2022 Mar / 2022-Mar
+    m = _RX_YRMON.match(txt)
     if m:
         yr = int(m.group(1))
         mon = m.group(2)[:3].title()
-        mo = months.get(mon.lower())
+        mo = _MONTHS.get(mon.lower())
         if mo: return (yr, mo)
     return (None, None)
 
-def _quarter_from_month(m) -> Optional[str]:
-    if pd.isna(m): return None
-    try:
-        q = (int(m)-1)//3 + 1
-        return f"Q{q}"
-    except Exception:
-        return None
+def _parse_periods(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Vector form of _parse_period_to_year_month: parse each distinct period once, broadcast back."""
+    codes, uniq = pd.factorize(s)
+    yu = np.full(len(uniq) + 1, np.nan)                  # trailing slot serves code -1 (NA)
+    mu = np.full(len(uniq) + 1, np.nan)
+    for k, v in enumerate(uniq):
+        yr, mo = _parse_period_to_year_month(v)
+        if yr is not None:
+            yu[k], mu[k] = yr, mo
+    year = pd.Series(pd.array(yu[codes], dtype="Int64"), index=s.index)
+    month = pd.Series(pd.array(mu[codes], dtype="Int64"), index=s.index)
+    return year, month
+
+_QUARTER_LABELS = np.array([None, "Q1", "Q2", "Q3", "Q4"], dtype=object)
+
+def _quarters_from_months(month: pd.Series) -> pd.Series:
+    """Month -> 'Q1'..'Q4' per row via a label lookup; None for NA or months outside 1..12."""
+    m = pd.to_numeric(month, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    ok = (m >= 1) & (m <= 12)
+    q = np.where(ok, (np.where(ok, m, 1).astype(np.int64) - 1) // 3 + 1, 0)
+    return pd.Series(_QUARTER_LABELS[q], index=month.index, dtype=object)
+
+def _month_index(year: pd.Series, month: pd.Series) -> pd.Series:
+    """year*12 + month in nullable integer arithmetic (NA if either part is NA)."""
+    return year.astype("Int64")*12 + month.astype("Int64")
 
 def _parse_quarter_field(q) -> Optional[int]:
     if pd.isna(q): return None
     s = str(q).upper().strip().replace(" ", "")
-    m = re.search(r"Q([1-4])", s)
+    m = _RX_QTR.search(s)
     if m: return int(m.group(1))
     if s.isdigit():
         qi = int(s)
@@ -145,18 +221,61 @@ def _parse_quarter_field(q) -> Optional[int]:
 def winsorize_group(df: pd.DataFrame, value_col: str, by: List[str], lower=0.01, upper=0.99) -> pd.Series:
     out = df[value_col].astype(float).copy()
     if out.empty: return out
-    g = df.groupby(by, dropna=False, sort=False)
-    qs = g[value_col].quantile([lower, upper]).unstack(level=-1)
-    if qs is None or qs.empty: return out
-    qs = qs.rename(columns={lower:"q_low", upper:"q_high"})
-    key = pd.MultiIndex.from_frame(df[by])
-    ql = qs.reindex(key).reset_index(drop=True)["q_low"].to_numpy()
-    qh = qs.reindex(key).reset_index(drop=True)["q_high"].to_numpy()
-    v = out.to_numpy(dtype="float64")
-    v = np.where(~np.isnan(v) & ~np.isnan(ql), np.maximum(v, ql), v)
-    v = np.where(~np.isnan(v) & ~np.isnan(qh), np.minimum(v, qh), v)
+    g = df.groupby(by, dropna=False, observed=True, sort=False)[value_col]
+    ql = g.transform("quantile", lower).to_numpy(dtype="float64", na_value=np.nan)
+    qh = g.transform("quantile", upper).to_numpy(dtype="float64", na_value=np.nan)
+    # NaN values stay NaN; a NaN bound (all-NaN group) leaves that side unclipped
+    v = np.clip(out.to_numpy(dtype="float64"),
+                np.where(np.isnan(ql), -np.inf, ql), np.where(np.isnan(qh), np.inf, qh))
     return pd.Series(v, index=df.index)
 
+# ---------------------------- Parquet cache ----------------------------------
+
+# Bump when the loaders' output frames change; the script's own source hash is
+# folded in too, so any edit to this file invalidates previously cached frames.
+_CACHE_SCHEMA = 2
+with open(os.path.abspath(__file__), "rb") as _f:
+    _CACHE_VERSION = f"{_CACHE_SCHEMA}-{hashlib.sha1(_f.read()).hexdigest()[:12]}"
+
+def _file_key(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+def _cached_load(path: str, loader, cache_dir: Optional[str], extra: str = ""):
+    """
+    Run loader() once per (path mtime+size, extra, _CACHE_VERSION) and persist its frame(s) as
+    parquet under cache_dir; warm runs read the typed parquet instead of
+    re-parsing and re-normalizing the TSV. Falls back to loader() if pyarrow
+    is unavailable or the cache cannot be read/written.
+    """
+    if not cache_dir:
+        return loader()
+    h = hashlib.sha1(f"{_file_key(path)}|{extra}|{_CACHE_VERSION}".encode("utf-8")).hexdigest()[:16]
+    stem = os.path.join(cache_dir, f"{os.path.basename(path)}.{h}")
+    manifest = stem + ".json"
+    if os.path.exists(manifest):
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                man = json.load(f)
+            if man.get("version") != _CACHE_VERSION:
+                raise ValueError("stale cache version")
+            n = int(man["frames"])
+            frames = [pd.read_parquet(f"{stem}.{i}.parquet", engine="pyarrow") for i in range(n)]
+            return frames[0] if n == 1 else tuple(frames)
+        except Exception:
+            pass
+    res = loader()
+    frames = list(res) if isinstance(res, tuple) else [res]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, fr in enumerate(frames):
+            fr.to_parquet(f"{stem}.{i}.parquet", engine="pyarrow", index=False)
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump({"source": path, "frames": len(frames), "version": _CACHE_VERSION}, f)
+    except Exception as e:
+        print(f"[cache] Skipping parquet cache for {os.path.basename(path)}: {e}")
+    return res
+
 # ---------------------------- Column map -------------------------------------
 
 def _read_columns_map(path: Optional[str]) -> Dict[str, Dict[str, str]]:
@@ -177,16 +296,19 @@ def _apply_header_map(df: pd.DataFrame, file_basename: str, columns_map: Dict[st
     if not mp:
         return df
     rename_dict = {}
+    cols = set(df.columns)
+    low2orig: Dict[str, str] = {}
+    for c in df.columns:
+        low2orig.setdefault(str(c).lower(), c)            # first column wins, as the scan did
     for canonical, actual in mp.items():
         # if exact exists
-        if actual in df.columns:
+        if actual in cols:
             rename_dict[actual] = canonical
         else:
             # try case-insensitive equal
-            for c in df.columns:
-                if c.lower() == str(actual).lower():
-                    rename_dict[c] = canonical
-                    break
+            hit = low2orig.get(str(actual).lower())
+            if hit is not None:
+                rename_dict[hit] = canonical
     if rename_dict:
         df = df.rename(columns=rename_dict)
     return df
@@ -205,6 +327,7 @@ class Inputs:
     columns_map_path: Optional[str]
     allocate_allports: bool
     min_port_year_coverage: float
+    cache_dir: Optional[str]
 
 def load_inputs(args) -> Inputs:
     base = args.base_dir
@@ -261,6 +384,7 @@ def load_inputs(args) -> Inputs:
         columns_map_path=args.columns_map,
         allocate_allports=bool(args.allocate_allports),
         min_port_year_coverage=float(args.min_port_year_coverage),
+        cache_dir=None if args.no_cache else os.path.join(out_dir, "_cache"),
     )
 
 # ----------------------- Loaders --------------------------------------------
@@ -275,7 +399,7 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]]) -> pd.DataFra
             raise ValidationError(f"L_Proxy: missing '{r}'. Use columns_map.json to map headers.")
 
     g = pd.DataFrame({
-        "port": df["port"].astype(str).map(_norm_port),
+        "port": _norm_port_categorical(df["port"]),
         "terminal": df["terminal"].astype(str).str.strip(),
         "year": pd.to_numeric(df["year"], errors="coerce").astype("Int64"),
         "month": pd.to_numeric(df["month"], errors="coerce").astype("Int64"),
@@ -283,10 +407,39 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]]) -> pd.DataFra
         "teu_i_m": pd.to_numeric(df["teu_i_m"], errors="coerce"),
         "pi_teu_per_hour_i_y": pd.to_numeric(df["pi_teu_per_hour_i_y"], errors="coerce"),
     })
-    g["quarter"] = g["month"].apply(_quarter_from_month)
-    g["month_index"] = (g["year"].astype("float")*12 + g["month"].astype("float")).round().astype("Int64")
+    g["quarter"] = _quarters_from_months(g["month"])
+    g["month_index"] = _month_index(g["year"], g["month"])
     return g
 
+def _tons_precedence_polars(tons_port_tot: pd.DataFrame, tons_term: pd.DataFrame) -> pd.DataFrame:
+    """
+    Polars version of load_tons' terminal sum + port-total precedence merge.
+    Same rows, order and columns as the pandas path: sum(min_count=1) per key,
+    NA keys grouped and matched like pandas, port returned as a categorical.
+    """
+    keys = ["port","year","month","month_index"]
+    cats = tons_port_tot["port"].astype("category").cat.categories.union(
+           tons_term["port"].astype("category").cat.categories)
+
+    def _to_pl(df: pd.DataFrame) -> "pl.DataFrame":
+        return pl.from_pandas(df.assign(port=df["port"].astype(object)))
+
+    term_sum = (_to_pl(tons_term).group_by(keys)
+                .agg(pl.when(pl.col("tons_i_m").count() > 0)
+                       .then(pl.col("tons_i_m").sum())
+                       .otherwise(None)
+                       .alias("tons_sum_terminals"))
+                .sort(keys, nulls_last=True))
+    port_tot = _to_pl(tons_port_tot)
+    key = pl.concat([port_tot.select(keys), term_sum.select(keys)]).unique(maintain_order=True)
+    merged = (key.join(port_tot, on=keys, how="left", nulls_equal=True, maintain_order="left")
+                 .join(term_sum, on=keys, how="left", nulls_equal=True, maintain_order="left")
+                 .to_pandas())
+    for c in ["year","month","month_index"]:
+        merged[c] = merged[c].astype("Int64")
+    merged["port"] = pd.Categorical(merged["port"], categories=cats)
+    return merged
+
 def load_tons(path: str, columns_map: Dict[str, Dict[str,str]], allocate_allports: bool,
               teu_pm_for_alloc: Optional[pd.DataFrame], l_proxy_for_alloc: Optional[pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
@@ -312,11 +465,11 @@ def load_tons(path: str, columns_map: Dict[str, Dict[str,str]], allocate_allport
                               f"Sample rows: {sample}. Tip: provide columns_map.json or rename headers.")
 
     # Parse year/month
-    yy, mm = zip(*[ _parse_period_to_year_month(x) for x in df[col_period].tolist() ])
+    yy, mm = _parse_periods(df[col_period])
     tmp = pd.DataFrame({
         "raw_label": df[col_pot].astype(str).str.strip(),
-        "year": pd.Series(yy, dtype="Int64"),
-        "month": pd.Series(mm, dtype="Int64"),
+        "year": yy,
+        "month": mm,
         "tons_raw": pd.to_numeric(df[col_tons_k], errors="coerce")*1000.0 if col_tons_k else pd.to_numeric(df[col_tons], errors="coerce"),
     })
     if tmp["year"].isna().mean() > 0.99 or tmp["month"].isna().mean() > 0.99:
@@ -326,21 +479,35 @@ def load_tons(path: str, columns_map: Dict[str, Dict[str,str]], allocate_allport
                               f"First 10 columns: {first_cols}. Sample rows: {sample}. "
                               f"Ensure 'period' strings like '01-2008' or map via columns_map.json.")
 
-    # Split raw_label into (port total / terminal / all-ports)
-    lab = tmp["raw_label"].fillna("")
-    is_all = lab.str.lower().isin(["all ports","all_ports","allports","all"])
-    # Terminal if contains a hyphen after a port prefix; else if equals a port name -> port total
-    is_terminal = lab.str.match(r"^(Ashdod|Haifa|Eilat)\s*[-–]\s*.+", flags=re.IGNORECASE)
-    is_port_total = ~is_all & ~is_terminal
+    # Split raw_label into (port total / terminal / all-ports): classify each distinct
+    # label once, then broadcast kind/port/terminal back through the factorized codes.
+    # Terminal if a port prefix is followed by a hyphen; else (not all-ports) a port total.
+    codes, labels = pd.factorize(tmp["raw_label"].fillna(""))
+    kind = np.empty(len(labels), dtype=np.int8)          # 0 all-ports, 1 terminal, 2 port total
+    port_u = np.empty(len(labels), dtype=object)
+    term_u = np.empty(len(labels), dtype=object)
+    for k, lab in enumerate(labels):
+        m = _RX_TERMINAL.match(lab.replace("–","-"))
+        if lab.lower() in _ALLPORTS_LABELS:
+            kind[k] = 0
+        elif m:
+            kind[k] = 1
+            port_u[k], term_u[k] = m.group(1).title(), m.group(2).strip()
+        else:
+            kind[k] = 2
+            port_u[k] = _norm_port(lab)
+    row_kind = kind[codes]
+    is_all = pd.Series(row_kind == 0, index=tmp.index)
+    is_terminal = pd.Series(row_kind == 1, index=tmp.index)
+    is_port_total = pd.Series(row_kind == 2, index=tmp.index)
 
-    # Build port and terminal fields
-    tmp["port"] = None
-    tmp.loc[is_port_total, "port"] = lab[is_port_total].map(_norm_port)
-    tmp.loc[is_terminal, "port"] = lab[is_terminal].str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)", flags=re.IGNORECASE)[0].str.title()
-    tmp["terminal"] = None
-    tmp.loc[is_terminal, "terminal"] = lab[is_terminal].str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)\s*[-–]\s*(.+)$", flags=re.IGNORECASE)[1].str.strip()
+    # Build port (categorical) and terminal fields
+    port_cats = pd.Index(sorted({p for p in port_u if p is not None}), dtype=object)
+    port_codes = port_cats.get_indexer(port_u)
+    tmp["port"] = pd.Categorical.from_codes(port_codes[codes], port_cats)
+    tmp["terminal"] = term_u[codes]
 
-    tmp["month_index"] = (tmp["year"].astype("float")*12 + tmp["month"].astype("float")).round().astype("Int64")
+    tmp["month_index"] = _month_index(tmp["year"], tmp["month"])
 
     # Separate frames
     tons_all = tmp.loc[is_all, ["year","month","month_index","tons_raw"]].rename(columns={"tons_raw":"tons_allports_m"}).copy()
@@ -348,27 +515,33 @@ def load_tons(path: str, columns_map: Dict[str, Dict[str,str]], allocate_allport
     tons_port_tot = tmp.loc[is_port_total, ["port","year","month","month_index","tons_raw"]].rename(columns={"tons_raw":"tons"}).copy()
     tons_port_tot["tons_source"] = "port_total"
 
-    # Sum terminal rows to port-month
-    tons_term_sum = (tons_term.groupby(["port","year","month","month_index"], dropna=False)["tons_i_m"]
-                     .sum(min_count=1).reset_index().rename(columns={"tons_i_m":"tons_sum_terminals"}))
-
-    # Merge precedence
-    key = pd.concat([tons_port_tot[["port","year","month","month_index"]], tons_term_sum[["port","year","month","month_index"]]], ignore_index=True).drop_duplicates()
-    merged = key.merge(tons_port_tot, on=["port","year","month","month_index"], how="left").merge(tons_term_sum, on=["port","year","month","month_index"], how="left")
+    # Sum terminal rows to port-month, then merge precedence (polars when available)
+    merged = None
+    if pl is not None and not tons_term.empty and not tons_port_tot.empty:
+        try:
+            merged = _tons_precedence_polars(tons_port_tot, tons_term)
+        except Exception as e:
+            print(f"[polars] Falling back to pandas for tons precedence merge: {e}")
+    if merged is None:
+        tons_term_sum = (tons_term.groupby(["port","year","month","month_index"], dropna=False, observed=True)["tons_i_m"]
+                         .sum(min_count=1).reset_index().rename(columns={"tons_i_m":"tons_sum_terminals"}))
+        key = pd.concat([tons_port_tot[["port","year","month","month_index"]], tons_term_sum[["port","year","month","month_index"]]], ignore_index=True).drop_duplicates()
+        merged = key.merge(tons_port_tot, on=["port","year","month","month_index"], how="left").merge(tons_term_sum, on=["port","year","month","month_index"], how="left")
     merged["tons_p_m"] = merged["tons"].combine_first(merged["tons_sum_terminals"])
 
     # Optional: allocate All-Ports to ports when both missing (rare). Off by default.
     if allocate_allports:
         # Build port shares by month from TEU monthly if present else from terminal TEU_i_m aggregation
         if teu_pm_for_alloc is not None and not teu_pm_for_alloc.empty:
-            shares = (teu_pm_for_alloc.groupby(["year","month"], dropna=False)
-                      .apply(lambda d: d.set_index("port")["teu_p_m"]/d["teu_p_m"].sum())
-                      .reset_index().rename(columns={0:"share"}))
+            teup, teu_col = teu_pm_for_alloc, "teu_p_m"
         elif l_proxy_for_alloc is not None and not l_proxy_for_alloc.empty:
-            teui = (l_proxy_for_alloc.groupby(["port","year","month"], dropna=False)["teu_i_m"].sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_port_m"}))
-            shares = (teui.groupby(["year","month"], dropna=False)
-                      .apply(lambda d: d.set_index("port")["teu_port_m"]/d["teu_port_m"].sum())
-                      .reset_index().rename(columns={0:"share"}))
+            teup = (l_proxy_for_alloc.groupby(["port","year","month"], dropna=False, observed=True, sort=False)["teu_i_m"].sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_port_m"}))
+            teu_col = "teu_port_m"
+        else:
+            teup = None
+        if teup is not None:
+            denom = teup.groupby(["year","month"], dropna=False, observed=True, sort=False)[teu_col].transform("sum")
+            shares = teup.assign(share=teup[teu_col]/denom)[["year","month","port","share"]]
         else:
             shares = pd.DataFrame(columns=["year","month","port","share"])
 
@@ -399,7 +572,7 @@ def load_teu(path: str, columns_map: Dict[str, Dict[str,str]]) -> Tuple[pd.DataF
             raise ValidationError(f"TEU file: missing '{r}'. Map with columns_map.json.")
 
     dfc = df.copy()
-    dfc["port"] = dfc["port"].astype(str).map(_norm_port)
+    dfc["port"] = _norm_port_categorical(dfc["port"])
     dfc["year"] = pd.to_numeric(dfc["year"], errors="coerce").astype("Int64")
     dfc["teu"]  = pd.to_numeric(dfc["teu"], errors="coerce")
 
@@ -410,7 +583,7 @@ def load_teu(path: str, columns_map: Dict[str, Dict[str,str]]) -> Tuple[pd.DataF
         if not mpart.empty:
             mpart["month"] = pd.to_numeric(mpart["month"], errors="coerce").astype("Int64")
             teu_m = mpart[["port","year","month","teu"]].rename(columns={"teu":"teu_p_m"})
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).round().astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
 
     # Quarterly slice
     teu_q = pd.DataFrame(columns=["port","year","quarter","teu_p_q"])
@@ -423,13 +596,13 @@ def load_teu(path: str, columns_map: Dict[str, Dict[str,str]]) -> Tuple[pd.DataF
     # If neither present, try 'period'
     if teu_m.empty and "period" in dfc.columns:
         per = dfc[dfc["period"].notna()].copy()
-        yy, mm = zip(*[ _parse_period_to_year_month(x) for x in per["period"].tolist() ])
-        per["year"] = pd.Series(yy, dtype="Int64").combine_first(per["year"])
-        per["month"] = pd.Series(mm, dtype="Int64")
+        yy, mm = _parse_periods(per["period"])
+        per["year"] = yy.reset_index(drop=True).combine_first(per["year"])
+        per["month"] = mm.reset_index(drop=True)
         mpart = per[per["month"].notna()].copy()
         if not mpart.empty:
             teu_m = mpart.assign(teu_p_m=mpart["teu"])[["port","year","month","teu_p_m"]]
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).round().astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
 
     return teu_m, teu_q
 
@@ -455,14 +628,12 @@ def validate_inputs(l_proxy: pd.DataFrame, tons_port_m: pd.DataFrame, teu_pm: pd
         msgs.append(f"[Tons] Duplicate (port,year,month).")
 
     # TEU presence (at least monthly or quarterly per port-year existing in tons)
-    ports = sorted(set(tons_port_m["port"].dropna().unique().tolist()))
-    for p in ports:
-        yrs = sorted(set(tons_port_m.loc[tons_port_m["port"]==p, "year"].dropna().unique().tolist()))
-        for y in yrs:
-            has_m = not teu_pm[(teu_pm["port"]==p) & (teu_pm["year"]==y)].empty
-            has_q = not teu_pq[(teu_pq["port"]==p) & (teu_pq["year"]==y)].empty
-            if not has_m and not has_q:
-                msgs.append(f"[TEU] No monthly or quarterly TEU for port={p}, year={y}. w will be NA for those months.")
+    def _port_years(df: pd.DataFrame) -> set:
+        py = df[["port","year"]].dropna()
+        return set(zip(py["port"].tolist(), py["year"].astype("int64").tolist()))
+    missing = _port_years(tons_port_m) - _port_years(teu_pm) - _port_years(teu_pq)
+    for p, y in sorted(missing):
+        msgs.append(f"[TEU] No monthly or quarterly TEU for port={p}, year={y}. w will be NA for those months.")
 
     ok = (len([m for m in msgs if m.startswith("[L_Proxy] Missing") or m.startswith("[Tons] Missing")])==0)
     report = "\n".join(msgs) if msgs else "All validations passed."
@@ -490,7 +661,7 @@ def compute_w(tons_pm: pd.DataFrame, teu_pm: pd.DataFrame, teu_pq: pd.DataFrame,
     w_m["tons_per_teu"] = np.where(w_m["teu_p_m"]>0, w_m["tons_p_m"]/w_m["teu_p_m"], np.nan)
     if not w_m.empty:
         w_m["r_winsor"] = winsorize_group(w_m, "tons_per_teu", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-        mean_by_py = w_m.groupby(["port","year"], dropna=False)["r_winsor"].transform("mean")
+        mean_by_py = w_m.groupby(["port","year"], dropna=False, observed=True, sort=False)["r_winsor"].transform("mean")
         w_m["w_p_m"] = np.where((mean_by_py==0) | (mean_by_py.isna()), np.nan, w_m["r_winsor"]/mean_by_py)
     else:
         w_m["w_p_m"] = np.nan
@@ -499,16 +670,16 @@ def compute_w(tons_pm: pd.DataFrame, teu_pm: pd.DataFrame, teu_pq: pd.DataFrame,
     # Quarterly fallback
     # Prepare mapper from months -> quarter
     map_q = tons_pm[["port","year","month","month_index"]].drop_duplicates().copy()
-    map_q["quarter"] = map_q["month"].apply(_quarter_from_month)
+    map_q["quarter"] = _quarters_from_months(map_q["month"])
 
     if teu_pq is not None and not teu_pq.empty:
         agg = tons_pm.copy()
-        agg["quarter"] = agg["month"].apply(_quarter_from_month)
-        agg_tons = agg.groupby(["port","year","quarter"], dropna=False)["tons_p_m"].sum(min_count=1).reset_index()
+        agg["quarter"] = _quarters_from_months(agg["month"])
+        agg_tons = agg.groupby(["port","year","quarter"], dropna=False, observed=True, sort=False)["tons_p_m"].sum(min_count=1).reset_index()
         rq = agg_tons.merge(teu_pq, on=["port","year","quarter"], how="left")
         rq["r_q"] = np.where(rq["teu_p_q"]>0, rq["tons_p_m"]/rq["teu_p_q"], np.nan)
         rq["r_q_win"] = winsorize_group(rq, "r_q", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-        mean_by_pyq = rq.groupby(["port","year"], dropna=False)["r_q_win"].transform("mean")
+        mean_by_pyq = rq.groupby(["port","year"], dropna=False, observed=True, sort=False)["r_q_win"].transform("mean")
         rq["w_p_q"] = np.where((mean_by_pyq==0) | (mean_by_pyq.isna()), np.nan, rq["r_q_win"]/mean_by_pyq)
         w_qm = map_q.merge(rq[["port","year","quarter","w_p_q"]], on=["port","year","quarter"], how="left")
         w_qm = w_qm.rename(columns={"w_p_q":"w_from_q"})
@@ -530,23 +701,23 @@ def build_port_mix_LP(w_final: pd.DataFrame, l_proxy: pd.DataFrame,
                       tons_pm: pd.DataFrame, teu_pm: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     # Π: quarter-constant terminal shares * terminal π_i_y
     lp = l_proxy.copy()
-    lp["quarter"] = lp["month"].apply(_quarter_from_month)
+    lp["quarter"] = _quarters_from_months(lp["month"])
 
-    teui = (lp.groupby(["port","terminal","year","quarter"], dropna=False)["teu_i_m"]
+    teui = (lp.groupby(["port","terminal","year","quarter"], dropna=False, observed=True, sort=False)["teu_i_m"]
               .sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_i_q_sum"}))
-    teutot = (teui.groupby(["port","year","quarter"], dropna=False)["teu_i_q_sum"]
+    teutot = (teui.groupby(["port","year","quarter"], dropna=False, observed=True, sort=False)["teu_i_q_sum"]
                  .sum(min_count=1).reset_index().rename(columns={"teu_i_q_sum":"teu_port_q"}))
     shares = teui.merge(teutot, on=["port","year","quarter"], how="left")
     shares["share_i_q"] = np.where(shares["teu_port_q"]>0, shares["teu_i_q_sum"]/shares["teu_port_q"], np.nan)
-    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False)["pi_teu_per_hour_i_y"]
+    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False, observed=True, sort=False)["pi_teu_per_hour_i_y"]
                 .first().reset_index())
     shares = shares.merge(pi_i_y, on=["port","terminal","year"], how="left")
     pi_port_q = (shares.assign(pi_weighted=lambda d: d["share_i_q"]*d["pi_teu_per_hour_i_y"])
-                      .groupby(["port","year","quarter"], dropna=False)["pi_weighted"]
+                      .groupby(["port","year","quarter"], dropna=False, observed=True, sort=False)["pi_weighted"]
                       .sum(min_count=1).reset_index().rename(columns={"pi_weighted":"Pi_p_q"}))
 
     months = w_final[["port","year","month","month_index"]].drop_duplicates()
-    months["quarter"] = months["month"].apply(_quarter_from_month)
+    months["quarter"] = _quarters_from_months(months["month"])
     pi_pm = months.merge(pi_port_q, on=["port","year","quarter"], how="left").rename(columns={"Pi_p_q":"pi_p_y_mixbase"})
 
     # LP mix at port-month
@@ -559,7 +730,7 @@ def build_port_mix_LP(w_final: pd.DataFrame, l_proxy: pd.DataFrame,
                             on=["port","year","month","month_index"], how="left")
 
     # Identity LP (sparse post-reform)
-    L_port_m = (l_proxy.groupby(["port","year","month"], dropna=False)["l_hours_i_m"]
+    L_port_m = (l_proxy.groupby(["port","year","month"], dropna=False, observed=True)["l_hours_i_m"]
                         .sum(min_count=1).reset_index().rename(columns={"l_hours_i_m":"l_port_m"}))
     lp_id = L_port_m.merge(teu_pm, on=["port","year","month"], how="left")
     lp_id["lp_port_month_id"] = np.where(lp_id["l_port_m"]>0, lp_id["teu_p_m"]/lp_id["l_port_m"], np.nan)
@@ -593,8 +764,8 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
 
     term = term_m.copy()
     # ensure month_index present and numeric safe
-    term["month_index"] = (term["year"].astype("float")*12 + term["month"].astype("float")).round().astype("Int64")
-    term["quarter"] = term["month"].apply(_quarter_from_month)
+    term["month_index"] = _month_index(term["year"], term["month"])
+    term["quarter"] = _quarters_from_months(term["month"])
     # freq marker
     term["freq"] = np.where(term["port"].map(cut_map).astype("Int64").lt(term["month_index"]), "Q", "M")
 
@@ -602,7 +773,7 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
     term_Q = term[term["freq"]=="Q"].copy()
 
     if not term_Q.empty:
-        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False).agg(
+        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False, observed=True, sort=False).agg(
             pi_teu_per_hour_i_y=("pi_teu_per_hour_i_y","first"),
             w_final=("w_final","mean"),
             teu_i_m=("teu_i_m","sum"),
@@ -611,7 +782,7 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
         ).reset_index()
         q_to_month = {"Q1":3,"Q2":6,"Q3":9,"Q4":12}
         agg["month"] = agg["quarter"].map(q_to_month).astype("Int64")
-        agg["month_index"] = (agg["year"].astype("float")*12 + agg["month"].astype("float")).round().astype("Int64")
+        agg["month_index"] = _month_index(agg["year"], agg["month"])
         agg["freq"] = "Q"
         term_Q_out = agg[["port","terminal","year","quarter","month","month_index","freq",
                           "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
@@ -627,71 +798,116 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
     out = pd.concat([term_M_out, term_Q_out], ignore_index=True).sort_values(["port","terminal","year","month"]).reset_index(drop=True)
     return out
 
+PANEL_COLS = ["level","port","terminal","year","month","month_index","quarter","freq",
+              "TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id","tons_source"]
+_PANEL_INT_COLS = {"year","month","month_index"}
+_PANEL_STR_COLS = {"level","port","terminal","quarter","freq","w_source","tons_source"}
+
 def build_panel_mixedfreq(lp_port: pd.DataFrame, lp_id: pd.DataFrame,
                           term_m: pd.DataFrame, term_qview: pd.DataFrame) -> pd.DataFrame:
-    port = lp_port.copy()
-    port["level"] = "port"; port["terminal"] = pd.NA
-    port["Pi"] = port["pi_p_y_mixbase"]
-    port["L_hours"] = port["l_port_m"]
-    port["LP_mix"] = port["lp_port_month_mix"]
-    port = port.merge(lp_id, on=["port","year","month"], how="left")
-    port = port.rename(columns={"lp_port_month_id":"LP_id"})
-    port["quarter"] = port["month"].apply(_quarter_from_month)
-    port["TEU"] = port["teu_p_m"]; port["tons"] = port["tons_p_m"]
-    port["w"] = port["w_final"]; port["w_source"] = port["w_source"].astype("object")
-    port["freq"] = "M"
-    port_panel = port[["level","port","terminal","year","month","month_index","quarter","freq",
-                       "TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id","tons_source"]]
-
-    term = term_qview.copy()
-    term["level"] = "terminal"
-    term = term.rename(columns={
-        "pi_teu_per_hour_i_y":"Pi",
-        "l_hours_i_m":"L_hours",
-        "lp_term_month_mixadjusted":"LP_mix",
-        "teu_i_m":"TEU",
-        "w_final":"w",
-    })
-    term["LP_id"] = pd.NA
-    term["tons"] = pd.NA
-    term["w_source"] = pd.NA
-    term["tons_source"] = pd.NA
-    term_panel = term[["level","port","terminal","year","month","month_index","quarter","freq",
-                       "TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id","tons_source"]]
-
-    panel = pd.concat([port_panel, term_panel], ignore_index=True).sort_values(["level","port","terminal","year","month"]).reset_index(drop=True)
-    return panel
+    # Merge only the key columns; when the identity keys are unique the result
+    # lines up 1:1 with lp_port and the port block is read straight from it
+    keys = ["port","year","month"]
+    ids = lp_port[keys].merge(lp_id[keys + ["lp_port_month_id"]], on=keys, how="left")
+    if len(ids) == len(lp_port):
+        port = lp_port
+        port_lp_id = ids["lp_port_month_id"].set_axis(lp_port.index)
+    else:
+        port = lp_port.merge(lp_id, on=keys, how="left")
+        port_lp_id = port["lp_port_month_id"]
+    port_quarter = _quarters_from_months(port["month"])
+    term = term_qview
+
+    # panel column -> (port source, terminal source): a column name, a Series,
+    # a literal wrapped in a 1-tuple, or None to leave that block NA
+    src = {
+        "level":       (("port",), ("terminal",)),
+        "port":        ("port", "port"),
+        "terminal":    (None, "terminal"),
+        "year":        ("year", "year"),
+        "month":       ("month", "month"),
+        "month_index": ("month_index", "month_index"),
+        "quarter":     (port_quarter, "quarter"),
+        "freq":        (("M",), "freq"),
+        "TEU":         ("teu_p_m", "teu_i_m"),
+        "tons":        ("tons_p_m", None),
+        "w":           ("w_final", "w_final"),
+        "w_source":    ("w_source", None),
+        "Pi":          ("pi_p_y_mixbase", "pi_teu_per_hour_i_y"),
+        "L_hours":     ("l_port_m", "l_hours_i_m"),
+        "LP_mix":      ("lp_port_month_mix", "lp_term_month_mixadjusted"),
+        "LP_id":       (port_lp_id, None),
+        "tons_source": ("tons_source", None),
+    }
+
+    # One allocation per output column; port rows fill [:n_p], terminal rows [n_p:]
+    n_p, n_t = len(port), len(term)
+    cols: Dict[str, object] = {}
+    for c in PANEL_COLS:
+        is_str = c in _PANEL_STR_COLS
+        arr = np.empty(n_p + n_t, dtype=object) if is_str else np.full(n_p + n_t, np.nan, dtype="float64")
+        for sl, frame, spec in ((slice(0, n_p), port, src[c][0]), (slice(n_p, None), term, src[c][1])):
+            if spec is None:
+                continue
+            if isinstance(spec, tuple):
+                arr[sl] = spec[0]
+                continue
+            v = spec if isinstance(spec, pd.Series) else frame[spec]
+            if is_str:
+                arr[sl] = v.astype("object").where(v.notna(), None).to_numpy()
+            else:
+                arr[sl] = pd.to_numeric(v, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        cols[c] = arr
+
+    # Order rows once on the raw arrays (stable, NA last, as sort_values would) and
+    # take every column through it, instead of building then re-sorting a frame
+    def _sort_key(a):
+        if a.dtype != object:
+            return a
+        codes, _ = pd.factorize(a, sort=True)
+        return np.where(codes < 0, codes.max(initial=0) + 1, codes)
+    order = np.lexsort(tuple(_sort_key(cols[c]) for c in ("month","year","terminal","port","level")))
+    for c in PANEL_COLS:
+        cols[c] = pd.array(cols[c][order], dtype="Int64") if c in _PANEL_INT_COLS else cols[c][order]
+
+    return pd.DataFrame(cols, copy=False)
 
 def run_qa(lp_port: pd.DataFrame, term_m: pd.DataFrame, w_final: pd.DataFrame,
            min_port_year_coverage: float = 0.5) -> pd.DataFrame:
-    rows = []
+    check_names, results, details = [], [], []
     def assert_unique(df, keys, name):
-        c = df.duplicated(keys).sum()
-        rows.append({"check":f"unique_keys_{name}", "result":"pass" if c==0 else "fail", "detail":f"duplicates={int(c)} keys={keys}"})
+        c = int(df.duplicated(keys).sum())
+        check_names.append(f"unique_keys_{name}")
+        results.append("pass" if c==0 else "fail")
+        details.append(f"duplicates={c} keys={keys}")
     assert_unique(lp_port, ["port","year","month"], "lp_port")
     assert_unique(term_m, ["port","terminal","year","month"], "lp_term_monthly")
     assert_unique(w_final, ["port","year","month"], "w_final")
 
     # Annual preservation
-    g = lp_port.groupby(["port","year"], dropna=False).agg(
+    g = lp_port.groupby(["port","year"], dropna=False, observed=True).agg(
         lp_mean=("lp_port_month_mix","mean"),
         pi_mean=("pi_p_y_mixbase","mean")
     ).reset_index()
     g["rel_err"] = np.abs(g["lp_mean"]-g["pi_mean"])/g["pi_mean"].replace(0,np.nan)
-    for _, r in g.iterrows():
-        rows.append({"check":"annual_preservation","port":r["port"],"year":int(r["year"]),
-                     "lp_mean":float(r["lp_mean"]) if pd.notna(r["lp_mean"]) else None,
-                     "pi_mean":float(r["pi_mean"]) if pd.notna(r["pi_mean"]) else None,
-                     "rel_err":float(r["rel_err"]) if pd.notna(r["rel_err"]) else None,
-                     "result":"pass" if (pd.isna(r["rel_err"]) or r["rel_err"]<=1e-6) else "warn"})
+    annual = g.assign(check="annual_preservation",
+                      result=np.where(g["rel_err"].isna() | (g["rel_err"]<=1e-6), "pass", "warn"))
+    annual = annual[["check","port","year","lp_mean","pi_mean","rel_err","result"]]
 
     # Coverage check
     cov = lp_port.assign(ok=lp_port["lp_port_month_mix"].notna()) \
-                 .groupby(["port","year"], dropna=False)["ok"].mean().reset_index(name="coverage")
-    for _, r in cov.iterrows():
-        rows.append({"check":"coverage","port":r["port"],"year":int(r["year"]), "coverage":float(r["coverage"]),
-                     "result":"pass" if r["coverage"]>=min_port_year_coverage else "fail"})
-    return pd.DataFrame(rows)
+                 .groupby(["port","year"], dropna=False, observed=True)["ok"].mean().reset_index(name="coverage")
+    cov = cov.assign(check="coverage",
+                     result=np.where(cov["coverage"]>=min_port_year_coverage, "pass", "fail"))
+    cov = cov[["check","port","year","coverage","result"]]
+
+    uniq = pd.DataFrame({
+        "check": np.array(check_names, dtype=object),
+        "result": np.array(results, dtype=object),
+        "detail": np.array(details, dtype=object),
+    })
+    qa = pd.concat([uniq, annual, cov], ignore_index=True)
+    return qa.reindex(columns=["check","result","detail","port","year","lp_mean","pi_mean","rel_err","coverage"])
 
 # ------------------------------- Main ----------------------------------------
 
@@ -709,16 +925,29 @@ def main():
     ap.add_argument("--allocate_allports", action="store_true", help="Allocate All-Ports tons to ports by TEU shares if port totals and terminal sums both missing.")
     ap.add_argument("--min_port_year_coverage", type=float, default=0.5, help="Fail if LP_port_month_mix coverage below this share.")
     ap.add_argument("--validate-only", action="store_true", help="Run validations only; do not write outputs.")
+    ap.add_argument("--no-cache", dest="no_cache", action="store_true", help="Bypass the parquet cache of normalized inputs (out_dir/_cache).")
     args = ap.parse_args()
 
     try:
         inp = load_inputs(args)
         columns_map = _read_columns_map(inp.columns_map_path)
 
-        # Load inputs
-        l_proxy = load_L_proxy(inp.l_proxy_path, columns_map)
-        teu_pm, teu_pq = load_teu(inp.teu_mq_path, columns_map)
-        tons_port_m, tons_term_m, tons_allports_m = load_tons(inp.tons_path, columns_map, inp.allocate_allports, teu_pm, l_proxy)
+        # Load inputs (parquet-cached per input mtime+size and column map)
+        def _map_key(path: str) -> str:
+            return json.dumps(columns_map.get(os.path.basename(path)) or columns_map.get(path) or {}, sort_keys=True)
+
+        l_proxy = _cached_load(inp.l_proxy_path, lambda: load_L_proxy(inp.l_proxy_path, columns_map),
+                               inp.cache_dir, _map_key(inp.l_proxy_path))
+        teu_pm, teu_pq = _cached_load(inp.teu_mq_path, lambda: load_teu(inp.teu_mq_path, columns_map),
+                                      inp.cache_dir, _map_key(inp.teu_mq_path))
+        tons_extra = _map_key(inp.tons_path)
+        if inp.allocate_allports:
+            # allocation shares come from the TEU / L_Proxy frames, so their inputs key the cache too
+            tons_extra += f"|alloc|{_file_key(inp.teu_mq_path)}|{_file_key(inp.l_proxy_path)}"
+        tons_port_m, tons_term_m, tons_allports_m = _cached_load(
+            inp.tons_path,
+            lambda: load_tons(inp.tons_path, columns_map, inp.allocate_allports, teu_pm, l_proxy),
+            inp.cache_dir, tons_extra)
 
         # Crosswalk
         crosswalk_ports(l_proxy, tons_port_m, teu_pm, teu_pq)
@@ -750,19 +979,13 @@ def main():
         # QA + fail-fast coverage report (non-fatal; we only print)
         qa = run_qa(lp_port, term_m, w_final, min_port_year_coverage=inp.min_port_year_coverage)
 
-        # Write outputs
-        def _write_tsv(df: pd.DataFrame, name: str) -> str:
-            path = os.path.join(inp.out_dir, name)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            df.to_csv(path, sep="\t", index=False)
-            return path
-
-        _write_tsv(lp_port, "LP_port_month_mixadjusted.tsv")
-        _write_tsv(lp_id, "LP_port_month_identity.tsv")
-        _write_tsv(term_m, "LP_terminal_month_mixadjusted.tsv")
-        _write_tsv(term_qview, "LP_terminal_quarter_mixadjusted.tsv")
-        _write_tsv(panel, "LP_panel_mixedfreq.tsv")
-        _write_tsv(qa, "qa_lp_report.tsv")
+        # Write outputs (TSV + parquet sidecar)
+        _write_tsv(lp_port, os.path.join(inp.out_dir, "LP_port_month_mixadjusted.tsv"))
+        _write_tsv(lp_id, os.path.join(inp.out_dir, "LP_port_month_identity.tsv"))
+        _write_tsv(term_m, os.path.join(inp.out_dir, "LP_terminal_month_mixadjusted.tsv"))
+        _write_tsv(term_qview, os.path.join(inp.out_dir, "LP_terminal_quarter_mixadjusted.tsv"))
+        _write_tsv(panel, os.path.join(inp.out_dir, "LP_panel_mixedfreq.tsv"))
+        _write_tsv(qa, os.path.join(inp.out_dir, "qa_lp_report.tsv"))
 
         meta = {
             "timestamp_utc": pd.Timestamp.utcnow().isoformat(),
@@ -9,6 +9,7 @@ Key improvements over V3/V3a:
 - Optional --year_min / --year_max to clip if desired (default: no clipping).
 - Winsorization safe for small groups (n<3 => no clipping, just identity).
 - Optional --pi_fill to forward/back-fill terminal-year Pi within terminal ('none'|'ffill'|'bfill'|'both').
+- Optional --format to write outputs as TSV, zstd Parquet, or both (default).
 
 Granularity (unchanged):
 - Ports: monthly; w = monthly tons/TEU where available, else quarterly tons / quarterly TEU broadcast to months. Provenance in w_source.
@@ -23,7 +24,7 @@ Optional:
   columns_map.json (header normalization)
   --allocate_allports to split "All Ports" tons to Ashdod/Haifa/Eilat by TEU shares (if needed)
 
-Outputs (TSV in out_dir, default Data/LP/):
+Outputs (TSV and/or .parquet in out_dir, default Data/LP/):
   LP_port_month_mixadjusted.tsv
   LP_port_month_identity.tsv
   LP_terminal_month_mixadjusted.tsv
@@ -38,37 +39,83 @@ import json
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+try:  # optional: faster monthly winsorize + normalize step in compute_w
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:  # optional: multithreaded TSV parsing in _read_tsv_guess
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+if int(pd.__version__.split(".")[0]) < 3:  # always on from pandas 3
+    pd.options.mode.copy_on_write = True
+
 # --------------------------- Errors & helpers --------------------------------
 
 class ValidationError(Exception):
     pass
 
+# Provenance labels as fixed categoricals (codes, not one str object per row)
+W_SRC_DTYPE = pd.CategoricalDtype(["monthly","quarterly"])
+TONS_SRC_DTYPE = pd.CategoricalDtype(["no_source","port_total","sum_terminals"])
+
 def _find_first_existing(paths: List[str]) -> Optional[str]:
     for p in paths:
         if p and os.path.exists(p):
             return p
     return None
 
+def _read_tsv_pyarrow(path: str) -> pd.DataFrame:
+    parse = pa_csv.ParseOptions(delimiter="\t")
+    table = pa_csv.read_csv(path, parse_options=parse,
+                            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+    # pandas keeps date-like text as strings (e.g. 'Month-Year'); re-read those columns as such
+    dated = {f.name: pa.string() for f in table.schema
+             if pa.types.is_temporal(f.type)}
+    if dated:
+        table = pa_csv.read_csv(path, parse_options=parse,
+                                convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, column_types=dated))
+    return table.to_pandas()
+
 def _read_tsv_guess(path: str) -> pd.DataFrame:
+    if pa_csv is not None:
+        try:
+            return _read_tsv_pyarrow(path)
+        except Exception:
+            pass  # ragged or oddly quoted files: let pandas have a go
     try:
         return pd.read_csv(path, sep="\t", engine="python")
     except Exception as e:
         raise ValidationError(f"Failed to read TSV at {path}: {e}")
 
-def _quarter_from_month(m) -> Optional[str]:
-    if pd.isna(m):
-        return None
-    try:
-        q = (int(m)-1)//3 + 1
-        return f"Q{q}"
-    except Exception:
-        return None
+def _quarters_from_months(month: pd.Series) -> pd.Series:
+    """Month -> 'Q1'..'Q4' per row with integer arithmetic; None where the month is NA."""
+    m = pd.to_numeric(month, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    ok = ~np.isnan(m)
+    q = (np.trunc(m[ok]).astype(np.int64) - 1) // 3 + 1
+    # stringify once per distinct quarter, not per row
+    uq, inv = np.unique(q, return_inverse=True)
+    out = np.full(len(m), None, dtype=object)
+    out[ok] = np.array([f"Q{k}" for k in uq], dtype=object)[inv.reshape(-1)]
+    return pd.Series(out, index=month.index, dtype=object)
+
+def _small_int(x: pd.Series) -> pd.Series:
+    """Coerce to nullable integers in the narrowest signed dtype that fits (month -> Int8, year -> Int16)."""
+    return pd.to_numeric(pd.to_numeric(x, errors="coerce").astype("Int64"), downcast="integer")
+
+def _month_index(year: pd.Series, month: pd.Series) -> pd.Series:
+    """year*12 + month in nullable Int32 (no float round-trip); NA where either part is NA."""
+    return year.astype("Int32")*12 + month.astype("Int32")
 
 def _parse_quarter_field(q) -> Optional[int]:
     if pd.isna(q):
@@ -92,28 +139,63 @@ def winsorize_group_safe(df: pd.DataFrame, value_col: str, by: List[str], lower=
     Groupwise winsorization with small-n safety:
       - if a group has <3 non-NA rows, return original values (no clipping).
     """
+    return _winsorize_group_mean(df, value_col, by, lower, upper)[0]
+
+def _winsorize_group_mean(df: pd.DataFrame, value_col: str, by: List[str], lower=0.01, upper=0.99) -> Tuple[pd.Series, np.ndarray]:
+    """
+    winsorize_group_safe, plus the per-row mean of the winsorized values over the same groups.
+    The keys are grouped once; the mean is a bincount over the group ids.
+    """
     out = df[value_col].astype("float64").copy()
     if out.empty:
-        return out
-    # compute group sizes of non-na
-    nn = df.groupby(by, dropna=False)[value_col].apply(lambda s: s.notna().sum()).reindex(df.set_index(by).index, method=None).reset_index(drop=True)
-    # default: identity
-    clipped = out.copy()
-    # where size >=3, clip
-    mask = nn >= 3
-    if mask.any():
-        sub = df.loc[mask, by + [value_col]].copy()
-        g = sub.groupby(by, dropna=False)[value_col]
-        qs = g.quantile([lower, upper]).unstack(level=-1).rename(columns={lower:"q_low", upper:"q_high"})
-        # map back
-        key = pd.MultiIndex.from_frame(sub[by])
-        ql = qs.reindex(key)["q_low"].to_numpy()
-        qh = qs.reindex(key)["q_high"].to_numpy()
-        vals = sub[value_col].to_numpy(dtype="float64")
-        vals = np.where(~np.isnan(vals) & ~np.isnan(ql), np.maximum(vals, ql), vals)
-        vals = np.where(~np.isnan(vals) & ~np.isnan(qh), np.minimum(vals, qh), vals)
-        clipped.loc[mask] = vals
-    return pd.Series(clipped, index=df.index)
+        return out, np.empty(0, dtype="float64")
+    g = df.groupby(by, dropna=False, observed=True, sort=False)[value_col]
+    # non-NA group sizes and quantile bounds, broadcast straight back to the rows
+    nn = g.transform("count").to_numpy()
+    ql = g.transform("quantile", lower).to_numpy(dtype="float64", na_value=np.nan)
+    qh = g.transform("quantile", upper).to_numpy(dtype="float64", na_value=np.nan)
+    # groups with <3 non-NA rows, rows with a missing key and NaN bounds are left
+    # unclipped; NaN values stay NaN
+    skip = (nn < 3) | df[by].isna().any(axis=1).to_numpy()
+    ql = np.where(skip | np.isnan(ql), -np.inf, ql)
+    qh = np.where(skip | np.isnan(qh), np.inf, qh)
+    r = np.clip(out.to_numpy(), ql, qh)
+
+    ids = g.ngroup().to_numpy()
+    ok = ~np.isnan(r)
+    sums = np.bincount(ids[ok], weights=r[ok], minlength=g.ngroups)
+    cnt = np.bincount(ids[ok], minlength=g.ngroups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(cnt > 0, sums / cnt, np.nan)
+    return pd.Series(r, index=df.index), mean[ids]
+
+def fast_groupsum(df: pd.DataFrame, by: List[str], val: str, name: Optional[str] = None) -> pd.DataFrame:
+    """
+    Equivalent of df.groupby(by, dropna=False, observed=True)[val].sum(min_count=1).reset_index():
+    one lexsort of the key codes, then contiguous-segment sums with np.add.reduceat.
+    Groups come out in groupby order (categories/values sorted, missing keys last).
+    """
+    name = name or val
+    if df.empty:
+        return pd.DataFrame({**{k: df[k] for k in by}, name: pd.Series(dtype="float64")})
+    codes = []
+    for k in by:
+        col = df[k]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            c = col.cat.codes.to_numpy().astype("int64")
+        else:
+            c = pd.factorize(col, sort=True)[0].astype("int64")
+        codes.append(np.where(c < 0, c.max() + 1, c))  # missing key sorts last
+    order = np.lexsort(codes[::-1])
+    cs = np.column_stack([c[order] for c in codes])
+    starts = np.flatnonzero(np.r_[True, (cs[1:] != cs[:-1]).any(axis=1)])
+    v = df[val].to_numpy(dtype="float64", na_value=np.nan)[order]
+    ok = ~np.isnan(v)
+    sums = np.add.reduceat(np.where(ok, v, 0.0), starts)
+    counts = np.add.reduceat(ok.astype("int64"), starts)
+    out = df[by].take(order[starts]).reset_index(drop=True).infer_objects()  # object keys as groupby infers them
+    out[name] = np.where(counts > 0, sums, np.nan)
+    return out
 
 def _pick_cols(df: pd.DataFrame, wanted: List[str], contains_ok: bool = True) -> Optional[str]:
     for cand in wanted:
@@ -143,6 +225,18 @@ def _norm_port(s: str) -> str:
     # pass through terminals names unchanged (e.g., "Ashdod HCT", "Haifa SIPG")
     return s2
 
+def _norm_port_cat(s: pd.Series) -> pd.Series:
+    """
+    Same result as s.astype(str).map(_norm_port).astype("category"), but _norm_port runs once
+    per distinct label and the rows are remapped through integer codes.
+    """
+    cats = s.astype(str).astype("category")
+    new = [_norm_port(c) for c in cats.cat.categories]
+    final = pd.Index(new, dtype=cats.cat.categories.dtype).unique().sort_values()
+    remap = np.append(final.get_indexer(new), -1)  # code -1 (missing) stays missing
+    return pd.Series(pd.Categorical.from_codes(remap[cats.cat.codes.to_numpy()], categories=final),
+                     index=s.index, name=s.name)
+
 def _read_columns_map(path: Optional[str]) -> Dict[str, Dict[str, str]]:
     if not path or not os.path.exists(path):
         return {}
@@ -171,6 +265,7 @@ class Inputs:
     year_min: Optional[int] = None
     year_max: Optional[int] = None
     pi_fill: str = "none"  # 'none'|'ffill'|'bfill'|'both'
+    out_format: str = "both"  # 'tsv'|'parquet'|'both'
 
 def load_inputs(args) -> Inputs:
     base = args.base_dir
@@ -232,6 +327,7 @@ def load_inputs(args) -> Inputs:
         year_min=year_min,
         year_max=year_max,
         pi_fill=pi_fill,
+        out_format=str(args.format).lower(),
     )
 
 def _apply_header_map(df: pd.DataFrame, file_basename: str, columns_map: Dict[str, Dict[str, str]]) -> pd.DataFrame:
@@ -271,38 +367,35 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]], pi_fill: str)
         raise ValidationError("L_Proxy: Could not locate 'port' or 'terminal' columns. Use columns_map.json or rename headers.")
 
     g = pd.DataFrame({
-        "port": (df[port_col].astype(str).map(_norm_port) if port_col else pd.NA),
-        "terminal": (df[term_col].astype(str).str.strip() if term_col else pd.NA),
-        "year": pd.to_numeric(df[year_col], errors="coerce").astype("Int64"),
-        "month": pd.to_numeric(df[month_col], errors="coerce").astype("Int64"),
+        "port": (_norm_port_cat(df[port_col]) if port_col else pd.NA),
+        "terminal": (df[term_col].astype(str).str.strip().astype("category") if term_col else pd.NA),
+        "year": _small_int(df[year_col]),
+        "month": _small_int(df[month_col]),
         "l_hours_i_m": pd.to_numeric(df[l_hours_col], errors="coerce") if l_hours_col else np.nan,
         "teu_i_m": pd.to_numeric(df[teu_i_m_col], errors="coerce") if teu_i_m_col else np.nan,
         "pi_teu_per_hour_i_y": pd.to_numeric(df[pi_col], errors="coerce") if pi_col else np.nan,
     })
     if port_col is None and term_col:
-        g["port"] = g["terminal"].astype(str).str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)", expand=False)
+        g["port"] = g["terminal"].astype(str).str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)", expand=False).astype("category")
 
     if quarter_col:
         qnum = df[quarter_col].apply(_parse_quarter_field)
         g["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
     else:
-        g["quarter"] = g["month"].apply(_quarter_from_month)
+        g["quarter"] = _quarters_from_months(g["month"])
     g["operating"] = df[oper_col].astype(str) if oper_col else pd.NA
 
     # Optional Pi filling within each terminal
     if pi_fill in {"ffill","bfill","both"}:
         g = g.sort_values(["port","terminal","year"]).reset_index(drop=True)
-        def _fill_pi(df_):
-            s = df_["pi_teu_per_hour_i_y"]
-            if pi_fill in {"ffill","both"}:
-                s = s.ffill()
-            if pi_fill in {"bfill","both"}:
-                s = s.bfill()
-            df_["pi_teu_per_hour_i_y"] = s
-            return df_
-        g = g.groupby(["port","terminal"], dropna=False, group_keys=False).apply(_fill_pi)
-
-    g["month_index"] = (g["year"].astype("float")*12 + g["month"].astype("float")).astype("Int64")
+        gb = g.groupby(["port","terminal"], dropna=False, observed=True, sort=False)["pi_teu_per_hour_i_y"]
+        if pi_fill in {"ffill","both"}:
+            g["pi_teu_per_hour_i_y"] = gb.ffill()
+            gb = g.groupby(["port","terminal"], dropna=False, observed=True, sort=False)["pi_teu_per_hour_i_y"]
+        if pi_fill in {"bfill","both"}:
+            g["pi_teu_per_hour_i_y"] = gb.bfill()
+
+    g["month_index"] = _month_index(g["year"], g["month"])
     return g
 
 def load_tons_ports_and_terminals(path: str, columns_map: Dict[str, Dict[str,str]], allocate_allports: bool) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -327,20 +420,18 @@ def load_tons_ports_and_terminals(path: str, columns_map: Dict[str, Dict[str,str
 
     # If no explicit year/month, parse from period-like column (e.g., "MM-YYYY")
     if (year_col is None or month_col is None) and period_col:
-        tmp = df.copy()
-        m = tmp[period_col].astype(str).str.extract(r"(?:(\d{2})[-/](\d{4}))|(?:(\d{4})[-/](\d{2}))")
+        m = df[period_col].astype(str).str.extract(r"(?:(\d{2})[-/](\d{4}))|(?:(\d{4})[-/](\d{2}))")
         mm = pd.to_numeric(m[0].fillna(m[3]), errors="coerce")
         yy = pd.to_numeric(m[1].fillna(m[2]), errors="coerce")
-        tmp["month"] = mm.astype("Int64")
-        tmp["year"] = yy.astype("Int64")
+        df["month"] = mm.astype("Int64")
+        df["year"] = yy.astype("Int64")
         year_col = "year"; month_col = "month"
-        df = tmp
 
     tmp = pd.DataFrame({
-        "port": df[port_col].astype(str).map(_norm_port) if port_col else pd.NA,
-        "terminal": (df[term_col].astype(str).str.strip() if term_col else pd.NA),
-        "year": pd.to_numeric(df[year_col], errors="coerce").astype("Int64"),
-        "month": pd.to_numeric(df[month_col], errors="coerce").astype("Int64"),
+        "port": _norm_port_cat(df[port_col]) if port_col else pd.NA,
+        "terminal": (df[term_col].astype(str).str.strip().astype("category") if term_col else pd.NA),
+        "year": _small_int(df[year_col]),
+        "month": _small_int(df[month_col]),
         "tons_raw": pd.to_numeric(df[tons_col], errors="coerce"),
     })
 
@@ -351,33 +442,33 @@ def load_tons_ports_and_terminals(path: str, columns_map: Dict[str, Dict[str,str
         tmp["tons"] = tmp["tons_raw"]
 
     is_all_ports = tmp["port"].astype(str).str.lower().isin(["all ports","all_ports","allports","all"])
-    tons_all = tmp.loc[is_all_ports].copy()
-    tons_port_term = tmp.loc[~is_all_ports].copy()
+    tons_all = tmp.loc[is_all_ports]
+    tons_port_term = tmp.loc[~is_all_ports]
 
     is_port_total = tons_port_term["terminal"].isna() | (tons_port_term["terminal"].astype(str).str.strip()=="") | (tons_port_term["terminal"].astype(str).str.lower().isin(["nan","none","na"]))
-    tons_port = tons_port_term.loc[is_port_total].copy()
+    tons_port = tons_port_term.loc[is_port_total]
     tons_port["tons_source"] = "port_total"
 
-    tons_term = tons_port_term.loc[~is_port_total].copy()
-    tons_term_sum = tons_term.groupby(["port","year","month"], dropna=False)["tons"].sum(min_count=1).reset_index().rename(columns={"tons":"tons_sum_terminals"})
+    tons_term = tons_port_term.loc[~is_port_total]
+    tons_term_sum = tons_term.groupby(["port","year","month"], dropna=False, observed=True)["tons"].sum(min_count=1).reset_index().rename(columns={"tons":"tons_sum_terminals"})
 
     tons_port_pref = tons_port[["port","year","month","tons","tons_source"]].rename(columns={"tons":"tons_p_m"})
     key = pd.concat([tons_port_pref[["port","year","month"]], tons_term_sum[["port","year","month"]]], ignore_index=True).drop_duplicates()
     merged = key.merge(tons_port_pref, on=["port","year","month"], how="left").merge(tons_term_sum, on=["port","year","month"], how="left")
     merged["tons_p_m"] = merged["tons_p_m"].combine_first(merged["tons_sum_terminals"])
-    merged["tons_source"] = np.where(
-        merged["tons_p_m"].notna(), "port_total",
-        np.where(merged["tons_sum_terminals"].notna(), "sum_terminals", "no_source")
-    ).astype(object)
+    merged["tons_source"] = pd.Categorical.from_codes(np.where(
+        merged["tons_p_m"].notna(), 1,
+        np.where(merged["tons_sum_terminals"].notna(), 2, 0)
+    ), dtype=TONS_SRC_DTYPE)
 
     if allocate_allports and not tons_all.empty:
         pass  # left as is for now
 
-    tons_port_m = merged[["port","year","month","tons_p_m","tons_source"]].copy()
-    tons_port_m["month_index"] = (tons_port_m["year"].astype("float")*12 + tons_port_m["month"].astype("float")).astype("Int64")
+    tons_port_m = merged[["port","year","month","tons_p_m","tons_source"]]
+    tons_port_m["month_index"] = _month_index(tons_port_m["year"], tons_port_m["month"])
 
-    tons_term_m = tons_term[["port","terminal","year","month","tons"]].rename(columns={"tons":"tons_i_m"}).copy()
-    tons_allports_m = tons_all[["year","month","tons"]].rename(columns={"tons":"tons_allports_m"}).copy()
+    tons_term_m = tons_term[["port","terminal","year","month","tons"]].rename(columns={"tons":"tons_i_m"})
+    tons_allports_m = tons_all[["year","month","tons"]].rename(columns={"tons":"tons_allports_m"})
     return tons_port_m, tons_term_m, tons_allports_m
 
 def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[str,str]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
@@ -398,32 +489,32 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
         raise ValidationError("TEU file: no TEU value column found (expected 'teu' or similar)."
 
 )
-    dfc = df.copy()
-    dfc["port"] = dfc[port_col].astype(str).map(_norm_port)
-    dfc["year"] = pd.to_numeric(dfc[year_col], errors="coerce").astype("Int64")
+    dfc = df
+    dfc["port"] = _norm_port_cat(dfc[port_col])
+    dfc["year"] = _small_int(dfc[year_col])
 
     teu_m = pd.DataFrame(columns=["port","year","month","teu_p_m"])
     if month_col and month_col in dfc.columns:
-        mpart = dfc[dfc[month_col].notna()].copy()
+        mpart = dfc[dfc[month_col].notna()]
         if not mpart.empty:
-            mpart["month"] = pd.to_numeric(mpart[month_col], errors="coerce").astype("Int64")
+            mpart["month"] = _small_int(mpart[month_col])
             teu_m = mpart[["port","year","month", vcol]].rename(columns={vcol:"teu_p_m"})
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
     else:
         per_col = _pick_cols(dfc, ["period","date","month-year","yyyymm","mm-yyyy"])
         if per_col:
-            mpart = dfc[dfc[per_col].notna()].copy()
+            mpart = dfc[dfc[per_col].notna()]
             m = mpart[per_col].astype(str).str.extract(r"(?:(\d{2})[-/](\d{4}))|(?:(\d{4})[-/](\d{2}))")
             mm = pd.to_numeric(m[0].fillna(m[3]), errors="coerce")
             yy = pd.to_numeric(m[1].fillna(m[2]), errors="coerce")
-            mpart["month"] = mm.astype("Int64")
-            mpart["year"] = yy.astype("Int64")
+            mpart["month"] = _small_int(mm)
+            mpart["year"] = _small_int(yy)
             teu_m = mpart[["port","year","month", vcol]].rename(columns={vcol:"teu_p_m"})
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
 
     teu_q = pd.DataFrame(columns=["port","year","quarter","teu_p_q"])
     if quarter_col and quarter_col in dfc.columns:
-        qpart = dfc[dfc[quarter_col].notna()].copy()
+        qpart = dfc[dfc[quarter_col].notna()]
         if not qpart.empty:
             qnum = qpart[quarter_col].apply(_parse_quarter_field)
             qpart["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
@@ -431,11 +522,11 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
     else:
         per_col = _pick_cols(dfc, ["period","date","year_quarter","yr_qtr","yyyyq","yyyq","yyyyqq"])
         if per_col:
-            qpart = dfc[dfc[per_col].notna()].copy()
+            qpart = dfc[dfc[per_col].notna()]
             qnum = qpart[per_col].apply(_parse_quarter_field)
             yr_guess = pd.to_numeric(qpart[per_col].astype(str).str.extract(r"(\d{4})")[0], errors="coerce")
             qpart["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
-            qpart["year"] = qpart["year"].fillna(yr_guess).astype("Int64")
+            qpart["year"] = _small_int(qpart["year"].astype("Float64").fillna(yr_guess))
             teu_q = qpart[["port","year","quarter", vcol]].rename(columns={vcol:"teu_p_q"})
 
     return teu_m, teu_q
@@ -480,81 +571,127 @@ def validate_inputs(l_proxy: pd.DataFrame, tons_port_m: pd.DataFrame, teu_pm: pd
 
 # ----------------------- Core computations ----------------------------------
 
+def _w_monthly_polars(w_m: pd.DataFrame, lower: float, upper: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Polars version of compute_w's monthly r -> r_winsor -> w_p_m steps, as one lazy query.
+    Matches the pandas path: linear quantiles, no clipping for groups with <3 non-NA
+    rows or a missing key, NA keys grouped together, w_p_m = 1.0 where undefined.
+    """
+    by = ["port","year"]
+    r = pl.col("tons_per_teu")
+    n = r.count().over(by)
+    skip = (n < 3) | pl.col("port").is_null() | pl.col("year").is_null()
+    lo = r.quantile(lower, interpolation="linear").over(by)
+    hi = r.quantile(upper, interpolation="linear").over(by)
+    mean = pl.col("r_winsor").mean().over(by)
+    out = (pl.from_pandas(w_m[by + ["tons_per_teu"]].assign(port=w_m["port"].astype(object))).lazy()
+             .with_columns(pl.when(skip).then(r).otherwise(r.clip(lo, hi)).alias("r_winsor"))
+             .with_columns(pl.when((mean == 0) | mean.is_null()).then(1.0)
+                             .otherwise(pl.col("r_winsor") / mean).fill_null(1.0).alias("w_p_m"))
+             .select("r_winsor", "w_p_m")
+             .collect())
+    return (out["r_winsor"].to_numpy().astype("float64"), out["w_p_m"].to_numpy().astype("float64"))
+
 def compute_w(tons_pm: pd.DataFrame, teu_pm: pd.DataFrame, teu_pq: pd.DataFrame,
               winsor_lower=0.01, winsor_upper=0.99) -> pd.DataFrame:
-    w_m = tons_pm.merge(teu_pm, on=["port","year","month"], how="left")
+    # teu_pm also carries month_index; join only its value so tons_pm's key survives unsuffixed
+    w_m = tons_pm.merge(teu_pm[["port","year","month","teu_p_m"]], on=["port","year","month"], how="left")
     w_m["tons_per_teu"] = np.where(w_m["teu_p_m"]>0, w_m["tons_p_m"]/w_m["teu_p_m"], np.nan)
-    w_m["r_winsor"] = winsorize_group_safe(w_m, "tons_per_teu", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-    mean_by_py = w_m.groupby(["port","year"], dropna=False)["r_winsor"].transform("mean")
-    w_m["w_p_m"] = np.where((mean_by_py==0) | (mean_by_py.isna()), 1.0, w_m["r_winsor"]/mean_by_py)
-    w_m["w_p_m"] = w_m["w_p_m"].fillna(1.0)
-    w_m["w_src_monthly"] = pd.Series(np.where(w_m["tons_per_teu"].notna(), "monthly", None), index=w_m.index, dtype="object")
+    # Winsorize r and normalize by its port-year mean (polars when available)
+    rw = None
+    if pl is not None and not w_m.empty:
+        try:
+            rw = _w_monthly_polars(w_m, winsor_lower, winsor_upper)
+        except Exception as e:
+            print(f"[polars] Falling back to pandas for monthly w: {e}")
+    if rw is not None:
+        w_m["r_winsor"], w_m["w_p_m"] = rw
+    else:
+        w_m["r_winsor"], mean_by_py = _winsorize_group_mean(w_m, "tons_per_teu", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
+        w_m["w_p_m"] = np.where((mean_by_py==0) | np.isnan(mean_by_py), 1.0, w_m["r_winsor"]/mean_by_py)
+        w_m["w_p_m"] = w_m["w_p_m"].fillna(1.0)
+    w_m["w_src_monthly"] = pd.Categorical.from_codes(np.where(w_m["tons_per_teu"].notna(), 0, -1), dtype=W_SRC_DTYPE)
 
     # Quarterly fallback
     if teu_pq.empty:
-        w_qm = tons_pm[["port","year","month","month_index"]].copy()
+        w_qm = tons_pm[["port","year","month","month_index"]]
         w_qm["w_from_q"] = np.nan
-        w_qm["w_src_quarterly"] = np.nan
+        w_qm["w_src_quarterly"] = pd.Categorical.from_codes(np.full(len(w_qm), -1), dtype=W_SRC_DTYPE)
     else:
-        tons_pq = tons_pm.copy()
-        tons_pq["quarter"] = tons_pq["month"].apply(_quarter_from_month)
-        agg_tons = tons_pq.groupby(["port","year","quarter"], dropna=False)["tons_p_m"].sum(min_count=1).reset_index()
+        tons_pq = tons_pm.assign(quarter=_quarters_from_months(tons_pm["month"]))
+        agg_tons = tons_pq.groupby(["port","year","quarter"], dropna=False, observed=True)["tons_p_m"].sum(min_count=1).reset_index()
         rq = agg_tons.merge(teu_pq, on=["port","year","quarter"], how="left")
         rq["r_q"] = np.where(rq["teu_p_q"]>0, rq["tons_p_m"]/rq["teu_p_q"], np.nan)
-        rq["r_q_win"] = winsorize_group_safe(rq, "r_q", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-        mean_by_pyq = rq.groupby(["port","year"], dropna=False)["r_q_win"].transform("mean")
-        rq["w_p_q"] = np.where((mean_by_pyq==0) | (mean_by_pyq.isna()), 1.0, rq["r_q_win"]/mean_by_pyq)
-        map_q_to_m = tons_pm[["port","year","month","month_index"]].copy()
-        map_q_to_m["quarter"] = map_q_to_m["month"].apply(_quarter_from_month)
+        rq["r_q_win"], mean_by_pyq = _winsorize_group_mean(rq, "r_q", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
+        rq["w_p_q"] = np.where((mean_by_pyq==0) | np.isnan(mean_by_pyq), 1.0, rq["r_q_win"]/mean_by_pyq)
+        map_q_to_m = tons_pm[["port","year","month","month_index"]]
+        map_q_to_m["quarter"] = _quarters_from_months(map_q_to_m["month"])
         w_qm = map_q_to_m.merge(rq[["port","year","quarter","w_p_q"]], on=["port","year","quarter"], how="left")
         w_qm = w_qm.rename(columns={"w_p_q":"w_from_q"})
-        w_qm["w_src_quarterly"] = np.where(w_qm["w_from_q"].notna(), "quarterly", np.nan)
-
-    wf = w_m[["port","year","month","month_index","w_p_m","w_src_monthly"]].merge(
-        w_qm[["port","year","month","month_index","w_from_q","w_src_quarterly"]],
-        on=["port","year","month","month_index"], how="outer"
-    ).sort_values(["port","year","month"])
-    wf["w_final"] = wf["w_p_m"].combine_first(wf["w_from_q"])
-    wf["w_source"] = wf["w_src_monthly"].combine_first(wf["w_src_quarterly"])
-    wf["w_source"] = wf["w_source"].astype("object")
+        w_qm["w_src_quarterly"] = pd.Categorical.from_codes(np.where(w_qm["w_from_q"].notna(), 1, -1), dtype=W_SRC_DTYPE)
+
+    # Monthly first, quarterly fallback: align both on the month key and combine
+    # per column; the outer merge is only needed when a key repeats.
+    keys = ["port","year","month","month_index"]
+    wm_i = w_m[keys + ["w_p_m","w_src_monthly"]].set_index(keys)
+    wq_i = w_qm[keys + ["w_from_q","w_src_quarterly"]].set_index(keys)
+    na_keys = w_m[keys].isna().to_numpy().any() or w_qm[keys].isna().to_numpy().any()
+    if wm_i.index.is_unique and wq_i.index.is_unique and not na_keys:
+        wf = pd.DataFrame({
+            "w_final": wm_i["w_p_m"].combine_first(wq_i["w_from_q"]),
+            "w_source": wm_i["w_src_monthly"].combine_first(wq_i["w_src_quarterly"]),
+        }).reset_index().sort_values(["port","year","month"])
+    else:
+        wf = wm_i.reset_index().merge(wq_i.reset_index(), on=keys, how="outer").sort_values(["port","year","month"])
+        wf["w_final"] = wf["w_p_m"].combine_first(wf["w_from_q"])
+        wf["w_source"] = wf["w_src_monthly"].combine_first(wf["w_src_quarterly"])
     return wf[["port","year","month","month_index","w_final","w_source"]]
 
 def build_port_mix_LP(w_final: pd.DataFrame, l_proxy: pd.DataFrame, tons_pm: pd.DataFrame, teu_pm: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    lp = l_proxy.copy()
-    lp["quarter"] = lp["month"].apply(_quarter_from_month)
-    teui = (lp.groupby(["port","terminal","year","quarter"], dropna=False)["teu_i_m"]
-              .sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_i_q_sum"}))
-    teutot = (teui.groupby(["port","year","quarter"], dropna=False)["teu_i_q_sum"]
-                 .sum(min_count=1).reset_index().rename(columns={"teu_i_q_sum":"teu_port_q"}))
+    lp = l_proxy.assign(quarter=_quarters_from_months(l_proxy["month"]))
+    teui = fast_groupsum(lp, ["port","terminal","year","quarter"], "teu_i_m", "teu_i_q_sum")
+    teutot = fast_groupsum(teui, ["port","year","quarter"], "teu_i_q_sum", "teu_port_q")
     shares = teui.merge(teutot, on=["port","year","quarter"], how="left")
     shares["share_i_q"] = np.where(shares["teu_port_q"]>0, shares["teu_i_q_sum"]/shares["teu_port_q"], np.nan)
-    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False)["pi_teu_per_hour_i_y"]
+    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False, observed=True)["pi_teu_per_hour_i_y"]
                 .first().reset_index())
     shares = shares.merge(pi_i_y, on=["port","terminal","year"], how="left")
-    pi_port_q = (shares.assign(pi_weighted=lambda d: d["share_i_q"]*d["pi_teu_per_hour_i_y"])
-                      .groupby(["port","year","quarter"], dropna=False)["pi_weighted"]
-                      .sum(min_count=1).reset_index().rename(columns={"pi_weighted":"Pi_p_q"}))
-    months = w_final[["port","year","month","month_index"]].drop_duplicates()
-    months["quarter"] = months["month"].apply(_quarter_from_month)
+    pi_port_q = fast_groupsum(shares.assign(pi_weighted=shares["share_i_q"]*shares["pi_teu_per_hour_i_y"]),
+                              ["port","year","quarter"], "pi_weighted", "Pi_p_q")
+    keys = ["port","year","month"]
+    months = w_final[keys + ["month_index"]].drop_duplicates()
+    months["quarter"] = _quarters_from_months(months["month"])
     pi_pm = months.merge(pi_port_q, on=["port","year","quarter"], how="left")
     pi_pm = pi_pm.rename(columns={"Pi_p_q":"pi_p_y_mixbase"})
 
-    lp_port = w_final.merge(pi_pm[["port","year","month","pi_p_y_mixbase"]], on=["port","year","month"], how="left")
-    lp_port["lp_port_month_mix"] = lp_port["w_final"] * lp_port["pi_p_y_mixbase"]
+    # teu_pm may carry its own month_index; only its value column is joined
+    teu_v = teu_pm[keys + ["teu_p_m"]]
+    diag = tons_pm[keys + ["month_index","tons_p_m"]].merge(teu_v, on=keys, how="left")
 
-    diag = tons_pm.merge(teu_pm, on=["port","year","month"], how="left")
-    lp_port = lp_port.merge(diag[["port","year","month","month_index","tons_p_m","teu_p_m"]],
-                            on=["port","year","month","month_index"], how="left")
-
-    L_port_m = (l_proxy.groupby(["port","year","month"], dropna=False)["l_hours_i_m"]
-                        .sum(min_count=1).reset_index().rename(columns={"l_hours_i_m":"l_port_m"}))
-    lp_id = L_port_m.merge(teu_pm, on=["port","year","month"], how="left")
+    L_port_m = fast_groupsum(l_proxy, keys, "l_hours_i_m", "l_port_m")
+    lp_id = L_port_m.merge(teu_v, on=keys, how="left")
     lp_id["lp_port_month_id"] = np.where(lp_id["l_port_m"]>0, lp_id["teu_p_m"]/lp_id["l_port_m"], np.nan)
 
-    lp_port = lp_port.merge(L_port_m, on=["port","year","month"], how="left")
+    # Attach every port-month column to w_final in one join. month_index is
+    # year*12+month on both sides, so the (port, year, month) key suffices;
+    # repeated or missing keys keep the sequential merges.
+    pi_i = pi_pm.set_index(keys)["pi_p_y_mixbase"]
+    diag_i = diag.set_index(keys)[["tons_p_m","teu_p_m"]]
+    lpm_i = L_port_m.set_index(keys)["l_port_m"]
+    na_keys = any(d[keys].isna().to_numpy().any() for d in (w_final, pi_pm, diag, L_port_m))
+    if not na_keys and all(x.index.is_unique for x in (pi_i, diag_i, lpm_i)):
+        rhs = pd.concat([pi_i, diag_i, lpm_i], axis=1, join="outer")
+        lp_port = w_final.join(rhs, on=keys)
+    else:
+        lp_port = w_final.merge(pi_pm[keys + ["pi_p_y_mixbase"]], on=keys, how="left")
+        lp_port = lp_port.merge(diag[keys + ["month_index","tons_p_m","teu_p_m"]],
+                                on=keys + ["month_index"], how="left")
+        lp_port = lp_port.merge(L_port_m, on=keys, how="left")
+    lp_port["lp_port_month_mix"] = lp_port["w_final"] * lp_port["pi_p_y_mixbase"]
+
     lp_port = lp_port[["port","year","month","month_index","teu_p_m","tons_p_m","w_final","w_source",
-                       "pi_p_y_mixbase","lp_port_month_mix","l_port_m"]].copy()
-    lp_id = lp_id[["port","year","month","lp_port_month_id"]].copy()
+                       "pi_p_y_mixbase","lp_port_month_mix","l_port_m"]]
+    lp_id = lp_id[["port","year","month","lp_port_month_id"]]
     return lp_port, lp_id
 
 def build_terminal_monthly(w_final: pd.DataFrame, l_proxy: pd.DataFrame) -> pd.DataFrame:
@@ -563,27 +700,44 @@ def build_terminal_monthly(w_final: pd.DataFrame, l_proxy: pd.DataFrame) -> pd.D
     bad = (pd.to_numeric(df["teu_i_m"], errors="coerce")<=0) | (pd.to_numeric(df["l_hours_i_m"], errors="coerce")<=0)
     df.loc[bad, "lp_term_month_mixadjusted"] = np.nan
     out = df[["port","terminal","year","month","month_index","quarter","operating",
-              "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]].copy()
+              "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
     return out
 
-def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dict[str,str]) -> pd.DataFrame:
-    cut_map: Dict[str,int] = {}
-    for p, y_m in cutover.items():
-        try:
-            y, m = y_m.split("-")
-            cut_map[p] = int(y)*12 + int(m)
-        except Exception:
-            cut_map[p] = 10**9
-
-    term = term_m.copy()
-    term["month_index"] = (term["year"].astype("int")*12 + term["month"].astype("int")).astype(int)
-    term["quarter"] = term["month"].apply(_quarter_from_month)
-    term["freq"] = np.where(term["port"].map(cut_map).le(term["month_index"]), "Q", "M")
+def _lexorder(df: pd.DataFrame, keys: List[str]) -> np.ndarray:
+    """Stable row order by keys, missing last (as sort_values), via one np.lexsort on codes/floats."""
+    cols = []
+    for k in keys:
+        s = df[k]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            c = s.cat.codes.to_numpy()
+            cols.append(np.where(c < 0, len(s.cat.categories), c))
+        elif pd.api.types.is_numeric_dtype(s.dtype):
+            cols.append(s.to_numpy(dtype="float64", na_value=np.nan))
+        else:
+            c = pd.factorize(s, sort=True)[0]
+            cols.append(np.where(c < 0, c.max(initial=0) + 1, c))
+    return np.lexsort(cols[::-1])
 
-    term_M = term[term["freq"]=="M"].copy()
-    term_Q = term[term["freq"]=="Q"].copy()
+def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dict[str,str]) -> pd.DataFrame:
+    # Parse all cutovers in one go; unparseable entries never switch to quarterly.
+    cut_dt = pd.to_datetime(pd.Series(cutover, dtype="object"), format="%Y-%m", errors="coerce")
+    cut_map: Dict[str,int] = (cut_dt.dt.year*12 + cut_dt.dt.month).fillna(10**9).astype("int64").to_dict()
+
+    # Look the cutover up per category once, then broadcast through the codes.
+    port = term_m["port"].astype("category")
+    cut_arr = np.array([cut_map.get(c, 10**9) for c in port.cat.categories] + [10**9], dtype="int64")
+    cut_per_row = cut_arr[port.cat.codes.to_numpy()]  # code -1 (missing port) hits the trailing sentinel
+
+    # month_index comes through from L_Proxy; a missing one never counts as past the cutover
+    month_index = term_m["month_index"].to_numpy(dtype="float64", na_value=np.nan)
+    is_q = cut_per_row <= month_index
+    term = term_m.assign(quarter=_quarters_from_months(term_m["month"]))
+
+    # split once on the bitmap; under copy-on-write these row takes are not copied again downstream
+    term_M = term.iloc[np.flatnonzero(~is_q)]
+    term_Q = term.iloc[np.flatnonzero(is_q)]
     if not term_Q.empty:
-        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False).agg(
+        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False, observed=True).agg(
             pi_teu_per_hour_i_y=("pi_teu_per_hour_i_y","first"),
             w_final=("w_final","mean"),
             teu_i_m=("teu_i_m","sum"),
@@ -591,9 +745,11 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
             lp_term_month_mixadjusted=("lp_term_month_mixadjusted","mean"),
             operating=("operating","last"),
         ).reset_index()
+        # quarterly rows passed the cutover test, so year and quarter are never missing here
         q_to_month = {"Q1":3,"Q2":6,"Q3":9,"Q4":12}
-        agg["month"] = agg["quarter"].map(q_to_month).astype("Int64")
-        agg["month_index"] = (agg["year"].astype("int")*12 + agg["month"].astype("int")).astype(int)
+        qm = agg["quarter"].map(q_to_month).to_numpy(dtype="int32")
+        agg["month"] = qm.astype("int8")
+        agg["month_index"] = agg["year"].to_numpy(dtype="int32")*12 + qm
         agg["freq"] = "Q"
         term_Q_out = agg[["port","terminal","year","quarter","month","month_index","freq",
                           "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
@@ -601,32 +757,25 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
         term_Q_out = pd.DataFrame(columns=["port","terminal","year","quarter","month","month_index","freq",
                           "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"])
 
-    term_M_out = term_M.copy()
-    term_M_out["freq"] = "M"
-    term_M_out = term_M_out[["port","terminal","year","quarter","month","month_index","freq",
-                             "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
+    term_M_out = term_M.assign(freq="M")[["port","terminal","year","quarter","month","month_index","freq",
+                                          "pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
 
-    out = pd.concat([term_M_out, term_Q_out], ignore_index=True).sort_values(["port","terminal","year","month"]).reset_index(drop=True)
-    return out
+    out = pd.concat([term_M_out, term_Q_out], ignore_index=True)
+    return out.take(_lexorder(out, ["port","terminal","year","month"])).reset_index(drop=True)
 
 def build_panel_mixedfreq(lp_port: pd.DataFrame, lp_id: pd.DataFrame, term_m: pd.DataFrame, term_qview: pd.DataFrame) -> pd.DataFrame:
-    port = lp_port.copy()
-    port["level"] = "port"; port["terminal"] = pd.NA
-    port["Pi"] = port["pi_p_y_mixbase"]
-    port["L_hours"] = port["l_port_m"]
-    port["LP_mix"] = port["lp_port_month_mix"]
+    port = lp_port.assign(level="port", terminal=pd.NA, Pi=lp_port["pi_p_y_mixbase"],
+                          L_hours=lp_port["l_port_m"], LP_mix=lp_port["lp_port_month_mix"])
     port = port.merge(lp_id, on=["port","year","month"], how="left")
     port = port.rename(columns={"lp_port_month_id":"LP_id"})
-    port["quarter"] = port["month"].apply(_quarter_from_month)
+    port["quarter"] = _quarters_from_months(port["month"])
     port["TEU"] = port["teu_p_m"]; port["tons"] = port["tons_p_m"]
-    port["w"] = port["w_final"]; port["w_source"] = port["w_source"].astype("object")
+    port["w"] = port["w_final"]
     port["freq"] = "M"
     port_panel = port[["level","port","terminal","year","month","month_index","quarter","freq",
                        "TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id"]]
 
-    term = term_qview.copy()
-    term["level"] = "terminal"
-    term = term.rename(columns={
+    term = term_qview.assign(level="terminal").rename(columns={
         "pi_teu_per_hour_i_y":"Pi",
         "l_hours_i_m":"L_hours",
         "lp_term_month_mixadjusted":"LP_mix",
@@ -639,8 +788,16 @@ def build_panel_mixedfreq(lp_port: pd.DataFrame, lp_id: pd.DataFrame, term_m: pd
     term_panel = term[["level","port","terminal","year","month","month_index","quarter","freq",
                        "TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id"]]
 
-    panel = pd.concat([port_panel, term_panel], ignore_index=True).sort_values(["level","port","terminal","year","month"]).reset_index(drop=True)
-    return panel
+    # one category set per label column, so the stacked panel stays categorical
+    cat_dtypes = {c: pd.CategoricalDtype(sorted(pd.concat([port_panel[c].astype(object), term_panel[c].astype(object)]).dropna().unique()))
+                  for c in ["port","terminal","w_source"]}
+    # "port" sorts before "terminal": order each block on its own (port rows have no terminal)
+    # and stack them, instead of sorting the union on all five keys
+    port_panel = port_panel.astype(cat_dtypes)
+    term_panel = term_panel.astype(cat_dtypes)
+    port_panel = port_panel.take(_lexorder(port_panel, ["port","year","month"]))
+    term_panel = term_panel.take(_lexorder(term_panel, ["port","terminal","year","month"]))
+    return pd.concat([port_panel, term_panel], ignore_index=True)
 
 def run_qa(lp_port: pd.DataFrame, term_m: pd.DataFrame, w_final: pd.DataFrame) -> pd.DataFrame:
     rows = []
@@ -651,29 +808,40 @@ def run_qa(lp_port: pd.DataFrame, term_m: pd.DataFrame, w_final: pd.DataFrame) -
     assert_unique(term_m, ["port","terminal","year","month"], "lp_term_monthly")
     assert_unique(w_final, ["port","year","month"], "w_final")
 
-    g = lp_port.groupby(["port","year"], dropna=False).agg(
+    g = lp_port.groupby(["port","year"], dropna=False, observed=True).agg(
         lp_mean=("lp_port_month_mix","mean"),
         pi_mean=("pi_p_y_mixbase","mean")
     ).reset_index()
     g["rel_err"] = np.abs(g["lp_mean"]-g["pi_mean"])/g["pi_mean"].replace(0,np.nan)
-    for _, r in g.iterrows():
-        rows.append({"check":"annual_preservation","port":r["port"],"year":int(r["year"]),
-                     "lp_mean":float(r["lp_mean"]) if pd.notna(r["lp_mean"]) else None,
-                     "pi_mean":float(r["pi_mean"]) if pd.notna(r["pi_mean"]) else None,
-                     "rel_err":float(r["rel_err"]) if pd.notna(r["rel_err"]) else None,
-                     "result":"pass" if (pd.isna(r["rel_err"]) or r["rel_err"]<=1e-6) else "warn"})
-    src = w_final.assign(w_source=w_final["w_source"].astype("object")).groupby(["port","year","w_source"], dropna=False).size().reset_index(name="n")
-    total = w_final.groupby(["port","year"], dropna=False).size().reset_index(name="N")
+    rel = g["rel_err"].to_numpy(dtype="float64", na_value=np.nan)
+    ann = pd.DataFrame({
+        "check": "annual_preservation",
+        "port": g["port"].astype(object).to_numpy(),
+        "year": g["year"].to_numpy(dtype="float64", na_value=np.nan),
+        "lp_mean": g["lp_mean"].to_numpy(dtype="float64", na_value=np.nan),
+        "pi_mean": g["pi_mean"].to_numpy(dtype="float64", na_value=np.nan),
+        "rel_err": rel,
+        "result": np.where(np.isnan(rel) | (rel <= 1e-6), "pass", "warn"),
+    })
+    src = w_final.assign(w_source=w_final["w_source"].astype("object")).groupby(["port","year","w_source"], dropna=False, observed=True).size().reset_index(name="n")
+    total = w_final.groupby(["port","year"], dropna=False, observed=True).size().reset_index(name="N")
     src = src.merge(total, on=["port","year"], how="left")
     src["share"] = src["n"]/src["N"]
-    for _, r in src.iterrows():
-        rows.append({"check":"w_source_share","port":r["port"],"year":int(r["year"]),
-                     "w_source":None if pd.isna(r["w_source"]) else str(r["w_source"]),
-                     "n":int(r["n"]), "N":int(r["N"]), "share":float(r["share"]) })
-    return pd.DataFrame(rows)
+    share = pd.DataFrame({
+        "check": "w_source_share",
+        "port": src["port"].astype(object).to_numpy(),
+        "year": src["year"].to_numpy(dtype="float64", na_value=np.nan),
+        "w_source": src["w_source"].to_numpy(),
+        "n": src["n"].to_numpy(dtype="int64"),
+        "N": src["N"].to_numpy(dtype="int64"),
+        "share": src["share"].to_numpy(dtype="float64"),
+    })
+    return pd.concat([pd.DataFrame(rows), ann, share], ignore_index=True)
 
 # ------------------------------- Main ----------------------------------------
 
+_PARQUET_CAT_COLS = ["port","terminal","w_source","tons_source","level","freq","quarter"]
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base_dir", default=".", help="Base directory of the repo; defaults to CWD.")
@@ -689,6 +857,7 @@ def main():
     ap.add_argument("--year_min", type=int, default=None, help="If provided, drop rows with year < year_min (after loading)." )
     ap.add_argument("--year_max", type=int, default=None, help="If provided, drop rows with year > year_max (after loading)." )
     ap.add_argument("--pi_fill", default="none", choices=["none","ffill","bfill","both"], help="Fill terminal-year Pi within terminal.")
+    ap.add_argument("--format", default="both", choices=["tsv","parquet","both"], help="Output file format(s).")
     ap.add_argument("--validate-only", action="store_true", help="Run validations only; do not write outputs.")
     args = ap.parse_args()
 
@@ -718,11 +887,6 @@ def main():
         teu_pm = _clip(teu_pm, "teu_pm")
         teu_pq = _clip(teu_pq, "teu_pq")
 
-        # Recompute month_index after clipping
-        for df in [l_proxy, tons_port_m, teu_pm]:
-            if df is not None and not df.empty and all(c in df.columns for c in ["year","month"]):
-                df["month_index"] = (df["year"].astype("float")*12 + df["month"].astype("float")).astype("Int64")
-
         # Validate
         ok, report = validate_inputs(l_proxy, tons_port_m, teu_pm, teu_pq)
         print("VALIDATION REPORT:\n" + report)
@@ -754,15 +918,32 @@ def main():
         def _write_tsv(df: pd.DataFrame, name: str) -> str:
             path = os.path.join(inp.out_dir, name)
             os.makedirs(os.path.dirname(path), exist_ok=True)
-            df.to_csv(path, sep="\t", index=False)
+            if inp.out_format in {"tsv","both"}:
+                df.to_csv(path, sep="\t", index=False)
+            if inp.out_format in {"parquet","both"}:
+                # low-cardinality labels as categoricals -> parquet dictionary pages
+                cats = {c: df[c].astype("category") for c in _PARQUET_CAT_COLS if c in df.columns}
+                try:
+                    df.assign(**cats).to_parquet(os.path.splitext(path)[0] + ".parquet", index=False,
+                                                 compression="zstd", use_dictionary=True, row_group_size=100_000)
+                except Exception as e:  # pyarrow/fastparquet are optional
+                    print(f"[write] Skipping parquet sidecar for {name}: {str(e).splitlines()[0]}")
+                    if inp.out_format == "parquet":
+                        df.to_csv(path, sep="\t", index=False)  # keep the output rather than drop it
             return path
 
-        _write_tsv(lp_port, "LP_port_month_mixadjusted.tsv")
-        _write_tsv(lp_id, "LP_port_month_identity.tsv")
-        _write_tsv(term_m, "LP_terminal_month_mixadjusted.tsv")
-        _write_tsv(term_qview, "LP_terminal_quarter_mixadjusted.tsv")
-        _write_tsv(panel, "LP_panel_mixedfreq.tsv")
-        _write_tsv(qa, "qa_lp_report.tsv")
+        outputs = [
+            (lp_port, "LP_port_month_mixadjusted.tsv"),
+            (lp_id, "LP_port_month_identity.tsv"),
+            (term_m, "LP_terminal_month_mixadjusted.tsv"),
+            (term_qview, "LP_terminal_quarter_mixadjusted.tsv"),
+            (panel, "LP_panel_mixedfreq.tsv"),
+            (qa, "qa_lp_report.tsv"),
+        ]
+        # Independent files: overlap parquet encoding (GIL-free) and disk I/O across outputs
+        with ThreadPoolExecutor(max_workers=len(outputs)) as ex:
+            for fut in [ex.submit(_write_tsv, df, name) for df, name in outputs]:
+                fut.result()
 
         meta = {
             "timestamp_utc": pd.Timestamp.utcnow().isoformat(),
@@ -775,6 +956,7 @@ def main():
             "winsor": {"lower": inp.winsor_lower, "upper": inp.winsor_upper},
             "year_window": {"min": inp.year_min, "max": inp.year_max},
             "pi_fill": inp.pi_fill,
+            "format": inp.out_format,
             "rows": {
                 "LP_port_month_mixadjusted": int(len(lp_port)),
                 "LP_port_month_identity": int(len(lp_id)),
@@ -6,7 +6,7 @@ LP panel builder - V4a (general range, safer dtype handling).
 
 Changes from V4:
 - Rewrote winsorize_group to use groupby.transform (avoids dtype promotion errors).
-- Explicit numeric casting before np.where/combine_first to prevent str/float collisions.
+- Explicit numeric casting before np.where/fillna to prevent str/float collisions.
 - Minor sanitization in loaders to ensure numeric columns are float and label columns are object.
 """
 
@@ -15,79 +15,133 @@ import json
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+try:  # optional: multithreaded TSV parsing in _read_tsv_guess
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+if int(pd.__version__.split(".")[0]) < 3:  # always on from pandas 3
+    pd.options.mode.copy_on_write = True
+
 class ValidationError(Exception):
     pass
 
+# Quarter labels as one fixed categorical (int8 codes) shared by every frame
+QUARTER_DTYPE = pd.CategoricalDtype(["Q1","Q2","Q3","Q4"])
+# w provenance as int8 codes behind a fixed categorical; strings appear only when written
+W_SRC_DTYPE = pd.CategoricalDtype(["monthly","quarterly"])
+
 def _find_first_existing(paths: List[str]) -> Optional[str]:
     for p in paths:
         if p and os.path.exists(p):
             return p
     return None
 
+def _read_tsv_pyarrow(path: str) -> pd.DataFrame:
+    parse = pa_csv.ParseOptions(delimiter="\t")
+    table = pa_csv.read_csv(path, parse_options=parse,
+                            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+    # pandas keeps date-like text as strings (e.g. 'Month-Year'); re-read those columns as such
+    dated = {f.name: pa.string() for f in table.schema if pa.types.is_temporal(f.type)}
+    if dated:
+        table = pa_csv.read_csv(path, parse_options=parse,
+                                convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, column_types=dated))
+    return table.to_pandas()
+
 def _read_tsv_guess(path: str) -> pd.DataFrame:
+    if pa_csv is not None:
+        try:
+            return _read_tsv_pyarrow(path)
+        except Exception:
+            pass  # ragged or oddly quoted files: let pandas have a go
     try:
         return pd.read_csv(path, sep="\t", engine="python")
     except Exception as e:
         raise ValidationError(f"Failed to read TSV at {path}: {e}")
 
-def _quarter_from_month(m) -> Optional[str]:
-    if pd.isna(m):
-        return None
-    try:
-        q = (int(m)-1)//3 + 1
-        return f"Q{q}"
-    except Exception:
-        return None
-
-def _parse_quarter_field(q) -> Optional[int]:
-    if pd.isna(q):
-        return None
-    s = str(q).upper().strip().replace(" ", "")
-    m = re.search(r"Q([1-4])", s)
-    if m:
-        return int(m.group(1))
-    if s.isdigit():
-        qi = int(s)
-        if 1 <= qi <= 4:
-            return qi
-    m = re.search(r"(\d{4}).*Q([1-4])", s)
-    if m:
-        return int(m.group(2))
-    return None
+def _quarters_from_months(month: pd.Series) -> pd.Series:
+    """Month -> 'Q1'..'Q4' per row with integer arithmetic (QUARTER_DTYPE); NA where the month is NA."""
+    m = pd.to_numeric(month, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    ok = ~np.isnan(m)
+    q = (np.trunc(m[ok]).astype(np.int64) - 1) // 3 + 1
+    if not q.size or (q.min() >= 1 and q.max() <= 4):
+        codes = np.full(len(m), -1, dtype=np.int8)
+        codes[ok] = q - 1
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=QUARTER_DTYPE), index=month.index)
+    # out-of-range months (reported by validate_inputs) keep plain labels
+    # stringify once per distinct quarter, not per row
+    uq, inv = np.unique(q, return_inverse=True)
+    out = np.full(len(m), None, dtype=object)
+    out[ok] = np.array([f"Q{k}" for k in uq], dtype=object)[inv.reshape(-1)]
+    return pd.Series(out, index=month.index, dtype=object)
+
+def _month_index(year: pd.Series, month: pd.Series) -> pd.Series:
+    """year*12 + month in nullable Int32 (no float round-trip); NA where either part is NA."""
+    return year.astype("Int32")*12 + month.astype("Int32")
+
+# "Q<n>" anywhere in the field, or the whole field a bare quarter number
+_QUARTER_RE = re.compile(r"Q([1-4])|^0*([1-4])$")
+
+def _quarters_from_field(q: pd.Series) -> pd.Series:
+    """Quarter field ('Q3', '2021Q3', 'q 3', 3, ...) -> QUARTER_DTYPE per row in one regex pass; NA if unparseable."""
+    s = q.astype(str).str.upper().str.strip().str.replace(" ", "", regex=False)
+    ext = s.str.extract(_QUARTER_RE)
+    qn = pd.to_numeric(ext[0], errors="coerce").fillna(pd.to_numeric(ext[1], errors="coerce")).fillna(0).to_numpy(dtype=np.int8)
+    codes = np.where(q.isna().to_numpy(), -1, qn - 1).astype(np.int8)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=QUARTER_DTYPE), index=q.index)
+
+# "MM-YYYY" or "YYYY-MM" (either separator) anywhere in a period/date field
+_PERIOD_RE = re.compile(r"(?:(?P<mm1>\d{2})[-/](?P<yy1>\d{4}))|(?:(?P<yy2>\d{4})[-/](?P<mm2>\d{2}))")
+
+def _month_year_from_period(per: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Period field -> (month, year) as Int64 with one precompiled regex pass."""
+    ext = per.astype(str).str.extract(_PERIOD_RE)
+    mm = pd.to_numeric(ext["mm1"], errors="coerce").fillna(pd.to_numeric(ext["mm2"], errors="coerce"))
+    yy = pd.to_numeric(ext["yy1"], errors="coerce").fillna(pd.to_numeric(ext["yy2"], errors="coerce"))
+    return mm.astype("Int64"), yy.astype("Int64")
 
 def winsorize_group_safe(df: pd.DataFrame, value_col: str, by: List[str], lower=0.01, upper=0.99) -> pd.Series:
     """
     Groupwise winsorization with transform (safe with small-n):
       - For groups with <3 non-NA values, returns original.
     """
-    v = pd.to_numeric(df[value_col], errors="coerce")
-    g = df.groupby(by, dropna=False)[value_col]
-    # group sizes of non-na
-    n_non_na = df.groupby(by, dropna=False)[value_col].transform(lambda s: s.notna().sum())
-    # compute quantiles only where n>=3
-    def q_low(s):
-        s = pd.to_numeric(s, errors="coerce")
-        return s.quantile(lower) if s.notna().sum() >= 3 else np.nan
-    def q_high(s):
-        s = pd.to_numeric(s, errors="coerce")
-        return s.quantile(upper) if s.notna().sum() >= 3 else np.nan
-    ql = g.transform(q_low)
-    qh = g.transform(q_high)
-    v_arr = v.to_numpy(dtype="float64", copy=True)
-    ql_arr = pd.to_numeric(ql, errors="coerce").to_numpy(dtype="float64", copy=True)
-    qh_arr = pd.to_numeric(qh, errors="coerce").to_numpy(dtype="float64", copy=True)
-    # clip only where quantiles exist
-    mask_l = ~np.isnan(ql_arr)
-    mask_h = ~np.isnan(qh_arr)
-    v_arr = np.where(mask_l, np.maximum(v_arr, ql_arr), v_arr)
-    v_arr = np.where(mask_h, np.minimum(v_arr, qh_arr), v_arr)
-    return pd.Series(v_arr, index=df.index)
+    return _winsorize_group_mean(df, value_col, by, lower, upper)[0]
+
+def _winsorize_group_mean(df: pd.DataFrame, value_col: str, by: List[str], lower=0.01, upper=0.99) -> Tuple[pd.Series, np.ndarray]:
+    """
+    winsorize_group_safe plus the per-row mean of the winsorized values over the same groups.
+    The keys are grouped once (built-in transforms, no per-group lambdas); the mean is a
+    bincount over the group ids.
+    """
+    v = pd.to_numeric(df[value_col], errors="coerce").astype("float64")
+    if v.empty:
+        return v, np.empty(0, dtype="float64")
+    g = df[by].assign(_v=v).groupby(by, dropna=False, observed=True, sort=False)["_v"]
+    # non-NA group sizes and quantile bounds, broadcast straight back to the rows
+    nn = g.transform("count").to_numpy()
+    ql = g.transform("quantile", lower).to_numpy(dtype="float64", na_value=np.nan)
+    qh = g.transform("quantile", upper).to_numpy(dtype="float64", na_value=np.nan)
+    # clip only where quantiles exist (n>=3 non-NA values)
+    ql = np.where((nn < 3) | np.isnan(ql), -np.inf, ql)
+    qh = np.where((nn < 3) | np.isnan(qh), np.inf, qh)
+    # the raw-array steps below get contiguous inputs even if a column is a strided view of a 2-D block
+    r = np.clip(np.ascontiguousarray(v.to_numpy()), ql, qh)
+
+    ids = np.ascontiguousarray(g.ngroup().to_numpy())
+    ok = ~np.isnan(r)
+    sums = np.bincount(ids[ok], weights=r[ok], minlength=g.ngroups)
+    cnt = np.bincount(ids[ok], minlength=g.ngroups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(cnt > 0, sums / cnt, np.nan)
+    return pd.Series(r, index=df.index), mean[ids]
 
 def _pick_cols(df: pd.DataFrame, wanted: List[str], contains_ok: bool = True) -> Optional[str]:
     for cand in wanted:
@@ -116,6 +170,18 @@ def _norm_port(s: str) -> str:
         return "All Ports"
     return s2
 
+def _norm_port_cat(s: pd.Series) -> pd.Series:
+    """
+    Same result as s.astype(str).map(_norm_port).astype("category"), but _norm_port runs once
+    per distinct label and the rows are remapped through integer codes.
+    """
+    cats = s.astype(str).astype("category")
+    new = [_norm_port(c) for c in cats.cat.categories]
+    final = pd.Index(new, dtype=cats.cat.categories.dtype).unique().sort_values()
+    remap = np.append(final.get_indexer(new), -1)  # code -1 (missing) stays missing
+    return pd.Series(pd.Categorical.from_codes(remap[cats.cat.codes.to_numpy()], categories=final),
+                     index=s.index, name=s.name)
+
 def _read_columns_map(path: Optional[str]) -> Dict[str, Dict[str, str]]:
     if not path or not os.path.exists(path):
         return {}
@@ -231,8 +297,8 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]], pi_fill: str)
     if port_col is None and term_col is None:
         raise ValidationError("L_Proxy: Could not locate 'port' or 'terminal' columns. Use columns_map.json or rename headers.")
     g = pd.DataFrame({
-        "port": (df[port_col].astype(str).map(_norm_port) if port_col else pd.NA),
-        "terminal": (df[term_col].astype(str).str.strip() if term_col else pd.NA),
+        "port": (_norm_port_cat(df[port_col]) if port_col else pd.NA),
+        "terminal": (df[term_col].astype(str).str.strip().astype("category") if term_col else pd.NA),
         "year": pd.to_numeric(df[year_col], errors="coerce").astype("Int64"),
         "month": pd.to_numeric(df[month_col], errors="coerce").astype("Int64"),
         "l_hours_i_m": pd.to_numeric(df[l_hours_col], errors="coerce") if l_hours_col else np.nan,
@@ -240,12 +306,11 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]], pi_fill: str)
         "pi_teu_per_hour_i_y": pd.to_numeric(df[pi_col], errors="coerce") if pi_col else np.nan,
     })
     if port_col is None and term_col:
-        g["port"] = g["terminal"].astype(str).str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)", expand=False)
+        g["port"] = g["terminal"].astype(str).str.replace("–","-").str.extract(r"^(Ashdod|Haifa|Eilat)", expand=False).astype("category")
     if quarter_col:
-        qnum = df[quarter_col].apply(_parse_quarter_field)
-        g["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
+        g["quarter"] = _quarters_from_field(df[quarter_col])
     else:
-        g["quarter"] = g["month"].apply(_quarter_from_month)
+        g["quarter"] = _quarters_from_months(g["month"])
     g["operating"] = df[oper_col].astype(str) if oper_col else pd.NA
     if pi_fill in {"ffill","bfill","both"}:
         g = g.sort_values(["port","terminal","year","month"]).reset_index(drop=True)
@@ -257,11 +322,11 @@ def load_L_proxy(path: str, columns_map: Dict[str, Dict[str,str]], pi_fill: str)
                 s = s.bfill()
             df_["pi_teu_per_hour_i_y"] = s
             return df_
-        g = g.groupby(["port","terminal"], dropna=False, group_keys=False).apply(_fill_pi)
-    g["month_index"] = (g["year"].astype("float")*12 + g["month"].astype("float")).astype("Int64")
-    # ensure label cols are object (prevents unexpected upcasting)
-    g["port"] = g["port"].astype("object")
-    g["terminal"] = g["terminal"].astype("object")
+        g = g.groupby(["port","terminal"], dropna=False, observed=True, group_keys=False).apply(_fill_pi)
+    g["month_index"] = _month_index(g["year"], g["month"])
+    # port/terminal stay categorical; operating is a free-text flag
+    g["port"] = g["port"].astype("category")
+    g["terminal"] = g["terminal"].astype("category")
     g["operating"] = g["operating"].astype("object")
     return g
 
@@ -283,17 +348,11 @@ def load_tons_ports_and_terminals(path: str, columns_map: Dict[str, Dict[str,str
     if tons_col is None:
         raise ValidationError("Tons file: no tons column found (looked for 'tons' or 'tons_k' or generic numeric).")
     if (year_col is None or month_col is None) and period_col:
-        tmp = df.copy()
-        m = tmp[period_col].astype(str).str.extract(r"(?:(\d{2})[-/](\d{4}))|(?:(\d{4})[-/](\d{2}))")
-        mm = pd.to_numeric(m[0].fillna(m[3]), errors="coerce")
-        yy = pd.to_numeric(m[1].fillna(m[2]), errors="coerce")
-        tmp["month"] = mm.astype("Int64")
-        tmp["year"] = yy.astype("Int64")
+        df["month"], df["year"] = _month_year_from_period(df[period_col])
         year_col = "year"; month_col = "month"
-        df = tmp
     tmp = pd.DataFrame({
-        "port": df[port_col].astype(str).map(_norm_port) if port_col else pd.NA,
-        "terminal": (df[term_col].astype(str).str.strip() if term_col else pd.NA),
+        "port": _norm_port_cat(df[port_col]) if port_col else pd.NA,
+        "terminal": (df[term_col].astype(str).str.strip().astype("category") if term_col else pd.NA),
         "year": pd.to_numeric(df[year_col], errors="coerce").astype("Int64"),
         "month": pd.to_numeric(df[month_col], errors="coerce").astype("Int64"),
         "tons_raw": pd.to_numeric(df[tons_col], errors="coerce"),
@@ -303,28 +362,33 @@ def load_tons_ports_and_terminals(path: str, columns_map: Dict[str, Dict[str,str
         tmp["tons"] = tmp["tons_raw"] * 1000.0
     else:
         tmp["tons"] = tmp["tons_raw"]
-    is_all_ports = tmp["port"].astype(str).str.lower().isin(["all ports","all_ports","allports","all"])
-    tons_all = tmp.loc[is_all_ports].copy()
-    tons_port_term = tmp.loc[~is_all_ports].copy()
-    is_port_total = tons_port_term["terminal"].isna() | (tons_port_term["terminal"].astype(str).str.strip()=="") | (tons_port_term["terminal"].astype(str).str.lower().isin(["nan","none","na"]))
-    tons_port = tons_port_term.loc[is_port_total].copy()
+    # one bucket code per row (0 = all-ports aggregate, 1 = port total, 2 = terminal), with the
+    # string tests run once per distinct port / terminal label; missing labels take the last slot
+    port_codes, port_u = pd.factorize(tmp["port"])
+    term_codes, term_u = pd.factorize(tmp["terminal"])
+    is_all_u = np.array([str(v).lower() in {"all ports","all_ports","allports","all"} for v in port_u] + [False])
+    is_blank_u = np.array([str(v).strip()=="" or str(v).lower() in {"nan","none","na"} for v in term_u] + [True])
+    bucket = np.where(is_all_u[port_codes], 0, np.where(is_blank_u[term_codes], 1, 2)).astype(np.int8)
+    tons_all = tmp.iloc[np.flatnonzero(bucket==0)]
+    tons_port = tmp.iloc[np.flatnonzero(bucket==1)]
     tons_port["tons_source"] = "port_total"
-    tons_term = tons_port_term.loc[~is_port_total].copy()
-    tons_term_sum = tons_term.groupby(["port","year","month"], dropna=False)["tons"].sum(min_count=1).reset_index().rename(columns={"tons":"tons_sum_terminals"})
+    tons_term = tmp.iloc[np.flatnonzero(bucket==2)]
+    tons_term_sum = tons_term.groupby(["port","year","month"], dropna=False, observed=True)["tons"].sum(min_count=1).reset_index().rename(columns={"tons":"tons_sum_terminals"})
     tons_port_pref = tons_port[["port","year","month","tons","tons_source"]].rename(columns={"tons":"tons_p_m"})
-    key = pd.concat([tons_port_pref[["port","year","month"]], tons_term_sum[["port","year","month"]]], ignore_index=True).drop_duplicates()
+    # key union in first-seen order (port totals, then terminal-only months), without a concat + dedupe
+    key_idx = pd.MultiIndex.from_frame(tons_port_pref[["port","year","month"]]).unique()
+    key = key_idx.union(pd.MultiIndex.from_frame(tons_term_sum[["port","year","month"]]), sort=False).to_frame(index=False)
     merged = key.merge(tons_port_pref, on=["port","year","month"], how="left").merge(tons_term_sum, on=["port","year","month"], how="left")
-    merged["tons_p_m"] = merged["tons_p_m"].combine_first(merged["tons_sum_terminals"])
-    merged["tons_source"] = np.where(
+    merged["tons_p_m"] = merged["tons_p_m"].fillna(merged["tons_sum_terminals"])
+    merged["tons_source"] = pd.Categorical(np.where(
         merged["tons_p_m"].notna(), "port_total",
         np.where(merged["tons_sum_terminals"].notna(), "sum_terminals", "no_source")
-    ).astype(object)
-    tons_port_m = merged[["port","year","month","tons_p_m","tons_source"]].copy()
-    tons_port_m["month_index"] = (tons_port_m["year"].astype("float")*12 + tons_port_m["month"].astype("float")).astype("Int64")
-    tons_port_m["port"] = tons_port_m["port"].astype("object")
-    tons_port_m["tons_source"] = tons_port_m["tons_source"].astype("object")
-    tons_term_m = tons_term[["port","terminal","year","month","tons"]].rename(columns={"tons":"tons_i_m"}).copy()
-    tons_allports_m = tons_all[["year","month","tons"]].rename(columns={"tons":"tons_allports_m"}).copy()
+    ))
+    tons_port_m = merged[["port","year","month","tons_p_m","tons_source"]]
+    tons_port_m["month_index"] = _month_index(tons_port_m["year"], tons_port_m["month"])
+    tons_port_m["port"] = tons_port_m["port"].astype("category")
+    tons_term_m = tons_term[["port","terminal","year","month","tons"]].rename(columns={"tons":"tons_i_m"})
+    tons_allports_m = tons_all[["year","month","tons"]].rename(columns={"tons":"tons_allports_m"})
     return tons_port_m, tons_term_m, tons_allports_m
 
 def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[str,str]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
@@ -337,12 +401,12 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
     vcol = "teu" if "teu" in df.columns else _pick_cols(df, ["teu","teu_value","teu_count","value","count","qty"])
     if vcol is None:
         raise ValidationError("TEU file: no TEU value column found (expected 'teu' or similar).")
-    dfc = df.copy()
-    dfc["port"] = dfc[port_col].astype(str).map(_norm_port).astype("object")
+    dfc = df
+    dfc["port"] = _norm_port_cat(dfc[port_col])
     dfc["year"] = pd.to_numeric(dfc[year_col], errors="coerce").astype("Int64")
     teu_m = pd.DataFrame(columns=["port","year","month","teu_p_m"])
     if month_col and month_col in dfc.columns:
-        mpart = dfc[dfc[month_col].notna()].copy()
+        mpart = dfc[dfc[month_col].notna()]
         if not mpart.empty:
             mpart["month"] = pd.to_numeric(mpart[month_col], errors="coerce").astype("Int64")
             teu_m = mpart["port"].to_frame().assign(
@@ -350,22 +414,19 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
                 month=mpart["month"].astype("Int64"),
                 teu_p_m=pd.to_numeric(mpart[vcol], errors="coerce")
             )
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
     else:
         per_col = _pick_cols(dfc, ["period","date","month-year","yyyymm","mm-yyyy"])
         if per_col:
-            mpart = dfc[dfc[per_col].notna()].copy()
-            m = mpart[per_col].astype(str).str.extract(r"(?:(\d{2})[-/](\d{4}))|(?:(\d{4})[-/](\d{2}))")
-            mm = pd.to_numeric(m[0].fillna(m[3]), errors="coerce").astype("Int64")
-            yy = pd.to_numeric(m[1].fillna(m[2]), errors="coerce").astype("Int64")
+            mpart = dfc[dfc[per_col].notna()]
+            mm, yy = _month_year_from_period(mpart[per_col])
             teu_m = mpart["port"].to_frame().assign(year=yy, month=mm, teu_p_m=pd.to_numeric(mpart[vcol], errors="coerce"))
-            teu_m["month_index"] = (teu_m["year"].astype("float")*12 + teu_m["month"].astype("float")).astype("Int64")
+            teu_m["month_index"] = _month_index(teu_m["year"], teu_m["month"])
     teu_q = pd.DataFrame(columns=["port","year","quarter","teu_p_q"])
     if quarter_col and quarter_col in dfc.columns:
-        qpart = dfc[dfc[quarter_col].notna()].copy()
+        qpart = dfc[dfc[quarter_col].notna()]
         if not qpart.empty:
-            qnum = qpart[quarter_col].apply(_parse_quarter_field)
-            qpart["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
+            qpart["quarter"] = _quarters_from_field(qpart[quarter_col])
             teu_q = qpart["port"].to_frame().assign(
                 year=qpart["year"].astype("Int64"),
                 quarter=qpart["quarter"],
@@ -374,10 +435,9 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
     else:
         per_col = _pick_cols(dfc, ["period","date","year_quarter","yr_qtr","yyyyq","yyyq","yyyyqq"])
         if per_col:
-            qpart = dfc[dfc[per_col].notna()].copy()
-            qnum = qpart[per_col].apply(_parse_quarter_field)
+            qpart = dfc[dfc[per_col].notna()]
             yr_guess = pd.to_numeric(qpart[per_col].astype(str).str.extract(r"(\d{4})")[0], errors="coerce").astype("Int64")
-            qpart["quarter"] = qnum.map({1:"Q1",2:"Q2",3:"Q3",4:"Q4"})
+            qpart["quarter"] = _quarters_from_field(qpart[per_col])
             qpart["year"] = qpart["year"].astype("Int64").fillna(yr_guess).astype("Int64")
             teu_q = qpart["port"].to_frame().assign(
                 year=qpart["year"].astype("Int64"),
@@ -386,11 +446,27 @@ def load_teu_monthly_quarterly_by_port(path: str, columns_map: Dict[str, Dict[st
             )
     # enforce dtypes
     if not teu_m.empty:
-        teu_m["port"] = teu_m["port"].astype("object"); teu_m["teu_p_m"] = pd.to_numeric(teu_m["teu_p_m"], errors="coerce")
+        teu_m["port"] = teu_m["port"].astype("category"); teu_m["teu_p_m"] = pd.to_numeric(teu_m["teu_p_m"], errors="coerce")
     if not teu_q.empty:
-        teu_q["port"] = teu_q["port"].astype("object"); teu_q["teu_p_q"] = pd.to_numeric(teu_q["teu_p_q"], errors="coerce")
+        teu_q["port"] = teu_q["port"].astype("category"); teu_q["teu_p_q"] = pd.to_numeric(teu_q["teu_p_q"], errors="coerce")
     return teu_m, teu_q
 
+def _dup_key_count(df: pd.DataFrame, keys: List[str]) -> int:
+    """
+    Same count as df.duplicated(keys).sum(): the per-column factorize codes (missing values as
+    their own code) are packed into one int64 per row, sorted, and equal neighbours counted.
+    """
+    packed = np.zeros(len(df), dtype=np.int64)
+    radix = 1
+    for k in keys:
+        codes, uniques = pd.factorize(df[k], use_na_sentinel=False)
+        if radix * (len(uniques) + 1) >= 2**62:
+            return int(df.duplicated(keys).sum())
+        packed += codes.astype(np.int64) * radix
+        radix *= len(uniques) + 1
+    packed.sort()
+    return int(np.count_nonzero(packed[1:] == packed[:-1]))
+
 def validate_inputs(l_proxy: pd.DataFrame, tons_port_m: pd.DataFrame, teu_pm: pd.DataFrame, teu_pq: pd.DataFrame) -> Tuple[bool, str]:
     msgs = []
     for col in ["port","terminal","year","month","l_hours_i_m","teu_i_m","pi_teu_per_hour_i_y"]:
@@ -399,23 +475,24 @@ def validate_inputs(l_proxy: pd.DataFrame, tons_port_m: pd.DataFrame, teu_pm: pd
     bad_month = l_proxy["month"].dropna().astype(int).between(1,12)==False
     if bad_month.any():
         msgs.append("[L_Proxy] Found invalid month values outside 1..12.")
-    dup_L = l_proxy.duplicated(["port","terminal","year","month"]).sum()
+    dup_L = _dup_key_count(l_proxy, ["port","terminal","year","month"])
     if dup_L>0:
         msgs.append(f"[L_Proxy] Duplicate keys (port,terminal,year,month): {dup_L} rows.")
     for col in ["port","year","month","tons_p_m","tons_source"]:
         if col not in tons_port_m.columns:
             msgs.append(f"[Tons] Missing column in port-month tons: {col}")
-    dup_T = tons_port_m.duplicated(["port","year","month"]).sum()
+    dup_T = _dup_key_count(tons_port_m, ["port","year","month"])
     if dup_T>0:
         msgs.append(f"[Tons] Duplicate (port,year,month): {dup_T} rows.")
-    ports = sorted(set(tons_port_m["port"].dropna().unique().tolist()))
-    for p in ports:
-        yrs = sorted(set(tons_port_m.loc[tons_port_m["port"]==p, "year"].dropna().unique().tolist()))
-        for y in yrs:
-            has_m = not teu_pm[(teu_pm["port"]==p) & (teu_pm["year"]==y)].empty
-            has_q = not teu_pq[(teu_pq["port"]==p) & (teu_pq["year"]==y)].empty
-            if not has_m and not has_q:
-                msgs.append(f"[TEU] No monthly or quarterly TEU for port={p}, year={y}. w will be NA for those months.")
+    # (port, year) coverage as hash sets, built once; report in port, year order
+    teu_keys = set()
+    for t in (teu_pm, teu_pq):
+        if {"port","year"} <= set(t.columns):
+            teu_keys.update(t[["port","year"]].dropna().drop_duplicates().itertuples(index=False, name=None))
+    tons_keys = tons_port_m[["port","year"]].dropna().drop_duplicates().itertuples(index=False, name=None)
+    for p, y in sorted(tons_keys):
+        if (p, y) not in teu_keys:
+            msgs.append(f"[TEU] No monthly or quarterly TEU for port={p}, year={y}. w will be NA for those months.")
     ok = len([m for m in msgs if m.startswith("[L_Proxy] Missing") or m.startswith("[Tons] Missing")])==0 and dup_L==0 and dup_T==0
     report = "\n".join(msgs) if msgs else "All validations passed."
     return ok, report
@@ -423,81 +500,91 @@ def validate_inputs(l_proxy: pd.DataFrame, tons_port_m: pd.DataFrame, teu_pm: pd
 def compute_w(tons_pm: pd.DataFrame, teu_pm: pd.DataFrame, teu_pq: pd.DataFrame,
               winsor_lower=0.01, winsor_upper=0.99) -> pd.DataFrame:
     # ensure numeric
-    tons_pm = tons_pm.copy()
-    tons_pm["tons_p_m"] = pd.to_numeric(tons_pm["tons_p_m"], errors="coerce")
-    teu_pm = teu_pm.copy()
-    teu_pm["teu_p_m"] = pd.to_numeric(teu_pm["teu_p_m"], errors="coerce")
-    w_m = tons_pm.merge(teu_pm, on=["port","year","month"], how="left")
+    tons_pm = tons_pm.assign(tons_p_m=pd.to_numeric(tons_pm["tons_p_m"], errors="coerce"))
+    teu_pm = teu_pm.assign(teu_p_m=pd.to_numeric(teu_pm["teu_p_m"], errors="coerce"))
+    # teu_pm also carries month_index; join only its value so tons_pm's key survives unsuffixed
+    w_m = tons_pm.merge(teu_pm[["port","year","month","teu_p_m"]], on=["port","year","month"], how="left")
     w_m["tons_per_teu"] = np.where(w_m["teu_p_m"]>0, w_m["tons_p_m"]/w_m["teu_p_m"], np.nan)
-    w_m["r_winsor"] = winsorize_group_safe(w_m, "tons_per_teu", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-    mean_by_py = w_m.groupby(["port","year"], dropna=False)["r_winsor"].transform("mean")
-    w_m["w_p_m"] = np.where((mean_by_py==0) | (mean_by_py.isna()), 1.0, w_m["r_winsor"]/mean_by_py)
+    w_m["r_winsor"], mean_by_py = _winsorize_group_mean(w_m, "tons_per_teu", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
+    w_m["w_p_m"] = np.where((mean_by_py==0) | np.isnan(mean_by_py), 1.0, w_m["r_winsor"]/mean_by_py)
     w_m["w_p_m"] = pd.to_numeric(w_m["w_p_m"], errors="coerce").fillna(1.0)
-    w_m["w_src_monthly"] = pd.Series(np.where(w_m["tons_per_teu"].notna(), "monthly", None), index=w_m.index, dtype="object")
+    w_m["w_src_monthly"] = pd.Categorical.from_codes(np.where(w_m["tons_per_teu"].notna(), 0, -1).astype(np.int8), dtype=W_SRC_DTYPE)
     # Quarterly fallback
     if teu_pq.empty:
-        w_qm = tons_pm[["port","year","month","month_index"]].copy()
+        w_qm = tons_pm[["port","year","month","month_index"]]
         w_qm["w_from_q"] = np.nan
-        w_qm["w_src_quarterly"] = np.nan
+        w_qm["w_src_quarterly"] = pd.Categorical.from_codes(np.full(len(w_qm), -1, dtype=np.int8), dtype=W_SRC_DTYPE)
     else:
-        teu_pq = teu_pq.copy()
-        teu_pq["teu_p_q"] = pd.to_numeric(teu_pq["teu_p_q"], errors="coerce")
-        tons_pq = tons_pm.copy()
-        tons_pq["quarter"] = tons_pq["month"].apply(_quarter_from_month)
-        agg_tons = tons_pq.groupby(["port","year","quarter"], dropna=False)["tons_p_m"].sum(min_count=1).reset_index()
+        teu_pq = teu_pq.assign(teu_p_q=pd.to_numeric(teu_pq["teu_p_q"], errors="coerce"))
+        # quarter labels computed once: grouped on directly (no widened tons frame) and reused below
+        quarter = _quarters_from_months(tons_pm["month"]).rename("quarter")
+        agg_tons = tons_pm.groupby([tons_pm["port"], tons_pm["year"], quarter], dropna=False, observed=True)["tons_p_m"].sum(min_count=1).reset_index()
         rq = agg_tons.merge(teu_pq, on=["port","year","quarter"], how="left")
         rq["r_q"] = np.where(rq["teu_p_q"]>0, rq["tons_p_m"]/rq["teu_p_q"], np.nan)
-        rq["r_q_win"] = winsorize_group_safe(rq, "r_q", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
-        mean_by_pyq = rq.groupby(["port","year"], dropna=False)["r_q_win"].transform("mean")
-        rq["w_p_q"] = np.where((mean_by_pyq==0) | (mean_by_pyq.isna()), 1.0, rq["r_q_win"]/mean_by_pyq)
+        rq["r_q_win"], mean_by_pyq = _winsorize_group_mean(rq, "r_q", by=["port","year"], lower=winsor_lower, upper=winsor_upper)
+        rq["w_p_q"] = np.where((mean_by_pyq==0) | np.isnan(mean_by_pyq), 1.0, rq["r_q_win"]/mean_by_pyq)
         rq["w_p_q"] = pd.to_numeric(rq["w_p_q"], errors="coerce")
-        map_q_to_m = tons_pm[["port","year","month","month_index"]].copy()
-        map_q_to_m["quarter"] = map_q_to_m["month"].apply(_quarter_from_month)
+        map_q_to_m = tons_pm[["port","year","month","month_index"]].assign(quarter=quarter)
         w_qm = map_q_to_m.merge(rq[["port","year","quarter","w_p_q"]], on=["port","year","quarter"], how="left")
         w_qm = w_qm.rename(columns={"w_p_q":"w_from_q"})
-        w_qm["w_src_quarterly"] = np.where(w_qm["w_from_q"].notna(), "quarterly", np.nan)
-        w_qm["w_src_quarterly"] = w_qm["w_src_quarterly"].astype("object")
+        w_qm["w_src_quarterly"] = pd.Categorical.from_codes(np.where(w_qm["w_from_q"].notna(), 1, -1).astype(np.int8), dtype=W_SRC_DTYPE)
     wf = w_m[["port","year","month","month_index","w_p_m","w_src_monthly"]].merge(
         w_qm[["port","year","month","month_index","w_from_q","w_src_quarterly"]],
         on=["port","year","month","month_index"], how="outer"
     ).sort_values(["port","year","month"])
     wf["w_p_m"] = pd.to_numeric(wf["w_p_m"], errors="coerce")
     wf["w_from_q"] = pd.to_numeric(wf["w_from_q"], errors="coerce")
-    wf["w_final"] = wf["w_p_m"].combine_first(wf["w_from_q"])
-    wf["w_source"] = wf["w_src_monthly"].combine_first(wf["w_src_quarterly"])
-    wf["w_source"] = wf["w_source"].astype("object")
+    wf["w_final"] = wf["w_p_m"].fillna(wf["w_from_q"])
+    wf["w_source"] = wf["w_src_monthly"].fillna(wf["w_src_quarterly"])
     return wf[["port","year","month","month_index","w_final","w_source"]]
 
 def build_port_mix_LP(w_final: pd.DataFrame, l_proxy: pd.DataFrame, tons_pm: pd.DataFrame, teu_pm: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    lp = l_proxy.copy()
-    lp["quarter"] = lp["month"].apply(_quarter_from_month)
-    teui = (lp.groupby(["port","terminal","year","quarter"], dropna=False)["teu_i_m"].sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_i_q_sum"}))
-    teutot = (teui.groupby(["port","year","quarter"], dropna=False)["teu_i_q_sum"].sum(min_count=1).reset_index().rename(columns={"teu_i_q_sum":"teu_port_q"}))
+    lp = l_proxy.assign(quarter=_quarters_from_months(l_proxy["month"]))
+    teui = (lp.groupby(["port","terminal","year","quarter"], dropna=False, observed=True)["teu_i_m"].sum(min_count=1).reset_index().rename(columns={"teu_i_m":"teu_i_q_sum"}))
+    teutot = (teui.groupby(["port","year","quarter"], dropna=False, observed=True)["teu_i_q_sum"].sum(min_count=1).reset_index().rename(columns={"teu_i_q_sum":"teu_port_q"}))
     shares = teui.merge(teutot, on=["port","year","quarter"], how="left")
     shares["share_i_q"] = np.where(shares["teu_port_q"]>0, shares["teu_i_q_sum"]/shares["teu_port_q"], np.nan)
-    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False)["pi_teu_per_hour_i_y"].first().reset_index())
+    pi_i_y = (lp.groupby(["port","terminal","year"], dropna=False, observed=True)["pi_teu_per_hour_i_y"].first().reset_index())
     shares = shares.merge(pi_i_y, on=["port","terminal","year"], how="left")
-    pi_port_q = (shares.assign(pi_weighted=lambda d: d["share_i_q"]*d["pi_teu_per_hour_i_y"]).groupby(["port","year","quarter"], dropna=False)["pi_weighted"].sum(min_count=1).reset_index().rename(columns={"pi_weighted":"Pi_p_q"}))
-    months = w_final[["port","year","month","month_index"]].drop_duplicates()
-    months["quarter"] = months["month"].apply(_quarter_from_month)
+    pi_port_q = (shares.assign(pi_weighted=lambda d: d["share_i_q"]*d["pi_teu_per_hour_i_y"]).groupby(["port","year","quarter"], dropna=False, observed=True)["pi_weighted"].sum(min_count=1).reset_index().rename(columns={"pi_weighted":"Pi_p_q"}))
+    keys = ["port","year","month"]
+    months = w_final[keys + ["month_index"]].drop_duplicates()
+    months["quarter"] = _quarters_from_months(months["month"])
     pi_pm = months.merge(pi_port_q, on=["port","year","quarter"], how="left").rename(columns={"Pi_p_q":"pi_p_y_mixbase"})
-    lp_port = w_final.merge(pi_pm[["port","year","month","pi_p_y_mixbase"]], on=["port","year","month"], how="left")
-    lp_port["lp_port_month_mix"] = pd.to_numeric(lp_port["w_final"], errors="coerce") * pd.to_numeric(lp_port["pi_p_y_mixbase"], errors="coerce")
-    diag = tons_pm.merge(teu_pm, on=["port","year","month"], how="left")
-    lp_port = lp_port.merge(diag[["port","year","month","month_index","tons_p_m","teu_p_m"]], on=["port","year","month","month_index"], how="left")
-    L_port_m = (l_proxy.groupby(["port","year","month"], dropna=False)["l_hours_i_m"].sum(min_count=1).reset_index().rename(columns={"l_hours_i_m":"l_port_m"}))
-    lp_id = L_port_m.merge(teu_pm, on=["port","year","month"], how="left")
+    # teu_pm may carry its own month_index; only its value column is joined
+    teu_v = teu_pm[keys + ["teu_p_m"]]
+    diag = tons_pm[keys + ["month_index","tons_p_m"]].merge(teu_v, on=keys, how="left")
+    # L_port_m stays indexed on (port, year, month) -- unique by construction -- and is joined
+    # by index into both lp_id and lp_port; missing or repeated keys keep the merges.
+    L_port_m = l_proxy.groupby(keys, dropna=False, observed=True)["l_hours_i_m"].sum(min_count=1).rename("l_port_m")
+    l_na = l_proxy[keys].isna().to_numpy().any()
+    teu_i = teu_v.set_index(keys)["teu_p_m"]
+    if not l_na and not teu_v[keys].isna().to_numpy().any() and teu_i.index.is_unique:
+        lp_id = L_port_m.to_frame().join(teu_i).reset_index()
+    else:
+        lp_id = L_port_m.reset_index().merge(teu_v, on=keys, how="left")
     lp_id["lp_port_month_id"] = np.where(pd.to_numeric(lp_id["l_port_m"], errors="coerce")>0, pd.to_numeric(lp_id["teu_p_m"], errors="coerce")/pd.to_numeric(lp_id["l_port_m"], errors="coerce"), np.nan)
-    lp_port = lp_port.merge(L_port_m, on=["port","year","month"], how="left")
-    lp_port = lp_port[["port","year","month","month_index","teu_p_m","tons_p_m","w_final","w_source","pi_p_y_mixbase","lp_port_month_mix","l_port_m"]].copy()
-    return lp_port, lp_id[["port","year","month","lp_port_month_id"]].copy()
+    # One indexed join of every port-month column onto w_final (month_index is year*12+month
+    # on both sides, so (port, year, month) is the key).
+    pi_i = pi_pm.set_index(keys)["pi_p_y_mixbase"]
+    diag_i = diag.set_index(keys)[["tons_p_m","teu_p_m"]]
+    na_keys = l_na or any(d[keys].isna().to_numpy().any() for d in (w_final, pi_pm, diag))
+    if not na_keys and pi_i.index.is_unique and diag_i.index.is_unique:
+        lp_port = w_final.join(pd.concat([pi_i, diag_i, L_port_m], axis=1, join="outer"), on=keys)
+    else:
+        lp_port = w_final.merge(pi_pm[keys + ["pi_p_y_mixbase"]], on=keys, how="left")
+        lp_port = lp_port.merge(diag[keys + ["month_index","tons_p_m","teu_p_m"]], on=keys + ["month_index"], how="left")
+        lp_port = lp_port.merge(L_port_m.reset_index(), on=keys, how="left")
+    lp_port["lp_port_month_mix"] = pd.to_numeric(lp_port["w_final"], errors="coerce") * pd.to_numeric(lp_port["pi_p_y_mixbase"], errors="coerce")
+    lp_port = lp_port[["port","year","month","month_index","teu_p_m","tons_p_m","w_final","w_source","pi_p_y_mixbase","lp_port_month_mix","l_port_m"]]
+    return lp_port, lp_id[["port","year","month","lp_port_month_id"]]
 
 def build_terminal_monthly(w_final: pd.DataFrame, l_proxy: pd.DataFrame) -> pd.DataFrame:
     df = l_proxy.merge(w_final[["port","year","month","w_final"]], on=["port","year","month"], how="left")
     df["lp_term_month_mixadjusted"] = pd.to_numeric(df["pi_teu_per_hour_i_y"], errors="coerce") * pd.to_numeric(df["w_final"], errors="coerce")
     bad = (pd.to_numeric(df["teu_i_m"], errors="coerce")<=0) | (pd.to_numeric(df["l_hours_i_m"], errors="coerce")<=0)
     df.loc[bad, "lp_term_month_mixadjusted"] = np.nan
-    out = df[["port","terminal","year","month","month_index","quarter","operating","pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]].copy()
+    out = df[["port","terminal","year","month","month_index","quarter","operating","pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
     return out
 
 def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dict[str,str]) -> pd.DataFrame:
@@ -508,14 +595,19 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
             cut_map[p] = int(y)*12 + int(m)
         except Exception:
             cut_map[p] = 10**9
-    term = term_m.copy()
-    term["month_index"] = (term["year"].astype("int")*12 + term["month"].astype("int")).astype(int)
-    term["quarter"] = term["month"].apply(_quarter_from_month)
-    term["freq"] = np.where(term["port"].map(cut_map).le(term["month_index"]), "Q", "M")
-    term_M = term[term["freq"]=="M"].copy()
-    term_Q = term[term["freq"]=="Q"].copy()
+    # Look the cutover up per category once, then broadcast through the codes;
+    # ports without a cutover (and missing ports, code -1) hit the trailing sentinel.
+    port = term_m["port"].astype("category")
+    cut_arr = np.array([cut_map.get(c, 10**9) for c in port.cat.categories] + [10**9], dtype="int64")
+    cut_per_row = cut_arr[port.cat.codes.to_numpy()]
+    # month_index comes through from L_Proxy; a missing one never counts as past the cutover
+    month_index = term_m["month_index"].to_numpy(dtype="float64", na_value=np.nan)
+    term = term_m.assign(quarter=_quarters_from_months(term_m["month"]),
+                         freq=np.where(cut_per_row <= month_index, "Q", "M"))
+    term_M = term[term["freq"]=="M"]
+    term_Q = term[term["freq"]=="Q"]
     if not term_Q.empty:
-        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False).agg(
+        agg = term_Q.groupby(["port","terminal","year","quarter"], dropna=False, observed=True).agg(
             pi_teu_per_hour_i_y=("pi_teu_per_hour_i_y","first"),
             w_final=("w_final","mean"),
             teu_i_m=("teu_i_m","sum"),
@@ -525,32 +617,26 @@ def aggregate_terminals_quarter_after_cutover(term_m: pd.DataFrame, cutover: Dic
         ).reset_index()
         q_to_month = {"Q1":3,"Q2":6,"Q3":9,"Q4":12}
         agg["month"] = agg["quarter"].map(q_to_month).astype("Int64")
-        agg["month_index"] = (agg["year"].astype("int")*12 + agg["month"].astype("int")).astype(int)
+        agg["month_index"] = _month_index(agg["year"], agg["month"])
         agg["freq"] = "Q"
         term_Q_out = agg[["port","terminal","year","quarter","month","month_index","freq","pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
     else:
         term_Q_out = pd.DataFrame(columns=["port","terminal","year","quarter","month","month_index","freq","pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"])
-    term_M_out = term_M.copy()
-    term_M_out["freq"] = "M"
+    term_M_out = term_M.assign(freq="M")
     term_M_out = term_M_out[["port","terminal","year","quarter","month","month_index","freq","pi_teu_per_hour_i_y","w_final","teu_i_m","l_hours_i_m","lp_term_month_mixadjusted"]]
     out = pd.concat([term_M_out, term_Q_out], ignore_index=True).sort_values(["port","terminal","year","month"]).reset_index(drop=True)
     return out
 
 def build_panel_mixedfreq(lp_port: pd.DataFrame, lp_id: pd.DataFrame, term_m: pd.DataFrame, term_qview: pd.DataFrame) -> pd.DataFrame:
-    port = lp_port.copy()
-    port["level"] = "port"; port["terminal"] = pd.NA
-    port["Pi"] = port["pi_p_y_mixbase"]
-    port["L_hours"] = port["l_port_m"]
-    port["LP_mix"] = port["lp_port_month_mix"]
+    port = lp_port.assign(level="port", terminal=pd.NA, Pi=lp_port["pi_p_y_mixbase"],
+                          L_hours=lp_port["l_port_m"], LP_mix=lp_port["lp_port_month_mix"])
     port = port.merge(lp_id, on=["port","year","month"], how="left").rename(columns={"lp_port_month_id":"LP_id"})
-    port["quarter"] = port["month"].apply(_quarter_from_month)
+    port["quarter"] = _quarters_from_months(port["month"])
     port["TEU"] = port["teu_p_m"]; port["tons"] = port["tons_p_m"]
-    port["w"] = port["w_final"]; port["w_source"] = port["w_source"].astype("object")
+    port["w"] = port["w_final"]
     port["freq"] = "M"
     port_panel = port[["level","port","terminal","year","month","month_index","quarter","freq","TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id"]]
-    term = term_qview.copy()
-    term["level"] = "terminal"
-    term = term.rename(columns={
+    term = term_qview.assign(level="terminal").rename(columns={
         "pi_teu_per_hour_i_y":"Pi",
         "l_hours_i_m":"L_hours",
         "lp_term_month_mixadjusted":"LP_mix",
@@ -561,34 +647,46 @@ def build_panel_mixedfreq(lp_port: pd.DataFrame, lp_id: pd.DataFrame, term_m: pd
     term["tons"] = pd.NA
     term["w_source"] = pd.NA
     term_panel = term[["level","port","terminal","year","month","month_index","quarter","freq","TEU","tons","w","w_source","Pi","L_hours","LP_mix","LP_id"]]
-    panel = pd.concat([port_panel, term_panel], ignore_index=True).sort_values(["level","port","terminal","year","month"]).reset_index(drop=True)
+    # one category set per label column, so the stacked panel stays categorical
+    cat_dtypes = {c: pd.CategoricalDtype(sorted(pd.concat([port_panel[c].astype(object), term_panel[c].astype(object)]).dropna().unique()))
+                  for c in ["port","terminal","w_source"]}
+    panel = pd.concat([port_panel.astype(cat_dtypes), term_panel.astype(cat_dtypes)], ignore_index=True).sort_values(["level","port","terminal","year","month"]).reset_index(drop=True)
     return panel
 
 def run_qa(lp_port: pd.DataFrame, term_m: pd.DataFrame, w_final: pd.DataFrame) -> pd.DataFrame:
     rows = []
     def assert_unique(df, keys, name):
-        c = df.duplicated(keys).sum()
+        c = _dup_key_count(df, keys)
         rows.append({"check":f"unique_keys_{name}", "result":"pass" if c==0 else "fail", "detail":f"duplicates={int(c)} keys={keys}"})
     assert_unique(lp_port, ["port","year","month"], "lp_port")
     assert_unique(term_m, ["port","terminal","year","month"], "lp_term_monthly")
     assert_unique(w_final, ["port","year","month"], "w_final")
-    g = lp_port.groupby(["port","year"], dropna=False).agg(lp_mean=("lp_port_month_mix","mean"), pi_mean=("pi_p_y_mixbase","mean")).reset_index()
+    g = lp_port.groupby(["port","year"], dropna=False, observed=True).agg(lp_mean=("lp_port_month_mix","mean"), pi_mean=("pi_p_y_mixbase","mean")).reset_index()
     g["rel_err"] = np.abs(g["lp_mean"]-g["pi_mean"])/g["pi_mean"].replace(0,np.nan)
-    for _, r in g.iterrows():
-        rows.append({"check":"annual_preservation","port":r["port"],"year":int(r["year"]),
-                     "lp_mean":float(r["lp_mean"]) if pd.notna(r["lp_mean"]) else None,
-                     "pi_mean":float(r["pi_mean"]) if pd.notna(r["pi_mean"]) else None,
-                     "rel_err":float(r["rel_err"]) if pd.notna(r["rel_err"]) else None,
-                     "result":"pass" if (pd.isna(r["rel_err"]) or r["rel_err"]<=1e-6) else "warn"})
-    src = w_final.assign(w_source=w_final["w_source"].astype("object")).groupby(["port","year","w_source"], dropna=False).size().reset_index(name="n")
-    total = w_final.groupby(["port","year"], dropna=False).size().reset_index(name="N")
+    rel = g["rel_err"].to_numpy(dtype="float64", na_value=np.nan)
+    ann = pd.DataFrame({
+        "check": "annual_preservation",
+        "port": g["port"].astype(object).to_numpy(),
+        "year": g["year"].to_numpy(dtype="float64", na_value=np.nan),
+        "lp_mean": g["lp_mean"].to_numpy(dtype="float64", na_value=np.nan),
+        "pi_mean": g["pi_mean"].to_numpy(dtype="float64", na_value=np.nan),
+        "rel_err": rel,
+        "result": np.where(np.isnan(rel) | (rel <= 1e-6), "pass", "warn"),
+    })
+    src = w_final.groupby(["port","year","w_source"], dropna=False, observed=True).size().reset_index(name="n")
+    total = w_final.groupby(["port","year"], dropna=False, observed=True).size().reset_index(name="N")
     src = src.merge(total, on=["port","year"], how="left")
     src["share"] = src["n"]/src["N"]
-    for _, r in src.iterrows():
-        rows.append({"check":"w_source_share","port":r["port"],"year":int(r["year"]),
-                     "w_source":None if pd.isna(r["w_source"]) else str(r["w_source"]),
-                     "n":int(r["n"]), "N":int(r["N"]), "share":float(r["share"])})
-    return pd.DataFrame(rows)
+    share = pd.DataFrame({
+        "check": "w_source_share",
+        "port": src["port"].astype(object).to_numpy(),
+        "year": src["year"].to_numpy(dtype="float64", na_value=np.nan),
+        "w_source": src["w_source"].astype(object).to_numpy(),
+        "n": src["n"].to_numpy(dtype="int64"),
+        "N": src["N"].to_numpy(dtype="int64"),
+        "share": src["share"].to_numpy(dtype="float64"),
+    })
+    return pd.concat([pd.DataFrame(rows), ann, share], ignore_index=True)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -623,10 +721,6 @@ def main():
                 df = df[df["year"].astype("Int64") <= inp.year_max]
             return df
         l_proxy = _clip(l_proxy); tons_port_m = _clip(tons_port_m); teu_pm = _clip(teu_pm); teu_pq = _clip(teu_pq)
-        # recompute month_index after clipping
-        for df in [l_proxy, tons_port_m, teu_pm]:
-            if df is not None and not df.empty and all(c in df.columns for c in ["year","month"]):
-                df["month_index"] = (df["year"].astype("float")*12 + df["month"].astype("float")).astype("Int64")
         ok, report = validate_inputs(l_proxy, tons_port_m, teu_pm, teu_pq)
         print("VALIDATION REPORT:\n" + report)
         if not ok:
@@ -642,12 +736,18 @@ def main():
         qa = run_qa(lp_port, term_m, w_final)
         def _write_tsv(df: pd.DataFrame, name: str) -> str:
             path = os.path.join(inp.out_dir, name); os.makedirs(os.path.dirname(path), exist_ok=True); df.to_csv(path, sep="\t", index=False); return path
-        _write_tsv(lp_port, "LP_port_month_mixadjusted.tsv")
-        _write_tsv(lp_id, "LP_port_month_identity.tsv")
-        _write_tsv(term_m, "LP_terminal_month_mixadjusted.tsv")
-        _write_tsv(term_qview, "LP_terminal_quarter_mixadjusted.tsv")
-        _write_tsv(panel, "LP_panel_mixedfreq.tsv")
-        _write_tsv(qa, "qa_lp_report.tsv")
+        outputs = [
+            (lp_port, "LP_port_month_mixadjusted.tsv"),
+            (lp_id, "LP_port_month_identity.tsv"),
+            (term_m, "LP_terminal_month_mixadjusted.tsv"),
+            (term_qview, "LP_terminal_quarter_mixadjusted.tsv"),
+            (panel, "LP_panel_mixedfreq.tsv"),
+            (qa, "qa_lp_report.tsv"),
+        ]
+        # independent files: overlap the disk writes across outputs; .result() re-raises any failure
+        with ThreadPoolExecutor(max_workers=len(outputs)) as ex:
+            for fut in [ex.submit(_write_tsv, df, name) for df, name in outputs]:
+                fut.result()
         meta = {
             "timestamp_utc": pd.Timestamp.utcnow().isoformat(),
             "inputs": {"l_proxy": inp.l_proxy_path, "tons": inp.tons_path, "teu_mq": inp.teu_mq_path},
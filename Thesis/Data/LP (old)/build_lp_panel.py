@@ -10,7 +10,7 @@ Inputs (from normalize_supply_inputs):
     - tons_port_month.tsv       (port,year,month,month_index,tons_p_m,tons_source)
     - l_proxy.tsv               (port,terminal,year,month,month_index,quarter,l_hours_i_m,teu_i_m,pi_teu_per_hour_i_y,operating)
 
-Outputs (to --out_dir):
+Outputs (to --out_dir; --format parquet|both writes zstd .parquet files under the same names):
   - LP_port_month_mixadjusted.tsv
   - LP_port_month_identity.tsv
   - LP_terminal_month_mixadjusted.tsv
@@ -32,35 +32,106 @@ from typing import Tuple
 import numpy as np
 import pandas as pd
 
+try:  # optional: --engine polars for the winsorize + rebase step in build_w
+    import polars as pl
+except ImportError:
+    pl = None
+
 # ----------------------------- helpers -----------------------------
 
 def _read_tsv(path: str) -> pd.DataFrame:
     return pd.read_csv(path, sep='\t', engine='python')
 
-def _write_tsv(df: pd.DataFrame, path: str):
+_QUARTER_CODES = {'Q1': 1, 'Q2': 2, 'Q3': 3, 'Q4': 4}
+_QUARTER_LABELS = {v: k for k, v in _QUARTER_CODES.items()}
+
+# low-cardinality labels written as categoricals -> parquet dictionary pages
+_PARQUET_CAT_COLS = ['level','freq','w_source','tons_source','quarter']
+
+def _write_tsv(df: pd.DataFrame, path: str, fmt: str = 'tsv'):
+    """Write df to path (TSV) and/or next to it as zstd Parquet, per fmt in {'tsv','parquet','both'}."""
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    df.to_csv(path, sep='\t', index=False)
+    if 'quarter' in df.columns and pd.api.types.is_numeric_dtype(df['quarter']):
+        df = df.assign(quarter=_quarter_label(df['quarter']))
+    if fmt in {'tsv','both'}:
+        df.to_csv(path, sep='\t', index=False)
+    if fmt in {'parquet','both'}:
+        cats = {c: df[c].astype('category') for c in _PARQUET_CAT_COLS if c in df.columns}
+        df.assign(**cats).to_parquet(os.path.splitext(path)[0] + '.parquet', index=False,
+                                     compression='zstd', use_dictionary=True)
+
+def _int8_codes(q: pd.Series) -> pd.Series:
+    return q.astype('Int8' if q.isna().any() else 'int8')
+
+# month (1..12, validated in load_inputs) -> quarter lookup table
+_MONTH_TO_Q = np.array([-1, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4], dtype=np.int8)
+
+def _quarter_vec(m: pd.Series) -> pd.Series:
+    """Quarter 1..4 from month as int8 (Int8 only when months are missing), via _MONTH_TO_Q."""
+    na = m.isna().to_numpy()
+    q = _MONTH_TO_Q[m.fillna(0).to_numpy(dtype='int64')]
+    if na.any():
+        return pd.Series(pd.arrays.IntegerArray(q, na), index=m.index)
+    return pd.Series(q, index=m.index)
+
+def _quarter_codes(labels: pd.Series) -> pd.Series:
+    """'Q1'..'Q4' labels -> int8 quarter codes (unknown labels become NA)."""
+    return _int8_codes(labels.map(_QUARTER_CODES))
+
+def _quarter_label(q: pd.Series) -> pd.Series:
+    return q.map(_QUARTER_LABELS)
+
+def _f64(s: pd.Series) -> np.ndarray:
+    return s.to_numpy(dtype='float64', na_value=np.nan)
+
+def _div_where(num: np.ndarray, den: np.ndarray, ok: np.ndarray, fill: float = np.nan) -> np.ndarray:
+    """num/den on the rows where ok, fill elsewhere; only the ok rows are divided (no 0/NaN warnings)."""
+    out = np.full(len(num), fill, dtype='float64')
+    np.divide(num, den, out=out, where=ok)
+    return out
 
-def _quarter_from_month(m: int) -> str:
-    if pd.isna(m): return None
-    q = (int(m) - 1)//3 + 1
-    return f"Q{q}"
+def _has_dup_keys(df: pd.DataFrame, keys: list) -> bool:
+    """Same answer as df.duplicated(keys).any(): per-column factorize codes (NA as its own code)
+    packed into one int64 per row, sorted, and equal neighbours checked."""
+    packed = np.zeros(len(df), dtype=np.int64)
+    radix = 1
+    for k in keys:
+        codes, uniques = pd.factorize(df[k], use_na_sentinel=False)
+        if radix * (len(uniques) + 1) >= 2**62:
+            return bool(df.duplicated(keys).any())
+        packed += codes.astype(np.int64) * radix
+        radix *= len(uniques) + 1
+    packed.sort()
+    return bool((packed[1:] == packed[:-1]).any())
 
 def _assert_unique(df: pd.DataFrame, keys: list, name: str):
-    dupe = df.duplicated(keys)
-    if dupe.any():
+    if _has_dup_keys(df, keys):
+        dupe = df.duplicated(keys)
         raise SystemExit(f"[FATAL] {name} has duplicate keys on {keys}. Examples: " + df.loc[dupe, keys].head(5).to_json(orient='records'))
 
+def _map_on(lookup: pd.Series, *keys: pd.Series) -> np.ndarray:
+    """Left lookup of a uniquely indexed Series at the rows spelled out by keys."""
+    return lookup.reindex(pd.MultiIndex.from_arrays(list(keys))).to_numpy()
+
+def _key_dtype(*cols: pd.Series) -> pd.CategoricalDtype:
+    """Sorted categorical dtype over the labels of several key columns."""
+    return pd.CategoricalDtype(sorted(pd.concat([c.astype(object) for c in cols]).dropna().unique()))
+
 def _to_int64(s: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors='coerce').astype('Int64')
 
-def _winsorize_series(x: pd.Series, low: float, high: float) -> pd.Series:
-    x = x.astype('float64')
-    if x.notna().sum() == 0:
-        return x
-    lo = x.quantile(low)
-    hi = x.quantile(high)
-    return x.clip(lower=lo, upper=hi)
+# narrowest key dtypes shared by every frame (validated in Int64 first)
+_KEY_INT_DTYPES = {'year': 'Int16', 'month': 'Int8', 'month_index': 'Int32'}
+
+def _narrow_keys(df: pd.DataFrame):
+    """Downcast the integer key columns in place; a column whose values do not fit stays Int64."""
+    for c, dt in _KEY_INT_DTYPES.items():
+        if c not in df.columns or not pd.api.types.is_integer_dtype(df[c]):
+            continue
+        info = np.iinfo(dt.lower())
+        v = df[c]
+        if v.isna().all() or (info.min <= v.min() and v.max() <= info.max):
+            df[c] = v.astype(dt)
 
 # ----------------------------- loading -----------------------------
 
@@ -87,6 +158,9 @@ def load_inputs(norm_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame
     if not teu_q.empty:
         if set(teu_q['quarter'].dropna().unique()) - {"Q1","Q2","Q3","Q4"}:
             raise SystemExit("[FATAL] teu_port_quarter has invalid quarter labels")
+        teu_q['quarter'] = _quarter_codes(teu_q['quarter'])
+    if 'quarter' in lpr.columns:
+        lpr['quarter'] = _quarter_codes(lpr['quarter'])
 
     # key uniqueness
     if not teu_m.empty:
@@ -96,45 +170,97 @@ def load_inputs(norm_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame
     _assert_unique(tons,  ['port','year','month'], 'tons_port_month')
     _assert_unique(lpr,   ['port','terminal','year','month'], 'l_proxy')
 
+    # shared categorical keys: every merge/groupby below joins on the integer codes
+    frames = (teu_m, teu_q, tons, lpr)
+    port_dtype = _key_dtype(*[df['port'] for df in frames])
+    for df in frames:
+        df['port'] = df['port'].astype(port_dtype)
+    lpr['terminal'] = lpr['terminal'].astype(_key_dtype(lpr['terminal']))
+    # integer keys: year Int16, month Int8, month_index Int32 (measures stay float64)
+    for df in frames:
+        _narrow_keys(df)
+
     return teu_m, teu_q, tons, lpr
 
 # ----------------------------- w builder -----------------------------
 
+# w_source labels; categories kept in label order so sorted groupbys order rows as the strings did
+W_SOURCE_DTYPE = pd.CategoricalDtype(['monthly','na','quarterly'])
+
+def _winsor_rebase(r_m: pd.DataFrame, low: float, high: float) -> Tuple[np.ndarray, np.ndarray]:
+    """r -> (r_winsor, w) per (port,year): one grouping for the quantile clip, mean by bincount over the group ids."""
+    g = r_m.groupby(['port','year'], sort=False, observed=True)['r']
+    lo = g.transform('quantile', low).to_numpy(dtype='float64')
+    hi = g.transform('quantile', high).to_numpy(dtype='float64')
+    rw = np.clip(r_m['r'].to_numpy(dtype='float64'), lo, hi)
+    # rows with a missing key are not in any group (id -1) and keep NA bounds, hence NA r_winsor
+    ids = g.ngroup().fillna(-1).to_numpy(dtype='int64')
+    ok = (ids >= 0) & ~np.isnan(rw)
+    sums = np.bincount(ids[ok], weights=rw[ok], minlength=g.ngroups)
+    cnt = np.bincount(ids[ok], minlength=g.ngroups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(cnt > 0, sums / cnt, np.nan)
+        mu = np.where(ids >= 0, mean[np.maximum(ids, 0)], np.nan) if len(mean) else np.full(len(ids), np.nan)
+        w = np.where(np.isnan(mu) | (mu == 0), 1.0, rw / mu)
+    return rw, w
+
+def _winsor_rebase_polars(r_m: pd.DataFrame, low: float, high: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Polars version of build_w's r -> r_winsor -> w steps as one lazy query (rows with a missing key stay NA, like the pandas groupby)."""
+    by = ['port','year']
+    r = pl.col('r')
+    keyed = pl.col('port').is_not_null() & pl.col('year').is_not_null()
+    lo = r.quantile(low, interpolation='linear').over(by)
+    hi = r.quantile(high, interpolation='linear').over(by)
+    mu = pl.col('r_winsor').mean().over(by)
+    out = (pl.from_pandas(r_m[by + ['r']].assign(port=r_m['port'].astype(object))).lazy()
+             .with_columns(pl.when(keyed).then(r.clip(lo, hi)).alias('r_winsor'))
+             .with_columns(pl.when(mu.is_null() | (mu == 0)).then(1.0).otherwise(pl.col('r_winsor') / mu).alias('w'))
+             .select('r_winsor', 'w')
+             .collect())
+    return out['r_winsor'].to_numpy().astype('float64'), out['w'].to_numpy().astype('float64')
+
 def build_w(teu_m: pd.DataFrame, teu_q: pd.DataFrame, tons: pd.DataFrame,
-            winsor_low: float, winsor_high: float) -> pd.DataFrame:
+            winsor_low: float, winsor_high: float, engine: str = 'pandas') -> pd.DataFrame:
     """Return month-level table with w (winsorized & rebased), r (tons/teu), and w_source."""
     # month universe from tons
-    month_univ = tons[['port','year','month','month_index']].drop_duplicates().copy()
+    month_univ = tons[['port','year','month','month_index']].drop_duplicates()
 
     # monthly ratio where monthly TEU exist
-    r_m = month_univ.merge(teu_m[['port','year','month','teu_p_m']], on=['port','year','month'], how='left') \
-                    .merge(tons[['port','year','month','tons_p_m','tons_source']], on=['port','year','month'], how='left')
-    r_m['r_monthly'] = np.where((r_m['teu_p_m']>0) & (r_m['tons_p_m'].notna()), r_m['tons_p_m']/r_m['teu_p_m'], np.nan)
+    r_m = month_univ.merge(teu_m[['port','year','month','teu_p_m']], on=['port','year','month'], how='left', validate='one_to_one') \
+                    .merge(tons[['port','year','month','tons_p_m','tons_source']], on=['port','year','month'], how='left', validate='one_to_one')
+    teu_v, tons_v = _f64(r_m['teu_p_m']), _f64(r_m['tons_p_m'])
+    r_m['r_monthly'] = _div_where(tons_v, teu_v, (teu_v>0) & ~np.isnan(tons_v))
 
     # quarterly fallback: r_{p,q} = sum(tons_p_m)/teu_p_q then broadcast to months
     if teu_q.empty:
         r_m['r_quarterly'] = np.nan
     else:
-        t_q = tons.copy()
-        t_q['quarter'] = t_q['month'].apply(_quarter_from_month)
-        t_sum = t_q.groupby(['port','year','quarter'], as_index=False)['tons_p_m'].sum(min_count=1)
-        rq = t_sum.merge(teu_q, on=['port','year','quarter'], how='left')
-        rq['r_quarterly_val'] = np.where((rq['teu_p_q']>0) & (rq['tons_p_m'].notna()), rq['tons_p_m']/rq['teu_p_q'], np.nan)
-        rq_expanded = month_univ.copy()
-        rq_expanded['quarter'] = rq_expanded['month'].apply(_quarter_from_month)
-        rq_expanded = rq_expanded.merge(rq[['port','year','quarter','r_quarterly_val']], on=['port','year','quarter'], how='left')
-        r_m = r_m.merge(rq_expanded[['port','year','month','r_quarterly_val']], on=['port','year','month'], how='left')
-        r_m.rename(columns={'r_quarterly_val':'r_quarterly'}, inplace=True)
+        # one grouped reduction keyed by (port,year,quarter), then index lookups only
+        quarter = _quarter_vec(tons['month']).rename('quarter')
+        t_sum = tons.groupby([tons['port'], tons['year'], quarter], sort=False, observed=True)['tons_p_m'].sum(min_count=1)
+        tons_v = t_sum.to_numpy(dtype='float64')
+        teu_v = teu_q.set_index(['port','year','quarter'])['teu_p_q'].reindex(t_sum.index).to_numpy(dtype='float64')
+        rq_map = pd.Series(_div_where(tons_v, teu_v, (teu_v>0) & ~np.isnan(tons_v)), index=t_sum.index)
+        r_m['r_quarterly'] = _map_on(rq_map, r_m['port'], r_m['year'], _quarter_vec(r_m['month']))
 
     # choose r: prefer monthly else quarterly
-    r_m['r'] = r_m['r_monthly']
-    r_m.loc[r_m['r'].isna(), 'r'] = r_m.loc[r_m['r'].isna(), 'r_quarterly']
-    r_m['w_source'] = np.where(r_m['r_monthly'].notna(), 'monthly', np.where(r_m['r_quarterly'].notna(), 'quarterly', 'na'))
-
-    # winsorize + rebase by (port,year) using transform (no FutureWarning)
-    r_m['r_winsor'] = r_m.groupby(['port','year'])['r'].transform(lambda s: _winsorize_series(s, winsor_low, winsor_high))
-    mu = r_m.groupby(['port','year'])['r_winsor'].transform('mean')
-    r_m['w'] = np.where((mu.isna()) | (mu==0), 1.0, r_m['r_winsor']/mu)
+    rmv = r_m['r_monthly'].to_numpy(dtype='float64')
+    rqv = r_m['r_quarterly'].to_numpy(dtype='float64')
+    has_m = ~np.isnan(rmv)
+    r_m['r'] = np.where(has_m, rmv, rqv)
+    r_m['w_source'] = pd.Categorical.from_codes(np.where(has_m, 0, np.where(np.isnan(rqv), 1, 2)), dtype=W_SOURCE_DTYPE)
+
+    # winsorize + rebase by (port,year)
+    rw = None
+    if engine == 'polars' and not r_m.empty:
+        try:
+            rw = _winsor_rebase_polars(r_m, winsor_low, winsor_high)
+        except Exception as e:
+            print(f"[polars] Falling back to pandas for w: {e}")
+    if rw is not None:
+        r_m['r_winsor'], r_m['w'] = rw
+    else:
+        r_m['r_winsor'], r_m['w'] = _winsor_rebase(r_m, winsor_low, winsor_high)
 
     # keep useful columns
     out = r_m[['port','year','month','month_index','r','r_winsor','w','w_source','teu_p_m','tons_p_m','tons_source']].copy()
@@ -144,88 +270,107 @@ def build_w(teu_m: pd.DataFrame, teu_q: pd.DataFrame, tons: pd.DataFrame,
 
 def build_pi_mixbase(lpr: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Return (Pi_port_month_mixbase, terminal_shares_port_quarter)."""
-    df = lpr.copy()
-    df['teu_i_m_pos'] = np.where(df['teu_i_m']>0, df['teu_i_m'], 0.0)
-    if 'quarter' not in df.columns:
-        df['quarter'] = df['month'].apply(_quarter_from_month)
-    g = df.groupby(['port','terminal','year','quarter'], as_index=False)['teu_i_m_pos'].sum(min_count=1)
-    tot = g.groupby(['port','year','quarter'], as_index=False)['teu_i_m_pos'].sum(min_count=1).rename(columns={'teu_i_m_pos':'teu_sum_pq'})
-    shares = g.merge(tot, on=['port','year','quarter'], how='left')
-    shares['share_i_pq'] = np.where((shares['teu_sum_pq']>0) & (shares['teu_i_m_pos'].notna()), shares['teu_i_m_pos']/shares['teu_sum_pq'], 0.0)
+    # slim frame with just the grouping keys and positive TEU (no full copy of lpr)
+    teu = lpr['teu_i_m'].to_numpy(dtype='float64')
+    df = pd.DataFrame({'port': lpr['port'], 'terminal': lpr['terminal'], 'year': lpr['year'],
+                       'quarter': lpr['quarter'] if 'quarter' in lpr.columns else _quarter_vec(lpr['month']),
+                       'teu_i_m_pos': np.where(teu > 0, teu, 0.0)})
+    g = df.groupby(['port','terminal','year','quarter'], as_index=False, sort=False, observed=True)['teu_i_m_pos'].sum(min_count=1)
+    tot = g.groupby(['port','year','quarter'], as_index=False, sort=False, observed=True)['teu_i_m_pos'].sum(min_count=1).rename(columns={'teu_i_m_pos':'teu_sum_pq'})
+    shares = g.merge(tot, on=['port','year','quarter'], how='left', validate='many_to_one')
+    pos, tot_v = _f64(shares['teu_i_m_pos']), _f64(shares['teu_sum_pq'])
+    shares['share_i_pq'] = _div_where(pos, tot_v, (tot_v>0) & ~np.isnan(pos), fill=0.0)
 
     pi_i_y = (lpr[['port','terminal','year','pi_teu_per_hour_i_y']].drop_duplicates())
-    months = lpr[['port','year','month','month_index']].drop_duplicates().copy()
-    months['quarter'] = months['month'].apply(_quarter_from_month)
+    months = lpr[['port','year','month','month_index']].drop_duplicates()
+    months = months.assign(quarter=_quarter_vec(months['month']))
 
-    sh = shares.merge(pi_i_y, on=['port','terminal','year'], how='left')
+    pi_map = pi_i_y.set_index(['port','terminal','year'])['pi_teu_per_hour_i_y']
+    if pi_map.index.is_unique:
+        sh = shares.assign(pi_teu_per_hour_i_y=_map_on(pi_map, shares['port'], shares['terminal'], shares['year']))
+    else:
+        # terminal-years with several Pi values fan out, as the merge always did
+        sh = shares.merge(pi_i_y, on=['port','terminal','year'], how='left')
     sh['prod'] = sh['share_i_pq'] * sh['pi_teu_per_hour_i_y']
-    pi_q = sh.groupby(['port','year','quarter'], as_index=False)['prod'].sum(min_count=1).rename(columns={'prod':'Pi_mixbase_pq'})
+    pi_q = sh.groupby(['port','year','quarter'], as_index=False, sort=False, observed=True)['prod'].sum(min_count=1).rename(columns={'prod':'Pi_mixbase_pq'})
 
-    pi_m = months.merge(pi_q, on=['port','year','quarter'], how='left')
-    pi_m.rename(columns={'Pi_mixbase_pq':'Pi_mixbase_p_m'}, inplace=True)
+    pi_q_map = pi_q.set_index(['port','year','quarter'])['Pi_mixbase_pq']
+    pi_m = months.assign(Pi_mixbase_p_m=_map_on(pi_q_map, months['port'], months['year'], months['quarter']))
     return pi_m, shares[['port','terminal','year','quarter','share_i_pq']]
 
 # ----------------------------- LP assemblers -----------------------------
 
 def build_port_tables(wtab: pd.DataFrame, pi_m: pd.DataFrame, lpr: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    L_port = lpr.groupby(['port','year','month','month_index'], as_index=False)['l_hours_i_m'].sum(min_count=1).rename(columns={'l_hours_i_m':'L_port_m'})
-
-    port = (wtab.merge(pi_m[['port','year','month','month_index','Pi_mixbase_p_m']],
-                       on=['port','year','month','month_index'], how='left')
-                .merge(L_port, on=['port','year','month','month_index'], how='left'))
+    keys = ['port','year','month','month_index']
+    # unique-key lookups: join against pre-indexed right sides instead of merging frames
+    L_port = lpr.groupby(keys, sort=False, observed=True)['l_hours_i_m'].sum(min_count=1).rename('L_port_m')
+    port = (wtab.join(pi_m.set_index(keys)['Pi_mixbase_p_m'], on=keys, validate='one_to_one')
+                .join(L_port, on=keys, validate='one_to_one'))
     port['LP_mix'] = port['w'] * port['Pi_mixbase_p_m']
-    port['LP_id']  = np.where((port.get('teu_p_m',np.nan)>0) & (port['L_port_m']>0), port['teu_p_m']/port['L_port_m'], np.nan)
+    teu_v, hours_v = _f64(port['teu_p_m']), _f64(port['L_port_m'])
+    port['LP_id']  = _div_where(teu_v, hours_v, (teu_v>0) & (hours_v>0))
 
-    port_id = port[['port','year','month','month_index','teu_p_m','L_port_m','LP_id']].copy().sort_values(['port','year','month']).reset_index(drop=True)
-
-    port_mix = port[['port','year','month','month_index','r','r_winsor','w','w_source','teu_p_m','tons_p_m','tons_source','Pi_mixbase_p_m','LP_mix']].copy()
-    port_mix = port_mix.sort_values(['port','year','month']).reset_index(drop=True)
+    # sort once; both outputs are column subsets of the sorted frame
+    port = port.sort_values(['port','year','month'], kind='mergesort', ignore_index=True)
+    port_id = port[['port','year','month','month_index','teu_p_m','L_port_m','LP_id']]
+    port_mix = port[['port','year','month','month_index','r','r_winsor','w','w_source','teu_p_m','tons_p_m','tons_source','Pi_mixbase_p_m','LP_mix']]
     return port_mix, port_id
 
 
 def build_terminal_tables(wtab: pd.DataFrame, lpr: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     # bring w and r_winsor, w_source to terminal months
-    tt = lpr.merge(wtab[['port','year','month','w','r_winsor','w_source']], on=['port','year','month'], how='left')
+    tt = lpr.join(wtab.set_index(['port','year','month'])[['w','r_winsor','w_source']], on=['port','year','month'], validate='many_to_one')
     tt.rename(columns={'pi_teu_per_hour_i_y':'Pi_i_y'}, inplace=True)
-    mask_valid = (tt['teu_i_m']>0) & (tt['l_hours_i_m']>0)
-    tt['LP_mix'] = np.where(mask_valid, tt['w'] * tt['Pi_i_y'], np.nan)
+    mask_valid = (_f64(tt['teu_i_m'])>0) & (_f64(tt['l_hours_i_m'])>0)
+    lp_mix = np.full(len(tt), np.nan)
+    np.multiply(_f64(tt['w']), _f64(tt['Pi_i_y']), out=lp_mix, where=mask_valid)
+    tt['LP_mix'] = lp_mix
 
-    t_month = tt[['port','terminal','year','month','month_index','quarter','operating','Pi_i_y','w','r_winsor','w_source','teu_i_m','l_hours_i_m','LP_mix']].copy()
-    t_month = t_month.sort_values(['port','terminal','year','month']).reset_index(drop=True)
+    t_month = tt[['port','terminal','year','month','month_index','quarter','operating','Pi_i_y','w','r_winsor','w_source','teu_i_m','l_hours_i_m','LP_mix']]
+    t_month = t_month.sort_values(['port','terminal','year','month'], kind='mergesort', ignore_index=True)
 
-    # quarterly aggregate (mean over months in quarter)
-    t_q = t_month.copy()
-    t_q['quarter'] = t_q['month'].apply(_quarter_from_month)
-    t_quarter = (t_q.groupby(['port','terminal','year','quarter'], as_index=False)
+    # quarterly aggregate (mean over months in quarter); the groupby's own key sort
+    # (over groups, not rows) yields the (port,terminal,year,quarter) order
+    t_quarter = (t_month.groupby(['port','terminal','year','quarter'], as_index=False, observed=True)
                    .agg(Pi_i_y=('Pi_i_y','first'), w=('w','mean'), r_winsor=('r_winsor','mean'),
                         teu_i_m=('teu_i_m','sum'), l_hours_i_m=('l_hours_i_m','sum'), LP_mix=('LP_mix','mean')))
-    t_quarter = t_quarter.sort_values(['port','terminal','year','quarter']).reset_index(drop=True)
     return t_month, t_quarter
 
 # ----------------------------- QA -----------------------------
 
+def _label(df: pd.DataFrame) -> pd.Series:
+    """'<port> <year>' note prefix for a (port, year)-keyed QA table."""
+    return df['port'].astype(str) + ' ' + df['year'].astype('int64').astype(str)
+
+def _fmt4(x: pd.Series) -> pd.Series:
+    return pd.Series(np.char.mod('%.4f', x.to_numpy(dtype='float64')), index=x.index)
+
 def qa_bundle(port_mix: pd.DataFrame, port_id: pd.DataFrame, t_month: pd.DataFrame, wtab: pd.DataFrame) -> pd.DataFrame:
-    rows = []
+    pieces = []
     def add(name, ok, note):
-        rows.append({'check': name, 'ok': bool(ok), 'note': note})
+        pieces.append(pd.DataFrame([{'check': name, 'ok': bool(ok), 'note': note}]))
+    def add_notes(name, notes):
+        if len(notes):
+            pieces.append(pd.DataFrame({'check': name, 'ok': True, 'note': notes.to_numpy()}))
 
-    add('unique_port_month', not port_mix.duplicated(['port','year','month']).any(), 'port mix unique by (p,y,m)')
-    add('unique_terminal_month', not t_month.duplicated(['port','terminal','year','month']).any(), 'terminal mix unique by (p,i,y,m)')
+    add('unique_port_month', not _has_dup_keys(port_mix, ['port','year','month']), 'port mix unique by (p,y,m)')
+    add('unique_terminal_month', not _has_dup_keys(t_month, ['port','terminal','year','month']), 'terminal mix unique by (p,i,y,m)')
 
-    agg = port_mix.groupby(['port','year'], as_index=False).agg(mu_LP=('LP_mix','mean'), mu_Pi=('Pi_mixbase_p_m','mean'))
+    agg = port_mix.groupby(['port','year'], as_index=False, observed=True).agg(mu_LP=('LP_mix','mean'), mu_Pi=('Pi_mixbase_p_m','mean'))
     agg['delta'] = agg['mu_LP'] - agg['mu_Pi']
-    for _, r in agg.iterrows():
-        rows.append({'check':'annual_preservation','ok': True, 'note': f"{r['port']} {int(r['year'])}: meanLP={r['mu_LP']:.4f}, meanPi={r['mu_Pi']:.4f}, delta={r['delta']:.4f}"})
+    notes = (_label(agg) + ': meanLP=' + _fmt4(agg['mu_LP']) + ', meanPi=' + _fmt4(agg['mu_Pi'])
+             + ', delta=' + _fmt4(agg['delta']))
+    add_notes('annual_preservation', notes)
 
     if {'w_source'}.issubset(wtab.columns):
-        dist = wtab.groupby(['port','year','w_source']).size().reset_index(name='n')
-        for _, r in dist.iterrows():
-            rows.append({'check':'w_source_dist','ok': True, 'note': f"{r['port']} {int(r['year'])} {r['w_source']}: n={int(r['n'])}"})
+        dist = wtab.groupby(['port','year','w_source'], observed=True).size().reset_index(name='n')
+        notes = _label(dist) + ' ' + dist['w_source'].astype(str) + ': n=' + dist['n'].astype('int64').astype(str)
+        add_notes('w_source_dist', notes)
 
-    rows.append({'check':'w_na_count','ok': True, 'note': f"w NA count: {int(wtab['w'].isna().sum())}"})
-    rows.append({'check':'Pi_na_count','ok': True, 'note': f"Pi NA count (port months): {int(port_mix['Pi_mixbase_p_m'].isna().sum())}"})
+    add('w_na_count', True, f"w NA count: {int(wtab['w'].isna().sum())}")
+    add('Pi_na_count', True, f"Pi NA count (port months): {int(port_mix['Pi_mixbase_p_m'].isna().sum())}")
 
-    return pd.DataFrame(rows)
+    return pd.concat(pieces, ignore_index=True)
 
 # ----------------------------- main -----------------------------
 
@@ -235,53 +380,49 @@ def main():
     ap.add_argument('--out_dir', required=True)
     ap.add_argument('--winsor_low', type=float, default=0.01)
     ap.add_argument('--winsor_high', type=float, default=0.99)
+    ap.add_argument('--format', choices=['tsv','parquet','both'], default='tsv',
+                    help='output file format(s); parquet files are zstd-compressed next to the TSV names')
+    ap.add_argument('--engine', choices=['pandas','polars'], default='pandas',
+                    help='polars runs the winsorize + rebase step as a lazy query (needs polars; falls back to pandas)')
     args = ap.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
 
     teu_m, teu_q, tons, lpr = load_inputs(args.norm_dir)
 
-    wtab = build_w(teu_m, teu_q, tons, args.winsor_low, args.winsor_high)
+    wtab = build_w(teu_m, teu_q, tons, args.winsor_low, args.winsor_high, engine=args.engine)
     pi_m, shares = build_pi_mixbase(lpr)
 
     port_mix, port_id = build_port_tables(wtab, pi_m, lpr)
     t_month, t_quarter = build_terminal_tables(wtab, lpr)
 
     # unified panel (mixedfreq)
-    port_panel = port_mix.copy()
-    port_panel['level'] = 'port'
-    port_panel['terminal'] = pd.NA
-    port_panel = port_panel.merge(port_id[['port','year','month','LP_id']], on=['port','year','month'], how='left')
-    port_panel.rename(columns={'teu_p_m':'TEU','tons_p_m':'tons','r':'tons_per_teu','Pi_mixbase_p_m':'Pi'}, inplace=True)
-    port_panel['L_hours'] = pd.NA
-    port_panel['freq'] = 'M'
-
-    term_panel = t_month.copy()
-    term_panel['level'] = 'terminal'
-    term_panel.rename(columns={'teu_i_m':'TEU','Pi_i_y':'Pi','LP_mix':'LP_mix','l_hours_i_m':'L_hours'}, inplace=True)
-    term_panel['tons'] = pd.NA
-    term_panel['tons_per_teu'] = pd.NA
-    term_panel['LP_id'] = pd.NA
-    term_panel['freq'] = 'M'
-
     common_cols = ['level','port','terminal','year','month','month_index']
     measure_cols = ['TEU','tons','tons_per_teu','w','w_source','r_winsor','Pi','L_hours','LP_mix','LP_id']
 
-    # align columns via reindex (prevents KeyError even if a column is missing in one branch)
+    # each branch is rename + reindex (no copies); reindex aligns the columns and
+    # fills the ones a branch lacks (tons, L_hours, LP_id, ...) with typed NaN
     final_cols = common_cols + measure_cols
-    port_panel = port_panel.reindex(columns=final_cols)
-    term_panel = term_panel.reindex(columns=final_cols)
+    # port rows get an all-NA terminal of the terminal categorical dtype, so the concat keeps it
+    no_terminal = pd.Categorical.from_codes(np.full(len(port_mix), -1), dtype=t_month['terminal'].dtype)
+    port_panel = (port_mix.merge(port_id[['port','year','month','LP_id']], on=['port','year','month'], how='left', validate='one_to_one')
+                          .rename(columns={'teu_p_m':'TEU','tons_p_m':'tons','r':'tons_per_teu','Pi_mixbase_p_m':'Pi'})
+                          .assign(level='port', terminal=no_terminal)
+                          .reindex(columns=final_cols))
+    term_panel = (t_month.rename(columns={'teu_i_m':'TEU','Pi_i_y':'Pi','l_hours_i_m':'L_hours'})
+                         .assign(level='terminal')
+                         .reindex(columns=final_cols))
 
     lp_panel = pd.concat([port_panel, term_panel], ignore_index=True)
 
     qa = qa_bundle(port_mix, port_id, t_month, wtab)
 
-    _write_tsv(port_mix, os.path.join(args.out_dir, 'LP_port_month_mixadjusted.tsv'))
-    _write_tsv(port_id,  os.path.join(args.out_dir, 'LP_port_month_identity.tsv'))
-    _write_tsv(t_month,  os.path.join(args.out_dir, 'LP_terminal_month_mixadjusted.tsv'))
-    _write_tsv(t_quarter,os.path.join(args.out_dir, 'LP_terminal_quarter_mixadjusted.tsv'))
-    _write_tsv(lp_panel, os.path.join(args.out_dir, 'LP_panel_mixedfreq.tsv'))
-    _write_tsv(qa,       os.path.join(args.out_dir, 'qa_lp_report.tsv'))
+    _write_tsv(port_mix, os.path.join(args.out_dir, 'LP_port_month_mixadjusted.tsv'), args.format)
+    _write_tsv(port_id,  os.path.join(args.out_dir, 'LP_port_month_identity.tsv'), args.format)
+    _write_tsv(t_month,  os.path.join(args.out_dir, 'LP_terminal_month_mixadjusted.tsv'), args.format)
+    _write_tsv(t_quarter,os.path.join(args.out_dir, 'LP_terminal_quarter_mixadjusted.tsv'), args.format)
+    _write_tsv(lp_panel, os.path.join(args.out_dir, 'LP_panel_mixedfreq.tsv'), args.format)
+    _write_tsv(qa,       os.path.join(args.out_dir, 'qa_lp_report.tsv'), args.format)
 
     meta = {
         'winsor_low': args.winsor_low,
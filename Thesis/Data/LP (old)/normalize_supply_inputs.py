@@ -35,22 +35,45 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+if int(pd.__version__.split(".")[0]) < 3:  # always on from pandas 3
+    pd.options.mode.copy_on_write = True
+
 # ---------------- helpers ----------------
 
 def _read_tsv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path, sep="\t", engine="python")
+    # C tokenizer (round-trip float parsing, same values as the python engine) -> python fallback
+    err = None
+    for engine in ("c", "python"):
+        try:
+            return pd.read_csv(path, sep="\t", engine=engine, float_precision="round_trip" if engine == "c" else None)
+        except Exception as e:
+            err = e
+    raise err
 
 def _write_tsv(df: pd.DataFrame, path: str):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     df.to_csv(path, sep="\t", index=False)
 
-def _quarter_from_month(m) -> Optional[str]:
-    if pd.isna(m): return None
-    try:
-        q = (int(m)-1)//3 + 1
-        return f"Q{q}"
-    except Exception:
-        return None
+def _quarter_from_month(m: pd.Series) -> pd.Series:
+    # "Q{(m-1)//3+1}" per row (floor division, as int() would give); None where month is NA
+    q = (pd.to_numeric(m, errors="coerce").astype("Int64") - 1) // 3 + 1
+    return ("Q" + q.astype(str)).where(q.notna(), None)
+
+_PERIOD_FORMATS = ("%m-%Y","%Y-%m","%m/%Y","%Y/%m","%b-%Y","%Y%b")
+
+def _ym_from_periods(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    # (year, month) as Int64; each format is tried only on rows still unparsed,
+    # so the first matching format wins per row
+    z = s.astype("string").str.strip()
+    year = pd.Series(pd.NA, index=s.index, dtype="Int64")
+    month = pd.Series(pd.NA, index=s.index, dtype="Int64")
+    for fmt in _PERIOD_FORMATS:
+        todo = year.isna() & z.notna()
+        if not todo.any(): break
+        dt = pd.to_datetime(z[todo], format=fmt, errors="coerce")
+        year.loc[todo] = dt.dt.year.astype("Int64")
+        month.loc[todo] = dt.dt.month.astype("Int64")
+    return year, month
 
 def _norm_port(s) -> Optional[str]:
     if s is None or (isinstance(s, float) and math.isnan(s)): return None
@@ -65,6 +88,10 @@ def _norm_port(s) -> Optional[str]:
         return _norm_port(pref)
     return s2
 
+def _norm_ports(s: pd.Series) -> pd.Series:
+    # _norm_port once per distinct label, mapped back onto the rows (NA stays NA)
+    return s.map({v: _norm_port(v) for v in s.dropna().unique()})
+
 # strict resolver: exact (case-insensitive) or whole-word boundary only
 
 def _resolve_one(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
@@ -90,26 +117,18 @@ def normalize_tons(tons_path: str):
     period_col  = _resolve_one(df, ["Period","Month-Year","Date","MonthYear","Year-Month","Year_Month","YM"]) or "Period"
     tons_col    = _resolve_one(df, ["Tons_1000","Tons_thousands","Tons_K","Ktons","1000_Tons","Thousand_Tons","Tons","Value","Amount"]) or "Tons"
 
-    # parse period
-    def _ym_from_token(x):
-        if pd.isna(x): return (None, None)
-        s = str(x).strip()
-        for fmt in ("%m-%Y","%Y-%m","%m/%Y","%Y/%m","%b-%Y","%Y%b"):
-            try:
-                dt = pd.to_datetime(s, format=fmt, errors="raise")
-                return int(dt.year), int(dt.month)
-            except Exception:
-                pass
-        if s.isdigit() and len(s)==6:
-            y = int(s[:4]); m = int(s[4:])
-            return (y,m)
-        m = re.search(r"(^|[^\d])(1[0-2]|0?[1-9])($|[^\d])", s)
-        y = re.search(r"(19|20)\d{2}", s)
-        if m and y:
-            return (int(y.group(0)), int(m.group(2)))
-        return (None,None)
-
-    years, months = zip(*[ _ym_from_token(v) for v in df[period_col].tolist() ])
+    # parse period: the Period formats first, then bare YYYYMM, then any
+    # month token + 19xx/20xx year found in the string
+    years, months = _ym_from_periods(df[period_col])
+    z = df[period_col].astype("string").str.strip()
+    six = z.where(years.isna()).str.extract(r"^(\d{4})(\d{2})$").astype("Int64")
+    years, months = years.fillna(six[0]), months.fillna(six[1])
+    rest = z.where(years.isna())
+    mo = rest.str.extract(r"(^|[^\d])(1[0-2]|0?[1-9])($|[^\d])")[1].astype("Int64")
+    yr = rest.str.extract(r"((?:19|20)\d{2})")[0].astype("Int64")
+    found = mo.notna() & yr.notna()
+    years, months = years.fillna(yr.where(found)), months.fillna(mo.where(found))
+
     tons_raw = pd.to_numeric(df[tons_col], errors="coerce")
     scale = 1000.0 if any(k in tons_col.lower() for k in ["1000","k","thousand"]) else 1.0
     tons = tons_raw * scale
@@ -117,10 +136,10 @@ def normalize_tons(tons_path: str):
     pot = df[port_or_term].astype(str).str.strip().replace({"": np.nan})
     out = pd.DataFrame({
         "port_or_terminal": pot,
-        "port": pot.apply(_norm_port),
+        "port": _norm_ports(pot),
         "terminal": np.where(pot.str.contains("-", regex=False), pot, pd.NA),
-        "year": pd.Series(years, dtype="Int64"),
-        "month": pd.Series(months, dtype="Int64"),
+        "year": years,
+        "month": months,
         "tons": tons
     })
     out = out[(out["year"].notna()) & (out["month"].notna())].copy()
@@ -135,7 +154,8 @@ def normalize_tons(tons_path: str):
     term_sum = (term.groupby(["port","year","month"], dropna=False)["tons_i_m"].sum(min_count=1).reset_index()
                 .rename(columns={"tons_i_m":"tons_from_sum_terminals"}))
     key = pd.concat([tot[["port","year","month"]], term_sum[["port","year","month"]]], ignore_index=True).drop_duplicates()
-    merged = key.merge(tot, on=["port","year","month"], how="left").merge(term_sum, on=["port","year","month"], how="left")
+    merged = (key.merge(tot, on=["port","year","month"], how="left", validate="one_to_many")
+                 .merge(term_sum, on=["port","year","month"], how="left", validate="many_to_one"))
     merged["tons_p_m"] = merged["tons_from_port_total"].combine_first(merged["tons_from_sum_terminals"])
     merged["tons_source"] = np.where(merged["tons_from_port_total"].notna(), "port_total",
                                np.where(merged["tons_from_sum_terminals"].notna(), "sum_terminals", "no_source"))
@@ -171,45 +191,23 @@ def normalize_teu_strict(teu_path: str, out_dir: str):
     if missing:
         raise ValueError(f"[TEU] Missing required columns: {', '.join(missing)}")
 
-    df = raw.copy()
+    df = raw
     # port + drop All Ports
-    df["port"] = df[port_col].astype(str).str.strip().replace({"": np.nan}).apply(_norm_port)
-    df = df[df["port"].str.lower() != "all ports"].copy()
+    df["port"] = df[port_col].astype(str).str.strip().replace({"": np.nan}).pipe(_norm_ports)
+    df = df[df["port"].str.lower() != "all ports"]
 
     # value selection
     scale = 1.0
     if teu_col.lower().startswith("teu_thousand"): scale = 1000.0
     df["teu_val"] = pd.to_numeric(df[teu_col], errors="coerce") * scale
 
-    # time parsing (prefer MonthIndex)
-    def parse_ym_token(s):
-        if pd.isna(s): return (None, None)
-        z = str(s).strip()
-        m = re.match(r"^(\d{4})(\d{2})$", z)
-        if not m: return (None, None)
-        y = int(m.group(1)); mo = int(m.group(2))
-        return (y, mo)
-
+    # time parsing (prefer MonthIndex YYYYMM)
     if ym_col is not None:
-        ymo = [parse_ym_token(v) for v in df[ym_col].tolist()]
-        year, month = zip(*ymo) if len(ymo) else ([],[])
-        df["year"]  = pd.Series(year, dtype="Int64")
-        df["month"] = pd.Series(month, dtype="Int64")
+        ext = df[ym_col].astype("string").str.strip().str.extract(r"^(\d{4})(\d{2})$")
+        df["year"]  = ext[0].astype("Int64")
+        df["month"] = ext[1].astype("Int64")
     elif period_col is not None:
-        def _ym_from_period(x):
-            if pd.isna(x): return (None,None)
-            s = str(x).strip()
-            for fmt in ("%m-%Y","%Y-%m","%m/%Y","%Y/%m","%b-%Y","%Y%b"):
-                try:
-                    dt = pd.to_datetime(s, format=fmt, errors="raise")
-                    return int(dt.year), int(dt.month)
-                except Exception:
-                    pass
-            return (None,None)
-        pr = [ _ym_from_period(v) for v in df[period_col].tolist() ]
-        year, month = zip(*pr) if len(pr) else ([],[])
-        df["year"]  = pd.Series(year, dtype="Int64")
-        df["month"] = pd.Series(month, dtype="Int64")
+        df["year"], df["month"] = _ym_from_periods(df[period_col])
 
     # sanity: month must be 1..12; if not, treat as bad
     bad_month = df["month"].notna() & ~df["month"].between(1,12)
@@ -228,18 +226,13 @@ def normalize_teu_strict(teu_path: str, out_dir: str):
     is_q = f.str.startswith("q")
 
     # monthly
-    mdf = df[is_m].copy()
-    mdf = mdf[(mdf["year"].notna()) & (mdf["month"].notna())]
-    teu_m = mdf[["port","year","month","month_index"]].copy()
-    teu_m["teu_p_m"] = pd.to_numeric(mdf["teu_val"], errors="coerce")
-
-    # quarterly
-    qdf = df[is_q].copy()
-    # derive quarter from month; require q-end months
-    qdf = qdf[qdf["year"].notna() & qdf["month"].isin([3,6,9,12])].copy()
-    qdf["quarter"] = qdf["month"].map({3:"Q1",6:"Q2",9:"Q3",12:"Q4"})
-    teu_q = qdf[["port","year","quarter"]].copy()
-    teu_q["teu_p_q"] = pd.to_numeric(qdf["teu_val"], errors="coerce")
+    mdf = df.loc[is_m & df["year"].notna() & df["month"].notna(), ["port","year","month","month_index","teu_val"]]
+    teu_m = mdf[["port","year","month","month_index"]].assign(teu_p_m=pd.to_numeric(mdf["teu_val"], errors="coerce"))
+
+    # quarterly: derive quarter from month; require q-end months
+    qdf = df.loc[is_q & df["year"].notna() & df["month"].isin([3,6,9,12]), ["port","year","month","teu_val"]]
+    teu_q = qdf[["port","year"]].assign(quarter=qdf["month"].map({3:"Q1",6:"Q2",9:"Q3",12:"Q4"}),
+                                        teu_p_q=pd.to_numeric(qdf["teu_val"], errors="coerce"))
 
     # strict dedup rules
     if not teu_m.empty:
@@ -252,13 +245,14 @@ def normalize_teu_strict(teu_path: str, out_dir: str):
     # de-leak monthly at quarter ends where quarterly total exists
     if not teu_m.empty and not teu_q.empty:
         qmap = {"Q1":3, "Q2":6, "Q3":9, "Q4":12}
-        qq = teu_q.copy(); qq["m_qend"] = qq["quarter"].map(qmap)
-        merged = teu_m.merge(qq, left_on=["port","year","month"], right_on=["port","year","m_qend"], how="left")
+        qq = teu_q.assign(m_qend=teu_q["quarter"].map(qmap))
+        merged = teu_m.merge(qq, left_on=["port","year","month"], right_on=["port","year","m_qend"], how="left", validate="one_to_one")
         leak = merged["teu_p_q"].notna() & (merged["teu_p_m"] >= merged["teu_p_q"]*0.999)
-        drop = merged.loc[leak, ["port","year","month"]].drop_duplicates()
+        drop = merged.loc[leak, ["port","year","month"]]
         if not drop.empty:
-            teu_m = teu_m.merge(drop, on=["port","year","month"], how="left", indicator=True)
-            teu_m = teu_m[teu_m["_merge"]=="left_only"].drop(columns=["_merge"])
+            # anti-join on the key index (NA keys match like in merge)
+            keys = pd.MultiIndex.from_frame(teu_m[["port","year","month"]])
+            teu_m = teu_m[~keys.isin(pd.MultiIndex.from_frame(drop))]
 
     # QA gates
     errs = []
@@ -268,19 +262,17 @@ def normalize_teu_strict(teu_path: str, out_dir: str):
     # 2) month range and month_index consistency
     if (not teu_m.empty) and (not teu_m["month"].between(1,12).all()): errs.append("Monthly TEU has month outside 1..12")
     if not teu_m.empty:
-        check_mi = (teu_m["year"].astype("Int64")*12 + teu_m["month"].astype("Int64")).astype("Int64")
-        if not (check_mi.equals(teu_m["month_index"].astype("Int64"))): errs.append("month_index mismatch in monthly TEU")
+        y, mo, mi = (teu_m[c].to_numpy(dtype="float64", na_value=np.nan) for c in ("year","month","month_index"))
+        if not np.array_equal(y*12 + mo, mi, equal_nan=True): errs.append("month_index mismatch in monthly TEU")
     # 3) quarter labels set
     if (not teu_q.empty) and (set(teu_q["quarter"]).difference({"Q1","Q2","Q3","Q4"})): errs.append("Invalid quarter labels in quarterly TEU")
     # 4) coverage sanity (at least monthly or full quarterly)
     if not teu_m.empty or not teu_q.empty:
-        ports = sorted(set(pd.concat([teu_m["port"], teu_q["port"]]).dropna().unique()))
-        for p in ports:
-            years = sorted(set(pd.concat([teu_m.loc[teu_m["port"]==p, "year"], teu_q.loc[teu_q["port"]==p, "year"]]).dropna().unique()))
-            for y in years:
-                mN = int(teu_m[(teu_m.port==p)&(teu_m.year==y)].shape[0])
-                qN = int(teu_q[(teu_q.port==p)&(teu_q.year==y)].shape[0])
-                if mN==0 and qN not in {0,4}: errs.append(f"Coverage inconsistent for {p}-{y}: monthly=0 & quarterly={qN}")
+        cov = pd.concat([teu_m.groupby(["port","year"]).size().rename("m"),
+                         teu_q.groupby(["port","year"]).size().rename("q")], axis=1).fillna(0).astype(int).sort_index()
+        bad = cov[(cov["m"]==0) & ~cov["q"].isin([0,4])]
+        for p, y, _, qN in bad.reset_index().itertuples(index=False):
+            errs.append(f"Coverage inconsistent for {p}-{y}: monthly=0 & quarterly={qN}")
 
     if errs:
         # write errors and abort
@@ -310,7 +302,7 @@ def normalize_lproxy(lproxy_path: str):
     oper_col = pick(["operating","is_operating","open"])  # optional
 
     g = pd.DataFrame({
-        "port": df[port_col].astype(str).str.strip().replace({"": np.nan}).apply(_norm_port),
+        "port": df[port_col].astype(str).str.strip().replace({"": np.nan}).pipe(_norm_ports),
         "terminal": df[term_col].astype(str).str.strip().replace({"": np.nan}),
         "year": pd.to_numeric(df[year_col], errors="coerce").astype("Int64"),
         "month": pd.to_numeric(df[month_col], errors="coerce").astype("Int64"),
@@ -321,7 +313,7 @@ def normalize_lproxy(lproxy_path: str):
     })
     g = g[(g["year"].notna()) & (g["month"].notna())].copy()
     g["month_index"] = (g["year"].astype("Int64")*12 + g["month"].astype("Int64")).astype("Int64")
-    g["quarter"] = g["month"].apply(_quarter_from_month)
+    g["quarter"] = _quarter_from_month(g["month"])
 
     schema = {"port": port_col, "terminal": term_col, "year": year_col, "month": month_col,
               "l_hours_i_m": hours_col or "", "teu_i_m": teu_col or "", "pi_teu_per_hour_i_y": pi_col or "", "operating": oper_col or ""}
@@ -330,22 +322,17 @@ def normalize_lproxy(lproxy_path: str):
 # -------------- Coverage --------------
 
 def build_coverage(tons_pm, teu_pm, teu_pq, lpr):
-    ports = sorted(set(pd.concat([tons_pm["port"], lpr["port"]]).dropna().unique()))
-    rows = []
-    for p in ports:
-        yrs = sorted(set(pd.concat([
-            tons_pm.loc[tons_pm["port"]==p, "year"],
-            lpr.loc[lpr["port"]==p, "year"],
-            teu_pm.loc[teu_pm["port"]==p, "year"] if not teu_pm.empty else pd.Series(dtype="Int64"),
-            teu_pq.loc[teu_pq["port"]==p, "year"] if not teu_pq.empty else pd.Series(dtype="Int64"),
-        ]).dropna().unique()))
-        for y in yrs:
-            tN = int(tons_pm[(tons_pm.port==p)&(tons_pm.year==y)].shape[0])
-            mN = int(teu_pm[(teu_pm.port==p)&(teu_pm.year==y)].shape[0]) if not teu_pm.empty else 0
-            qN = int(teu_pq[(teu_pq.port==p)&(teu_pq.year==y)].shape[0]) if not teu_pq.empty else 0
-            lN = int(lpr[(lpr.port==p)&(lpr.year==y)].shape[0])
-            rows.append({"port":p,"year":int(y),"tons_pm_n":tN,"teu_pm_n":mN,"teu_pq_n":qN,"lproxy_n":lN,"note":"ok"})
-    return pd.DataFrame(rows)
+    # Row counts per (port, year) for each source; ports come from tons/L_proxy,
+    # years from any source for that port
+    frames = {"tons_pm_n": tons_pm, "teu_pm_n": teu_pm, "teu_pq_n": teu_pq, "lproxy_n": lpr}
+    ports = pd.concat([tons_pm["port"], lpr["port"]]).dropna().unique()
+    counts = [df.groupby([df["port"], df["year"].astype("Int64")]).size().rename(name)
+              for name, df in frames.items() if name in ("tons_pm_n", "lproxy_n") or not df.empty]
+    cov = pd.concat(counts, axis=1).reindex(columns=list(frames)).fillna(0).astype(int)
+    cov = cov[cov.index.get_level_values("port").isin(ports)].sort_index().reset_index()
+    cov["year"] = cov["year"].astype(int)
+    cov["note"] = "ok"
+    return cov
 
 # ---------------- main ----------------
 
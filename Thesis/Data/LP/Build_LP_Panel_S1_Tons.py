@@ -20,6 +20,8 @@ What this script does (stepwise):
        - S1_examples_port_precedence.tsv (rows where both terminal-sum and port row exist; shows values)
        - S1_qa.tsv                       (QA checks)
        - _meta_s1.json                   (counts, ranges)
+     --format parquet|both also (or instead) writes the three tons tables as zstd
+     S1_*.parquet next to the TSV names; the examples and QA tables stay TSV.
 
 Notes:
   * Tons units: input is thousands of tons (tons_k). We multiply by 1000.
@@ -33,28 +35,109 @@ from typing import Dict, Tuple
 import numpy as np
 import pandas as pd
 
+try:  # optional: --engine polars for the read -> terminal sum -> precedence join
+    import polars as pl
+except ImportError:
+    pl = None
+
+if int(pd.__version__.split('.')[0]) < 3:  # always on from pandas 3
+    pd.options.mode.copy_on_write = True
+
 # -------------------------- helpers --------------------------
 
+# Key columns are categoricals (sorted categories, so sorts/groupbys keep string order)
+PORT_DTYPE = pd.CategoricalDtype(['Ashdod','Haifa'])
+TERMINAL_DTYPE = pd.CategoricalDtype(['Ashdod-HCT','Haifa-SIPG'])
+QUARTER_DTYPE = pd.CategoricalDtype(['Q1','Q2','Q3','Q4'])
+
 def _read_tsv(path: str) -> pd.DataFrame:
     # IMPORTANT: use a real tab character for sep (not "\\t")
-    return pd.read_csv(path, sep='\t', engine='python')
-
-def _write_tsv(df: pd.DataFrame, path: str):
+    # C tokenizer (round-trip float parsing, same values as the python engine) -> python fallback
+    err = None
+    for engine in ('c', 'python'):
+        try:
+            return pd.read_csv(path, sep='\t', engine=engine, float_precision='round_trip' if engine == 'c' else None)
+        except Exception as e:
+            err = e
+    raise err
+
+def _write_tsv(df: pd.DataFrame, path: str, fmt: str = 'tsv'):
+    """Write df to path (TSV) and/or next to it as zstd Parquet, per fmt in {'tsv','parquet','both'}."""
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    # IMPORTANT: use a real tab character for sep (not "\\t")
-    df.to_csv(path, sep='\t', index=False)
-
-def _quarter_from_month(m: int) -> str:
-    q = (int(m) - 1) // 3 + 1
-    return f"Q{q}"
+    if fmt in {'tsv','both'}:
+        # IMPORTANT: use a real tab character for sep (not "\\t")
+        df.to_csv(path, sep='\t', index=False)
+    if fmt in {'parquet','both'}:
+        cats = {c: df[c].astype('category') for c in ['tons_source'] if c in df.columns}
+        df.assign(**cats).to_parquet(os.path.splitext(path)[0] + '.parquet', index=False,
+                                     compression='zstd', use_dictionary=True)
+
+def _quarter_from_month(m: pd.Series) -> pd.Categorical:
+    # month 1..12 -> Q1..Q4 codes in one pass; NA months stay NA
+    codes = ((m - 1) // 3).fillna(-1).to_numpy('int8')
+    return pd.Categorical.from_codes(codes, dtype=QUARTER_DTYPE)
 
 def _to_int64(s: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors='coerce').astype('Int64')
 
 # -------------------------- main logic ------------------------
 
-def load_tons_build_tables(tons_path: str):
-    raw = _read_tsv(tons_path).copy()
+def _term_and_port_month_polars(tons_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Polars version of the read -> clean -> terminal sum -> outer precedence join.
+    Returns (term, pm) with the same rows, order and dtypes as the pandas path;
+    sum(min_count=1) is kept and pm is sorted by key like pandas' outer merge.
+    """
+    term_map = {'Ashdod HCT': 'Ashdod-HCT', 'Haifa SIPG': 'Haifa-SIPG'}
+    lf = pl.scan_csv(tons_path, separator='\t', infer_schema=False)
+    missing = {'PortOrTerminal','Month-Year','tons_k'} - set(lf.collect_schema().names())
+    if missing:
+        raise SystemExit(f"[FATAL] tons file missing columns: {sorted(missing)}")
+
+    ym = pl.col('Month-Year').str.extract_groups(r'^(\d{1,2})-(\d{4})$')
+    raw = (lf.with_columns(pl.col('PortOrTerminal').fill_null('nan').str.strip_chars())
+             .filter(~pl.col('PortOrTerminal').is_in(['All Ports','AllPorts','Eilat']))
+             .with_columns(month=ym.struct.field('1').cast(pl.Int64),
+                           year=ym.struct.field('2').cast(pl.Int64),
+                           tons=pl.col('tons_k').cast(pl.Float64, strict=False) * 1000.0)
+             .with_columns(pl.when(pl.col('month').is_between(1, 12)).then(pl.col('month')).alias('month'))
+             .collect())
+    bad = raw.filter(pl.col('month').is_null())
+    if bad.height:
+        raise SystemExit(f"[FATAL] Failed to parse Month-Year for some rows, examples: {bad.select(['PortOrTerminal','Month-Year']).head(10).to_dicts()}")
+    raw = raw.with_columns(month_index=pl.col('year') * 12 + pl.col('month'))
+
+    def _sum_min1(c: str) -> pl.Expr:
+        return pl.when(pl.col(c).count() > 0).then(pl.col(c).sum()).otherwise(None)
+
+    term = (raw.filter(pl.col('PortOrTerminal').is_in(list(term_map)))
+               .with_columns(terminal=pl.col('PortOrTerminal').replace_strict(term_map))
+               .with_columns(port=pl.when(pl.col('terminal').str.starts_with('Ashdod')).then(pl.lit('Ashdod')).otherwise(pl.lit('Haifa')))
+               .group_by(['port','terminal','year','month'])
+               .agg(_sum_min1('tons').alias('tons_i_m'))
+               .sort(['port','terminal','year','month'])
+               .with_columns(month_index=pl.col('year') * 12 + pl.col('month')))
+    port_rows = (raw.filter(pl.col('PortOrTerminal').is_in(['Ashdod','Haifa']))
+                    .select(pl.col('PortOrTerminal').alias('port'), 'year', 'month', 'month_index',
+                            pl.col('tons').alias('tons_portrow_m')))
+    term_sum = (term.group_by(['port','year','month'])
+                    .agg(_sum_min1('tons_i_m').alias('tons_terminal_sum_m')))
+    pm = (port_rows.join(term_sum, on=['port','year','month'], how='full', coalesce=True)
+                   .sort(['port','year','month'], maintain_order=True))
+
+    def _to_pd(df: 'pl.DataFrame') -> pd.DataFrame:
+        out = df.to_pandas()
+        out['port'] = out['port'].astype(PORT_DTYPE)
+        if 'terminal' in out.columns:
+            out['terminal'] = out['terminal'].astype(TERMINAL_DTYPE)
+        for c in ['year','month','month_index']:
+            out[c] = out[c].astype('Int64')
+        return out
+
+    return _to_pd(term), _to_pd(pm)
+
+def _term_and_port_month(tons_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    raw = _read_tsv(tons_path)
     # Basic column presence check
     required_cols = {'PortOrTerminal','Month-Year','tons_k'}
     missing = required_cols - set(raw.columns)
@@ -62,8 +145,8 @@ def load_tons_build_tables(tons_path: str):
         raise SystemExit(f"[FATAL] tons file missing columns: {sorted(missing)}")
 
     # Clean names and drop unwanted rows
-    raw['PortOrTerminal'] = raw['PortOrTerminal'].astype(str).str.strip()
-    raw = raw[~raw['PortOrTerminal'].isin(['All Ports','AllPorts','Eilat'])].copy()
+    raw['PortOrTerminal'] = raw['PortOrTerminal'].astype(str).str.strip().astype('category')
+    raw = raw[~raw['PortOrTerminal'].isin(['All Ports','AllPorts','Eilat'])]
 
     # Canonical mapping for terminals
     term_map = {
@@ -80,41 +163,53 @@ def load_tons_build_tables(tons_path: str):
     raw['year'] = _to_int64(dt.dt.year)
     raw['month'] = _to_int64(dt.dt.month)
     raw['month_index'] = _to_int64(raw['year']*12 + raw['month'])
-    raw['quarter'] = raw['month'].apply(_quarter_from_month)
+    raw['quarter'] = _quarter_from_month(raw['month'])
 
     # Scale tons
     raw['tons'] = pd.to_numeric(raw['tons_k'], errors='coerce') * 1000.0
 
     # Split terminal vs port rows
     is_terminal = raw['PortOrTerminal'].isin(term_map.keys())
-    term = raw.loc[is_terminal, ['PortOrTerminal','year','month','month_index','tons']].copy()
-    term['terminal'] = term['PortOrTerminal'].map(term_map)
+    term = raw.loc[is_terminal, ['PortOrTerminal','year','month','month_index','tons']]
+    term['terminal'] = term['PortOrTerminal'].astype(str).map(term_map).astype(TERMINAL_DTYPE)
     # Map to canonical port per terminal
-    term['port'] = np.where(term['terminal'].str.startswith('Ashdod'), 'Ashdod', 'Haifa')
+    term['port'] = pd.Categorical(np.where(term['terminal'].str.startswith('Ashdod'), 'Ashdod', 'Haifa'), dtype=PORT_DTYPE)
     term = term[['port','terminal','year','month','month_index','tons']]
     term = term.rename(columns={'tons':'tons_i_m'})
 
     # Terminal-month: key uniqueness (aggregate if duplicates) and REBUILD month_index explicitly
-    term = term.groupby(['port','terminal','year','month'], as_index=False)['tons_i_m'].sum(min_count=1)
+    term = term.groupby(['port','terminal','year','month'], as_index=False, observed=True)['tons_i_m'].sum(min_count=1)
     term['month_index'] = _to_int64(term['year']*12 + term['month'])
 
     # Port rows
     port_rows = raw.loc[~is_terminal & raw['PortOrTerminal'].isin(['Ashdod','Haifa']),
-                        ['PortOrTerminal','year','month','month_index','quarter','tons']].copy()
+                        ['PortOrTerminal','year','month','month_index','quarter','tons']]
     port_rows = port_rows.rename(columns={'PortOrTerminal':'port','tons':'tons_portrow_m'})
+    port_rows['port'] = port_rows['port'].astype(PORT_DTYPE)  # same dtype as term_sum.port for the merge
 
     # Sum terminals to port-month
-    term_sum = term.groupby(['port','year','month'], as_index=False)['tons_i_m'] \
+    term_sum = term.groupby(['port','year','month'], as_index=False, observed=True)['tons_i_m'] \
                    .sum(min_count=1).rename(columns={'tons_i_m':'tons_terminal_sum_m'})
 
     # Merge precedence (outer join, then compute month_index & quarter from keys to avoid missing)
     pm = port_rows.merge(term_sum, on=['port','year','month'], how='outer')
+    return term, pm
+
+def load_tons_build_tables(tons_path: str, engine: str = 'pandas'):
+    term = pm = None
+    if engine == 'polars' and pl is not None:
+        try:
+            term, pm = _term_and_port_month_polars(tons_path)
+        except Exception as e:
+            print(f"[polars] Falling back to pandas for the tons tables: {e}")
+    if pm is None:
+        term, pm = _term_and_port_month(tons_path)
 
     # Recompute month_index/quarter from year & month (safe even if coming only from terminals)
     pm['year'] = _to_int64(pm['year'])
     pm['month'] = _to_int64(pm['month'])
     pm['month_index'] = _to_int64(pm['year']*12 + pm['month'])
-    pm['quarter'] = pm['month'].apply(_quarter_from_month)
+    pm['quarter'] = _quarter_from_month(pm['month'])
 
     # Decide tons_port_m and source
     pm['tons_port_m'] = np.where(pm['tons_terminal_sum_m'].notna(), pm['tons_terminal_sum_m'], pm['tons_portrow_m'])
@@ -122,20 +217,23 @@ def load_tons_build_tables(tons_path: str):
                                  np.where(pm['tons_portrow_m'].notna(), 'port_row', 'no_source'))
 
     # Examples table where both sources present (to audit differences)
-    both = pm[pm[['tons_portrow_m','tons_terminal_sum_m']].notna().all(axis=1)].copy()
+    both = pm[pm[['tons_portrow_m','tons_terminal_sum_m']].notna().all(axis=1)]
     if not both.empty:
-        both['abs_diff'] = (both['tons_terminal_sum_m'] - both['tons_portrow_m']).abs()
-        both['rel_diff'] = both['abs_diff'] / both['tons_portrow_m'].replace(0,np.nan)
+        a = both['tons_terminal_sum_m'].to_numpy(dtype='float64', na_value=np.nan)
+        b = both['tons_portrow_m'].to_numpy(dtype='float64', na_value=np.nan)
+        d = np.abs(a - b)
+        both['abs_diff'] = d
+        both['rel_diff'] = np.divide(d, b, out=np.full_like(d, np.nan), where=b != 0)  # NaN where the port row is 0
         examples = both[['port','year','month','month_index','tons_portrow_m','tons_terminal_sum_m','abs_diff','rel_diff']]
     else:
         examples = pd.DataFrame(columns=['port','year','month','month_index','tons_portrow_m','tons_terminal_sum_m','abs_diff','rel_diff'])
 
     # Final port-month table
-    port_month = pm[['port','year','month','month_index','quarter','tons_port_m','tons_source']].copy()
+    port_month = pm[['port','year','month','month_index','quarter','tons_port_m','tons_source']]
     port_month = port_month.sort_values(['port','year','month']).reset_index(drop=True)
 
     # Port-quarter aggregation
-    port_quarter = (port_month.groupby(['port','year','quarter'], as_index=False)
+    port_quarter = (port_month.groupby(['port','year','quarter'], as_index=False, observed=True)
                                ['tons_port_m'].sum(min_count=1)
                                .rename(columns={'tons_port_m':'tons_port_q'}))
 
@@ -157,9 +255,9 @@ def load_tons_build_tables(tons_path: str):
     add('port_month_missing_tons', True, f"{int(port_month['tons_port_m'].isna().sum())} NA months")
 
     # Ranges per port
-    for p in sorted(port_month['port'].dropna().unique().tolist()):
-        years = port_month.loc[port_month['port']==p, 'year'].dropna().unique()
-        add('port_years', True, f"{p}: {sorted([int(y) for y in years])}")
+    years_by_port = port_month.groupby('port', observed=True, sort=True)['year'].unique()
+    for p, years in years_by_port.items():
+        add('port_years', True, f"{p}: {sorted([int(y) for y in years if pd.notna(y)])}")
 
     qa = pd.DataFrame(qa_rows)
 
@@ -181,15 +279,19 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--tons', required=True, help='Path to monthly_output_by_1000_tons_ports_and_terminals.tsv')
     ap.add_argument('--out', required=True, help='Output directory (e.g., Data/LP)')
+    ap.add_argument('--engine', choices=['pandas','polars'], default='pandas',
+                    help='polars runs the read, terminal sum and precedence join (needs polars; falls back to pandas)')
+    ap.add_argument('--format', choices=['tsv','parquet','both'], default='tsv',
+                    help='format(s) for the three tons tables; parquet files are zstd-compressed next to the TSV names')
     args = ap.parse_args()
 
     os.makedirs(args.out, exist_ok=True)
 
-    term, port_month, port_quarter, examples, meta, qa = load_tons_build_tables(args.tons)
+    term, port_month, port_quarter, examples, meta, qa = load_tons_build_tables(args.tons, engine=args.engine)
 
-    _write_tsv(term,         os.path.join(args.out, 'S1_terminal_month_tons.tsv'))
-    _write_tsv(port_month,   os.path.join(args.out, 'S1_port_month_tons.tsv'))
-    _write_tsv(port_quarter, os.path.join(args.out, 'S1_port_quarter_tons.tsv'))
+    _write_tsv(term,         os.path.join(args.out, 'S1_terminal_month_tons.tsv'), fmt=args.format)
+    _write_tsv(port_month,   os.path.join(args.out, 'S1_port_month_tons.tsv'), fmt=args.format)
+    _write_tsv(port_quarter, os.path.join(args.out, 'S1_port_quarter_tons.tsv'), fmt=args.format)
     _write_tsv(examples,     os.path.join(args.out, 'S1_examples_port_precedence.tsv'))
     _write_tsv(qa,           os.path.join(args.out, 'S1_qa.tsv'))
 
@@ -22,6 +22,10 @@ TAB = '\t'
 # -------------------------- helpers --------------------------
 
 def _read(path):
+    if path.endswith('.parquet'):  # e.g. S1 written with --format parquet
+        df = pd.read_parquet(path)
+        # categorical keys come back as plain strings, as from the TSV
+        return df.astype({c: str for c in df.select_dtypes('category').columns})
     return pd.read_csv(path, sep=TAB, engine='python')
 
 def _write(df, path):